@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from pydantic_settings import BaseSettings
@@ -10,9 +11,48 @@ class Settings(BaseSettings):
     supabase_key: str
     supabase_service_role_key: str
     supabase_bucket: str = "file-conversions"
+    storage_backend: str = "supabase"  # or "memory" for tests / offline runs
+    storage_max_connections: int = 20
+    storage_resumable_threshold_bytes: int = 6 * 1024 * 1024
     max_upload_bytes: int = 50 * 1024 * 1024  # 50MB
     allowed_origins: list[str] = ["http://localhost:3000"]
     temp_dir: str = "/tmp/file-conversions"
+    converter_workers: int = os.cpu_count() or 1
+    conversion_timeout_seconds: int = 300
+    libreoffice_pool_size: int = 2  # 0 spawns a one-shot soffice per conversion
+    libreoffice_python: str = "/usr/bin/python3"  # interpreter with uno + unoserver
+    libreoffice_max_jobs: int = 200
+    libreoffice_max_rss_mb: int = 1024
+    libreoffice_queue_size: int = 32
+    result_cache_enabled: bool = True
+    result_cache_max_bytes: int = 1024 * 1024 * 1024  # 1GB
+    # "sqlite" (one host), "postgres" (conversion_logs, any number of hosts)
+    # or "inline" (run in the API process, nothing persisted)
+    job_queue_backend: str = "sqlite"
+    job_queue_path: str | None = None  # defaults to <temp_dir>/jobs.db
+    job_queue_max_depth: int = 200  # 0 disables the limit
+    job_max_attempts: int = 3
+    job_retry_base_seconds: float = 5.0
+    embedded_worker: bool = True  # run a worker inside the API process
+    worker_max_in_flight: int = os.cpu_count() or 1
+    worker_max_batch_in_flight: int = max(1, (os.cpu_count() or 1) // 2)
+    worker_poll_seconds: float = 1.0
+    batch_max_files: int = 500
+    batch_max_bytes: int = 1024 * 1024 * 1024  # 1GB across all files
+    batch_queue_max_depth: int = 5000
+    batch_concurrency: int = max(1, (os.cpu_count() or 1) // 2)  # inline mode
+    progress_backend: str = "sqlite"  # or "memory" for a single process
+    progress_store_path: str | None = None  # defaults to <temp_dir>/progress.db
+    progress_ttl_seconds: int = 3600
+    progress_poll_seconds: float = 0.2
+    history_cache_ttl_seconds: float = 2.0  # 0 disables the history response cache
+    # Converter backends loaded by every pool worker at start, plus a started
+    # LibreOffice pool if "libreoffice" is listed; others load on first use.
+    # The default is the cheap ones; "svg" (fontconfig cache), "pdf"
+    # (pdf2docx, poppler) and "libreoffice" (soffice processes) cost seconds
+    # and memory per worker, so deployments opt in to them
+    warmup_backends: list[str] = ["image", "document"]
+    metrics_port: int = 0  # standalone worker metrics server, 0 disables it
 
     model_config = {"env_file": str(_env_file), "env_file_encoding": "utf-8", "extra": "ignore"}
 
@@ -1,10 +1,80 @@
-from functools import lru_cache
+import asyncio
+import os
 
-from supabase import Client, create_client
+from supabase import AsyncClient, acreate_client
 
 from app.config import settings
+from app.services.job_queue import (
+    JobQueue,
+    PostgresJobQueue,
+    SQLiteJobQueue,
+    lease_seconds,
+)
+from app.services.metrics import instrument_http_client
+from app.services.storage import MemoryStorage, StorageBackend, SupabaseStorage
 
+_client: AsyncClient | None = None
+_storage: StorageBackend | None = None
+_job_queue: JobQueue | None = None
+_lock = asyncio.Lock()
 
-@lru_cache
-def get_supabase_client() -> Client:
-    return create_client(settings.supabase_url, settings.supabase_service_role_key)
+
+async def get_supabase_client() -> AsyncClient:
+    """Shared async client; its HTTP connections are pooled across requests."""
+    global _client
+    if _client is None:
+        async with _lock:
+            if _client is None:
+                client = await acreate_client(
+                    settings.supabase_url, settings.supabase_service_role_key
+                )
+                instrument_http_client(client.postgrest.session)
+                _client = client
+    return _client
+
+
+async def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        client = None
+        if settings.storage_backend != "memory":
+            # Outside the lock, which get_supabase_client takes itself
+            client = await get_supabase_client()
+        async with _lock:
+            if _storage is None:
+                _storage = MemoryStorage() if client is None else SupabaseStorage(client)
+    return _storage
+
+
+async def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        lease = lease_seconds(settings.conversion_timeout_seconds)
+        client = None
+        if settings.job_queue_backend == "postgres":
+            client = await get_supabase_client()
+        async with _lock:
+            if _job_queue is None:
+                if client is not None:
+                    _job_queue = PostgresJobQueue(client, lease)
+                else:
+                    os.makedirs(settings.temp_dir, exist_ok=True)
+                    path = settings.job_queue_path or os.path.join(settings.temp_dir, "jobs.db")
+                    _job_queue = SQLiteJobQueue(path, lease)
+    return _job_queue
+
+
+async def close_clients() -> None:
+    global _client, _storage, _job_queue
+    if isinstance(_storage, SupabaseStorage):
+        await _storage.aclose()
+    _storage = None
+    if _job_queue is not None:
+        await _job_queue.close()
+    _job_queue = None
+    if _client is not None:
+        # Each sub-client holds its own HTTP connection pool
+        await _client.postgrest.aclose()
+        await _client.storage.aclose()
+        await _client.auth.close()
+    _client = None
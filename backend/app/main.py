@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -8,7 +9,13 @@ from fastapi.responses import JSONResponse
 from starlette.requests import Request
 
 from app.config import settings
-from app.routers import compress, convert, download, health, progress
+from app.dependencies import close_clients, get_job_queue
+from app.routers import compress, convert, download, health, metrics, progress
+from app.services.executor import shutdown_pool, start_pool
+from app.services.metrics import mark_process_dead
+from app.services.libreoffice_pool import stop_libreoffice_pool
+from app.services.warmup import warm_up
+from app.worker import run_worker
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +23,26 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     os.makedirs(settings.temp_dir, exist_ok=True)
+    start_pool()
+    # In the background, so the process takes traffic before it is warm
+    warm = asyncio.create_task(warm_up())
+
+    worker_stop = asyncio.Event()
+    worker = None
+    if settings.job_queue_backend != "inline" and settings.embedded_worker:
+        worker = asyncio.create_task(
+            run_worker(await get_job_queue(), f"api-{os.getpid()}", worker_stop)
+        )
     yield
+    warm.cancel()
+    await asyncio.gather(warm, return_exceptions=True)
+    worker_stop.set()
+    if worker is not None:
+        await worker
+    await stop_libreoffice_pool()
+    shutdown_pool()
+    await close_clients()
+    mark_process_dead()
 
 
 app = FastAPI(title="File Converter API", lifespan=lifespan)
@@ -42,3 +68,4 @@ app.include_router(convert.router, prefix="/api")
 app.include_router(compress.router, prefix="/api")
 app.include_router(download.router, prefix="/api")
 app.include_router(progress.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
@@ -30,6 +30,18 @@ class ConversionResponse(BaseModel):
     error_message: str | None = None
 
 
+class BatchRejectedFile(BaseModel):
+    filename: str
+    error: str
+
+
+class BatchConversionResponse(BaseModel):
+    id: str
+    target_format: str
+    items: list[ConversionResponse]
+    rejected: list[BatchRejectedFile] = []
+
+
 class ConversionResult(BaseModel):
     id: str
     original_filename: str
@@ -37,13 +49,17 @@ class ConversionResult(BaseModel):
     target_format: str
     status: str
     error_message: str | None = None
-    original_storage_path: str | None = None
-    converted_storage_path: str | None = None
     file_size_bytes: int | None = None
     created_at: str | None = None
     updated_at: str | None = None
 
 
+class ConversionHistoryPage(BaseModel):
+    items: list[ConversionResult]
+    # Pass as ?cursor= for the next (older) page; None on the last page
+    next_cursor: str | None = None
+
+
 EXTENSION_TO_FORMAT: dict[str, FileFormat] = {
     ".jpg": FileFormat.JPG,
     ".jpeg": FileFormat.JPG,
@@ -93,12 +109,15 @@ class CompressionResult(BaseModel):
     compressed_size_bytes: int | None = None
     status: str
     error_message: str | None = None
-    original_storage_path: str | None = None
-    compressed_storage_path: str | None = None
     created_at: str | None = None
     updated_at: str | None = None
 
 
+class CompressionHistoryPage(BaseModel):
+    items: list[CompressionResult]
+    next_cursor: str | None = None
+
+
 COMPRESSIBLE_FORMATS: set[FileFormat] = {FileFormat.JPG, FileFormat.PNG, FileFormat.PDF}
 
 
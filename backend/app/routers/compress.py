@@ -1,17 +1,31 @@
-from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.requests import Request
 
 from app.config import settings
-from app.dependencies import get_supabase_client
+from app.dependencies import get_storage, get_supabase_client
 from app.models import (
     COMPRESSIBLE_FORMATS,
+    CompressionHistoryPage,
     CompressionResponse,
-    CompressionResult,
     CompressionStatus,
+    FileFormat,
 )
+from app.services import metrics
 from app.services.compressor import compress_file
-from app.services.storage import upload_file
+from app.services.executor import run_in_pool
+from app.services.history import COMPRESSION_HISTORY_COLUMNS, HISTORY_MAX_LIMIT, history_response
+from app.services.result_cache import compute_cache_key, disk_cache, find_stored_result
+from app.services.storage import StorageBackend
 from app.utils.mime import validate_file_type
 from app.utils.sanitize import sanitize_filename
+from app.utils.upload import (
+    SpooledUpload,
+    UploadTooLargeError,
+    multipart_body_schema,
+    receive_upload,
+)
 
 router = APIRouter()
 
@@ -22,39 +36,69 @@ CONTENT_TYPE_MAP = {
 }
 
 
-@router.get("/compressions", response_model=list[CompressionResult])
+@router.get("/compressions", response_model=CompressionHistoryPage)
 async def list_compressions(
-    limit: int = 20,
+    request: Request,
+    limit: int = Query(20, ge=1, le=HISTORY_MAX_LIMIT),
+    cursor: str | None = None,
+    status: CompressionStatus | None = None,
+    source_format: FileFormat | None = None,
     client=Depends(get_supabase_client),
 ):
-    result = (
-        client.table("compression_logs")
-        .select("*")
-        .order("created_at", desc=True)
-        .limit(limit)
-        .execute()
-    )
-    return result.data
+    """Compressions, newest first, a page at a time (see next_cursor)."""
+    try:
+        return await history_response(
+            request,
+            client,
+            "compression_logs",
+            COMPRESSION_HISTORY_COLUMNS,
+            CompressionHistoryPage,
+            limit,
+            cursor,
+            status=status.value if status else None,
+            source_format=source_format.value if source_format else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/compress", response_model=CompressionResponse)
+@router.post(
+    "/compress",
+    response_model=CompressionResponse,
+    openapi_extra=multipart_body_schema(target_size_bytes={"type": "integer"}),
+)
 async def compress(
-    file: UploadFile,
-    target_size_bytes: int = Form(...),
+    request: Request,
     client=Depends(get_supabase_client),
+    storage=Depends(get_storage),
 ):
-    file_bytes = await file.read()
+    try:
+        upload = await receive_upload(request)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        return await _compress_upload(upload, client, storage)
+    finally:
+        upload.remove()
+
 
-    if len(file_bytes) > settings.max_upload_bytes:
+async def _compress_upload(
+    upload: SpooledUpload, client, storage: StorageBackend
+) -> CompressionResponse:
+    try:
+        target_size_bytes = int(upload.fields["target_size_bytes"])
+    except (KeyError, ValueError):
         raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Maximum size is {settings.max_upload_bytes // (1024 * 1024)}MB",
+            status_code=422, detail="target_size_bytes must be an integer"
         )
 
-    filename = sanitize_filename(file.filename or "unnamed")
+    filename = sanitize_filename(upload.filename or "unnamed")
 
     try:
-        source_format = validate_file_type(filename, file_bytes)
+        source_format = validate_file_type(filename, upload.head, upload.path)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -65,33 +109,108 @@ async def compress(
             f"Supported formats: {[f.value for f in COMPRESSIBLE_FORMATS]}",
         )
 
-    if target_size_bytes >= len(file_bytes):
+    if target_size_bytes >= upload.size:
         raise HTTPException(
             status_code=400,
             detail="Target size must be smaller than the original file size",
         )
 
+    cache_key = None
+    if settings.result_cache_enabled:
+        cache_key = compute_cache_key(
+            upload.sha256,
+            "compress",
+            source=source_format.value,
+            target_size_bytes=target_size_bytes,
+        )
+
     log_entry = {
         "original_filename": filename,
         "source_format": source_format.value,
-        "original_size_bytes": len(file_bytes),
+        "original_size_bytes": upload.size,
         "target_size_bytes": target_size_bytes,
         "status": CompressionStatus.PROCESSING.value,
+        "cache_key": cache_key,
     }
-    result = client.table("compression_logs").insert(log_entry).execute()
+    result = await client.table("compression_logs").insert(log_entry).execute()
     compression_id = result.data[0]["id"]
 
+    source = source_format.value
+    in_flight = metrics.IN_FLIGHT.labels(kind="compression")
+    in_flight.inc()
     try:
+        # Identical earlier compression: copy its result within the bucket, so
+        # this one downloads under its own file name
+        stored = None
+        if cache_key is not None:
+            stored = await find_stored_result(client, "compression_logs", cache_key)
+        if stored and stored.get("compressed_storage_path"):
+            compressed_path = f"compressed/{compression_id}/{filename}"
+            with metrics.observe(
+                metrics.COMPRESSION_PHASE_SECONDS, phase="uploading_result", source=source
+            ):
+                await storage.copy_file(stored["compressed_storage_path"], compressed_path)
+            await client.table("compression_logs").update(
+                {
+                    "status": CompressionStatus.COMPLETED.value,
+                    "compressed_size_bytes": stored["compressed_size_bytes"],
+                    # The identical original is never downloaded
+                    "original_storage_path": stored["original_storage_path"],
+                    "compressed_storage_path": compressed_path,
+                }
+            ).eq("id", compression_id).execute()
+
+            metrics.COMPRESSIONS.labels(source=source, status="cached").inc()
+            return CompressionResponse(
+                id=compression_id,
+                status=CompressionStatus.COMPLETED,
+                original_filename=filename,
+                source_format=source_format.value,
+                original_size_bytes=upload.size,
+                target_size_bytes=target_size_bytes,
+                compressed_size_bytes=stored["compressed_size_bytes"],
+            )
+
+        # Upload the original in the background while compressing
         original_path = f"originals/{compression_id}/{filename}"
-        upload_file(client, original_path, file_bytes, file.content_type or "application/octet-stream")
 
-        compressed_bytes = compress_file(file_bytes, source_format, target_size_bytes)
+        async def upload_original() -> None:
+            with metrics.observe(
+                metrics.COMPRESSION_PHASE_SECONDS, phase="uploading_original", source=source
+            ):
+                await storage.upload_file(original_path, upload.path, upload.content_type)
+
+        metrics.COMPRESSION_INPUT_BYTES.labels(source=source).observe(upload.size)
+        original_upload = asyncio.create_task(upload_original())
+        try:
+            with metrics.observe(
+                metrics.COMPRESSION_PHASE_SECONDS, phase="compressing", source=source
+            ):
+                compressed_bytes = None
+                if cache_key is not None:
+                    compressed_bytes = await asyncio.to_thread(disk_cache.get, cache_key)
+                if compressed_bytes is None:
+                    compressed_bytes = await run_in_pool(
+                        compress_file, upload.path, source_format, target_size_bytes
+                    )
+                    if cache_key is not None:
+                        await asyncio.to_thread(disk_cache.put, cache_key, compressed_bytes)
+            metrics.COMPRESSION_OUTPUT_BYTES.labels(source=source).observe(len(compressed_bytes))
+            await original_upload
+        finally:
+            # The upload reads the spooled file, which is removed on return
+            if not original_upload.done():
+                original_upload.cancel()
+                await asyncio.gather(original_upload, return_exceptions=True)
 
         compressed_path = f"compressed/{compression_id}/{filename}"
         content_type = CONTENT_TYPE_MAP.get(source_format.value, "application/octet-stream")
-        upload_file(client, compressed_path, compressed_bytes, content_type)
+        with metrics.observe(
+            metrics.COMPRESSION_PHASE_SECONDS, phase="uploading_result", source=source
+        ):
+            await storage.upload_file(compressed_path, compressed_bytes, content_type)
 
-        client.table("compression_logs").update(
+        await client.table("compression_logs").update(
             {
                 "status": CompressionStatus.COMPLETED.value,
                 "compressed_size_bytes": len(compressed_bytes),
@@ -100,18 +219,21 @@ async def compress(
             }
         ).eq("id", compression_id).execute()
 
+        metrics.COMPRESSIONS.labels(source=source, status="completed").inc()
         return CompressionResponse(
             id=compression_id,
             status=CompressionStatus.COMPLETED,
             original_filename=filename,
             source_format=source_format.value,
-            original_size_bytes=len(file_bytes),
+            original_size_bytes=upload.size,
             target_size_bytes=target_size_bytes,
             compressed_size_bytes=len(compressed_bytes),
         )
 
     except Exception as e:
-        client.table("compression_logs").update(
+        metrics.COMPRESSIONS.labels(source=source, status="failed").inc()
+        metrics.COMPRESSION_ERRORS.labels(source=source, error=metrics.error_class(e)).inc()
+        await client.table("compression_logs").update(
             {
                 "status": CompressionStatus.FAILED.value,
                 "error_message": str(e),
@@ -123,7 +245,10 @@ async def compress(
             status=CompressionStatus.FAILED,
             original_filename=filename,
             source_format=source_format.value,
-            original_size_bytes=len(file_bytes),
+            original_size_bytes=upload.size,
             target_size_bytes=target_size_bytes,
             error_message=str(e),
         )
+    finally:
+        in_flight.dec()
+        metrics.refresh_converter_pool_rss()
@@ -1,186 +1,95 @@
 import asyncio
 import json
 import logging
+import uuid
 
-from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query
+from starlette.requests import Request
 
 from app.config import settings
-from app.dependencies import get_supabase_client
+from app.dependencies import get_job_queue, get_storage, get_supabase_client
 from app.models import (
+    BatchConversionResponse,
+    BatchRejectedFile,
+    ConversionHistoryPage,
     ConversionResponse,
-    ConversionResult,
     ConversionStatus,
     FileFormat,
-    FORMAT_TO_EXTENSION,
 )
-from app.services.converter import convert_file, get_supported_targets
-from app.services.storage import upload_file
-from app.services.task_store import TaskPhase, create_task, update_task
-from app.utils.mime import validate_file_type
+from app.services.conversion_runner import (
+    ConversionJob,
+    check_conversion,
+    enqueue_conversion,
+    parse_render_options,
+    record_conversion_failure,
+    run_conversion_inline,
+)
+from app.services.batch import run_batch_inline
+from app.services.history import CONVERSION_HISTORY_COLUMNS, HISTORY_MAX_LIMIT, history_response
+from app.services.job_queue import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from app.services.result_cache import compute_cache_key
+from app.services.storage import StorageBackend
+from app.services.task_store import create_task
 from app.utils.sanitize import sanitize_filename
+from app.utils.upload import (
+    SpooledUpload,
+    UploadTooLargeError,
+    expand_archive,
+    multipart_body_schema,
+    receive_upload,
+    receive_uploads,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-async def _run_conversion(
-    conversion_id: str,
-    file_bytes: bytes,
-    filename: str,
-    source_format: FileFormat,
-    target_format: FileFormat,
-    content_type_header: str,
-    parsed_pages: list[int] | None,
-    client,
-) -> None:
-    """Background task that uploads, converts, and updates the DB."""
-    try:
-        # Upload original
-        update_task(
-            conversion_id,
-            phase=TaskPhase.UPLOADING_ORIGINAL,
-            progress=0,
-            message="Uploading original file...",
-        )
-        original_path = f"originals/{conversion_id}/{filename}"
-        upload_file(client, original_path, file_bytes, content_type_header)
-
-        # Convert
-        update_task(
-            conversion_id,
-            phase=TaskPhase.CONVERTING,
-            progress=0,
-            message="Starting conversion...",
-        )
-
-        def progress_cb(progress: int, message: str) -> None:
-            update_task(
-                conversion_id,
-                phase=TaskPhase.CONVERTING,
-                progress=progress,
-                message=message,
-            )
-
-        converted_bytes = await convert_file(
-            file_bytes,
-            source_format,
-            target_format,
-            selected_pages=parsed_pages,
-            progress_cb=progress_cb,
-        )
-
-        # Upload converted
-        update_task(
-            conversion_id,
-            phase=TaskPhase.UPLOADING_RESULT,
-            progress=0,
-            message="Uploading converted file...",
-        )
-
-        base_name = filename.rsplit(".", 1)[0] if "." in filename else filename
-
-        content_type_map = {
-            FileFormat.JPG: "image/jpeg",
-            FileFormat.PNG: "image/png",
-            FileFormat.GIF: "image/gif",
-            FileFormat.SVG: "image/svg+xml",
-            FileFormat.PDF: "application/pdf",
-            FileFormat.DOCX: "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            FileFormat.PPTX: "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-            FileFormat.TXT: "text/plain",
-        }
-
-        is_pdf_to_image = (
-            source_format == FileFormat.PDF
-            and target_format in (FileFormat.JPG, FileFormat.PNG, FileFormat.GIF)
-        )
-        is_single_page = (
-            is_pdf_to_image
-            and parsed_pages is not None
-            and len(parsed_pages) == 1
-        )
-        if is_pdf_to_image and not is_single_page:
-            converted_name = base_name + ".zip"
-            content_type = "application/zip"
-        else:
-            converted_name = base_name + FORMAT_TO_EXTENSION[target_format]
-            content_type = content_type_map[target_format]
-
-        converted_path = f"converted/{conversion_id}/{converted_name}"
-        upload_file(client, converted_path, converted_bytes, content_type)
-
-        # Update log
-        client.table("conversion_logs").update(
-            {
-                "status": ConversionStatus.COMPLETED.value,
-                "original_storage_path": original_path,
-                "converted_storage_path": converted_path,
-            }
-        ).eq("id", conversion_id).execute()
-
-        update_task(
-            conversion_id,
-            phase=TaskPhase.COMPLETED,
-            progress=100,
-            message="Conversion complete",
-        )
-
-    except Exception as e:
-        logger.exception("Conversion %s failed", conversion_id)
-        client.table("conversion_logs").update(
-            {
-                "status": ConversionStatus.FAILED.value,
-                "error_message": str(e),
-            }
-        ).eq("id", conversion_id).execute()
-
-        update_task(
-            conversion_id,
-            phase=TaskPhase.FAILED,
-            progress=0,
-            message="Conversion failed",
-            error=str(e),
-        )
-
-
-@router.post("/convert", response_model=ConversionResponse)
+@router.post(
+    "/convert",
+    response_model=ConversionResponse,
+    openapi_extra=multipart_body_schema(
+        selected_pages={"type": "string"},
+        width={"type": "integer"},
+        height={"type": "integer"},
+        dpi={"type": "integer"},
+    ),
+)
 async def convert(
-    file: UploadFile,
+    request: Request,
     target_format: FileFormat,
-    selected_pages: str | None = Form(default=None),
     client=Depends(get_supabase_client),
+    storage=Depends(get_storage),
 ):
-    # Read file
-    file_bytes = await file.read()
+    # Stream the upload to disk, enforcing the size limit as it arrives
+    try:
+        upload = await receive_upload(request)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        return await _start_conversion(upload, target_format, client, storage)
+    except BaseException:
+        upload.remove()
+        raise
 
-    # Check size
-    if len(file_bytes) > settings.max_upload_bytes:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Maximum size is {settings.max_upload_bytes // (1024 * 1024)}MB",
-        )
 
+async def _start_conversion(
+    upload: SpooledUpload, target_format: FileFormat, client, storage: StorageBackend
+) -> ConversionResponse:
     # Sanitize filename
-    filename = sanitize_filename(file.filename or "unnamed")
+    filename = sanitize_filename(upload.filename or "unnamed")
 
-    # Validate MIME type
     try:
-        source_format = validate_file_type(filename, file_bytes)
+        source_format = check_conversion(filename, upload, target_format)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # Check conversion is supported
-    supported = get_supported_targets(source_format)
-    if target_format not in supported:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Cannot convert {source_format.value} to {target_format.value}. "
-            f"Supported targets: {[t.value for t in supported]}",
-        )
-
     # Parse selected_pages
     parsed_pages: list[int] | None = None
+    selected_pages = upload.fields.get("selected_pages")
     if selected_pages is not None:
         try:
             parsed_pages = json.loads(selected_pages)
@@ -194,31 +103,70 @@ async def convert(
                 detail="selected_pages must be a JSON array of integers",
             )
 
+    # Output size for SVG sources
+    try:
+        render_options = parse_render_options(upload.fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if render_options and source_format != FileFormat.SVG:
+        raise HTTPException(
+            status_code=400, detail="width, height and dpi only apply to SVG files"
+        )
+
+    # Backpressure: refuse new work while the queue is backed up
+    queued = settings.job_queue_backend != "inline"
+    if queued and settings.job_queue_max_depth > 0:
+        queue = await get_job_queue()
+        if await queue.depth(PRIORITY_INTERACTIVE) >= settings.job_queue_max_depth:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many conversions queued, please try again later",
+            )
+
+    cache_key = None
+    if settings.result_cache_enabled:
+        cache_key = compute_cache_key(
+            upload.sha256,
+            "convert",
+            source=source_format.value,
+            target=target_format.value,
+            selected_pages=parsed_pages,
+            **render_options,
+        )
+
     # Create conversion log entry
     log_entry = {
         "original_filename": filename,
         "source_format": source_format.value,
         "target_format": target_format.value,
         "status": ConversionStatus.PROCESSING.value,
-        "file_size_bytes": len(file_bytes),
+        "file_size_bytes": upload.size,
+        "cache_key": cache_key,
     }
-    result = client.table("conversion_logs").insert(log_entry).execute()
+    result = await client.table("conversion_logs").insert(log_entry).execute()
     conversion_id = result.data[0]["id"]
 
-    # Create task in progress store and launch background conversion
-    create_task(conversion_id)
-    asyncio.create_task(
-        _run_conversion(
-            conversion_id=conversion_id,
-            file_bytes=file_bytes,
-            filename=filename,
-            source_format=source_format,
-            target_format=target_format,
-            content_type_header=file.content_type or "application/octet-stream",
-            parsed_pages=parsed_pages,
-            client=client,
-        )
+    # Create task in progress store and hand the conversion off
+    await create_task(conversion_id)
+    job = ConversionJob(
+        conversion_id=conversion_id,
+        filename=filename,
+        source_format=source_format,
+        target_format=target_format,
+        content_type=upload.content_type,
+        selected_pages=parsed_pages,
+        render_options=render_options or None,
+        cache_key=cache_key,
     )
+    if queued:
+        try:
+            await enqueue_conversion(job, upload, storage, PRIORITY_INTERACTIVE)
+        except Exception as e:
+            logger.exception("Failed to enqueue conversion %s", conversion_id)
+            await record_conversion_failure(conversion_id, str(e), client)
+            raise
+    else:
+        asyncio.create_task(run_conversion_inline(job, upload.path, client, storage))
 
     return ConversionResponse(
         id=conversion_id,
@@ -229,16 +177,198 @@ async def convert(
     )
 
 
-@router.get("/conversions", response_model=list[ConversionResult])
-async def list_conversions(
-    limit: int = 20,
+@router.post(
+    "/convert/batch",
+    response_model=BatchConversionResponse,
+    openapi_extra=multipart_body_schema(
+        width={"type": "integer"}, height={"type": "integer"}, dpi={"type": "integer"}
+    ),
+)
+async def convert_batch(
+    request: Request,
+    target_format: FileFormat,
     client=Depends(get_supabase_client),
+    storage=Depends(get_storage),
 ):
-    result = (
-        client.table("conversion_logs")
-        .select("*")
-        .order("created_at", desc=True)
-        .limit(limit)
-        .execute()
+    """Convert many files (repeated 'file' parts, or one .zip) in one request.
+
+    Files that cannot be converted are reported in 'rejected' instead of
+    failing the whole batch. Progress for every item is streamed from
+    /api/progress/batch/{id} and the results from /api/download/batch/{id}.
+    The optional width, height and dpi fields size the SVG files' output.
+    """
+    try:
+        uploads, fields = await receive_uploads(
+            request,
+            max_files=settings.batch_max_files,
+            max_total_bytes=settings.batch_max_bytes,
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        try:
+            render_options = parse_render_options(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if len(uploads) == 1 and uploads[0].filename.lower().endswith(".zip"):
+            archive = uploads.pop()
+            try:
+                uploads = await asyncio.to_thread(
+                    expand_archive,
+                    archive,
+                    settings.batch_max_files,
+                    settings.max_upload_bytes,
+                    settings.batch_max_bytes,
+                )
+            except UploadTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            finally:
+                archive.remove()
+        return await _start_batch(uploads, target_format, render_options, client, storage)
+    except BaseException:
+        for upload in uploads:
+            upload.remove()
+        raise
+
+
+async def _start_batch(
+    uploads: list[SpooledUpload],
+    target_format: FileFormat,
+    render_options: dict[str, int],
+    client,
+    storage: StorageBackend,
+) -> BatchConversionResponse:
+    accepted: list[tuple[SpooledUpload, str, FileFormat]] = []
+    rejected: list[BatchRejectedFile] = []
+    for upload in uploads:
+        filename = sanitize_filename(upload.filename or "unnamed")
+        try:
+            source_format = check_conversion(filename, upload, target_format)
+        except ValueError as e:
+            rejected.append(BatchRejectedFile(filename=filename, error=str(e)))
+            upload.remove()
+            continue
+        accepted.append((upload, filename, source_format))
+    if not accepted:
+        raise HTTPException(
+            status_code=400,
+            detail="No convertible files in batch. "
+            + "; ".join(f"{r.filename}: {r.error}" for r in rejected[:5]),
+        )
+
+    queued = settings.job_queue_backend != "inline"
+    if queued and settings.batch_queue_max_depth > 0:
+        queue = await get_job_queue()
+        if await queue.depth(PRIORITY_BATCH) + len(accepted) > settings.batch_queue_max_depth:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many batch conversions queued, please try again later",
+            )
+
+    # One insert for the whole batch
+    batch_id = str(uuid.uuid4())
+    log_entries = []
+    for upload, filename, source_format in accepted:
+        cache_key = None
+        if settings.result_cache_enabled:
+            cache_key = compute_cache_key(
+                upload.sha256,
+                "convert",
+                source=source_format.value,
+                target=target_format.value,
+                selected_pages=None,
+                **(render_options if source_format == FileFormat.SVG else {}),
+            )
+        log_entries.append(
+            {
+                "original_filename": filename,
+                "source_format": source_format.value,
+                "target_format": target_format.value,
+                "status": ConversionStatus.PROCESSING.value,
+                "file_size_bytes": upload.size,
+                "cache_key": cache_key,
+                "batch_id": batch_id,
+            }
+        )
+    result = await client.table("conversion_logs").insert(log_entries).execute()
+
+    await asyncio.gather(*(create_task(row["id"]) for row in result.data))
+    jobs: list[tuple[ConversionJob, SpooledUpload]] = []
+    for row, (upload, filename, source_format) in zip(result.data, accepted):
+        job = ConversionJob(
+            conversion_id=row["id"],
+            filename=filename,
+            source_format=source_format,
+            target_format=target_format,
+            content_type=upload.content_type,
+            render_options=render_options if source_format == FileFormat.SVG else None,
+            cache_key=row["cache_key"],
+        )
+        jobs.append((job, upload))
+
+    if queued:
+        slots = asyncio.Semaphore(settings.storage_max_connections)
+
+        async def enqueue(job: ConversionJob, upload: SpooledUpload) -> None:
+            async with slots:
+                try:
+                    await enqueue_conversion(job, upload, storage, PRIORITY_BATCH)
+                except Exception as e:
+                    logger.exception("Failed to enqueue conversion %s", job.conversion_id)
+                    await record_conversion_failure(job.conversion_id, str(e), client)
+                    upload.remove()
+
+        await asyncio.gather(*(enqueue(job, upload) for job, upload in jobs))
+    else:
+        asyncio.create_task(
+            run_batch_inline([(job, upload.path) for job, upload in jobs], client, storage)
+        )
+
+    return BatchConversionResponse(
+        id=batch_id,
+        target_format=target_format.value,
+        items=[
+            ConversionResponse(
+                id=job.conversion_id,
+                status=ConversionStatus.PROCESSING,
+                original_filename=job.filename,
+                source_format=job.source_format.value,
+                target_format=target_format.value,
+            )
+            for job, _ in jobs
+        ],
+        rejected=rejected,
     )
-    return result.data
+
+
+@router.get("/conversions", response_model=ConversionHistoryPage)
+async def list_conversions(
+    request: Request,
+    limit: int = Query(20, ge=1, le=HISTORY_MAX_LIMIT),
+    cursor: str | None = None,
+    status: ConversionStatus | None = None,
+    source_format: FileFormat | None = None,
+    target_format: FileFormat | None = None,
+    client=Depends(get_supabase_client),
+):
+    """Conversions, newest first, a page at a time (see next_cursor)."""
+    try:
+        return await history_response(
+            request,
+            client,
+            "conversion_logs",
+            CONVERSION_HISTORY_COLUMNS,
+            ConversionHistoryPage,
+            limit,
+            cursor,
+            status=status.value if status else None,
+            source_format=source_format.value if source_format else None,
+            target_format=target_format.value if target_format else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.responses import StreamingResponse
 
-from app.dependencies import get_supabase_client
-from app.services.storage import create_download_url
+from app.dependencies import get_storage, get_supabase_client
+from app.services.batch import batch_manifest, fetch_batch_items, stream_batch_zip
 
 router = APIRouter()
 
@@ -10,8 +11,9 @@ router = APIRouter()
 async def download(
     conversion_id: str,
     client=Depends(get_supabase_client),
+    storage=Depends(get_storage),
 ):
-    result = (
+    result = await (
         client.table("conversion_logs")
         .select("converted_storage_path, status")
         .eq("id", conversion_id)
@@ -28,16 +30,46 @@ async def download(
     if not record["converted_storage_path"]:
         raise HTTPException(status_code=404, detail="Converted file not found")
 
-    url = create_download_url(client, record["converted_storage_path"])
+    url = await storage.create_download_url(record["converted_storage_path"])
     return {"download_url": url}
 
 
+@router.get("/download/batch/{batch_id}")
+async def download_batch(
+    batch_id: str,
+    manifest: bool = False,
+    client=Depends(get_supabase_client),
+    storage=Depends(get_storage),
+):
+    """Stream every completed result of a batch as one ZIP.
+
+    With ?manifest=true, return per-item status and signed download URLs
+    instead.
+    """
+    items = await fetch_batch_items(client, batch_id)
+    if not items:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    if manifest:
+        return {"id": batch_id, "items": await batch_manifest(items, storage)}
+
+    if not any(item["status"] == "completed" for item in items):
+        raise HTTPException(status_code=400, detail="No completed conversions in batch")
+
+    return StreamingResponse(
+        stream_batch_zip(items, storage),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="batch-{batch_id}.zip"'},
+    )
+
+
 @router.get("/download/compression/{compression_id}")
 async def download_compressed(
     compression_id: str,
     client=Depends(get_supabase_client),
+    storage=Depends(get_storage),
 ):
-    result = (
+    result = await (
         client.table("compression_logs")
         .select("compressed_storage_path, status")
         .eq("id", compression_id)
@@ -54,5 +86,5 @@ async def download_compressed(
     if not record["compressed_storage_path"]:
         raise HTTPException(status_code=404, detail="Compressed file not found")
 
-    url = create_download_url(client, record["compressed_storage_path"])
+    url = await storage.create_download_url(record["compressed_storage_path"])
     return {"download_url": url}
@@ -1,4 +1,7 @@
 from fastapi import APIRouter
+from starlette.responses import JSONResponse
+
+from app.services.warmup import warm_status
 
 router = APIRouter()
 
@@ -6,3 +9,17 @@ router = APIRouter()
 @router.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness(require_warm: bool = False):
+    """Report whether converter backends are warm.
+
+    Always 200 unless require_warm is set, in which case a cold or warming
+    process answers 503. A degraded process is ready: its failed backends
+    load on first use, as they would without warm-up.
+    """
+    state = warm_status()
+    if require_warm and state["status"] in ("cold", "warming"):
+        return JSONResponse(status_code=503, content=state)
+    return state
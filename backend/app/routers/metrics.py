@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from app.config import settings
+from app.dependencies import get_job_queue
+from app.services.metrics import render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus exposition for this API process."""
+    queue = await get_job_queue() if settings.job_queue_backend != "inline" else None
+    body, content_type = await render_metrics(queue)
+    return Response(content=body, media_type=content_type)
@@ -2,10 +2,21 @@ import asyncio
 import json
 import logging
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from starlette.responses import StreamingResponse
 
-from app.services.task_store import TaskPhase, get_task, remove_task
+from app.dependencies import get_supabase_client
+from app.models import ConversionStatus
+from app.services.batch import fetch_batch_items
+from app.services.task_store import (
+    TaskPhase,
+    TaskProgress,
+    get_task,
+    get_tasks,
+    remove_task,
+    wait_for_any_update,
+    wait_for_update,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -13,12 +24,19 @@ router = APIRouter()
 
 HEARTBEAT_INTERVAL = 30  # seconds
 STREAM_TIMEOUT = 300  # 5 minutes
+BATCH_STREAM_TIMEOUT = 3600  # 1 hour
 CLEANUP_DELAY = 60  # seconds after stream ends
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
 
 @router.get("/progress/{task_id}")
 async def stream_progress(task_id: str):
-    task = get_task(task_id)
+    task = await get_task(task_id)
     if task is None:
         async def error_stream():
             data = json.dumps({"phase": "failed", "progress": 0, "message": "Task not found", "error": "Task not found"})
@@ -29,7 +47,7 @@ async def stream_progress(task_id: str):
         elapsed = 0.0
         try:
             while elapsed < STREAM_TIMEOUT:
-                current = get_task(task_id)
+                current = await get_task(task_id)
                 if current is None:
                     data = json.dumps({"phase": "failed", "progress": 0, "message": "Task removed", "error": "Task removed"})
                     yield f"event: error\ndata: {data}\n\n"
@@ -49,9 +67,7 @@ async def stream_progress(task_id: str):
                     return
 
                 # Wait for next update or heartbeat timeout
-                try:
-                    await asyncio.wait_for(current.event.wait(), timeout=HEARTBEAT_INTERVAL)
-                except asyncio.TimeoutError:
+                if not await wait_for_update(task_id, current.version, HEARTBEAT_INTERVAL):
                     # Send heartbeat comment to keep connection alive
                     yield ": heartbeat\n\n"
                     elapsed += HEARTBEAT_INTERVAL
@@ -66,12 +82,91 @@ async def stream_progress(task_id: str):
                 remove_task(task_id)
             asyncio.create_task(cleanup())
 
-    return StreamingResponse(
-        event_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
-    )
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def _batch_item_state(item: dict, task: TaskProgress | None) -> tuple[dict, int | None]:
+    """Progress of one batch item, from its live task or else its log row.
+
+    Also returns the task version the state was read at, if there is a task.
+    """
+    state = {"id": item["id"], "filename": item["original_filename"]}
+    if task is not None:
+        state.update(phase=task.phase.value, progress=task.progress, message=task.message)
+        if task.error:
+            state["error"] = task.error
+    elif item["status"] == ConversionStatus.COMPLETED.value:
+        state.update(phase=TaskPhase.COMPLETED.value, progress=100, message="Conversion complete")
+    elif item["status"] == ConversionStatus.FAILED.value:
+        state.update(
+            phase=TaskPhase.FAILED.value,
+            progress=0,
+            message="Conversion failed",
+            error=item.get("error_message"),
+        )
+    else:
+        state.update(phase=TaskPhase.UPLOADING_ORIGINAL.value, progress=0, message="")
+    return state, task.version if task is not None else None
+
+
+@router.get("/progress/batch/{batch_id}")
+async def stream_batch_progress(batch_id: str, client=Depends(get_supabase_client)):
+    """Aggregate and per-item progress of a batch on one SSE channel.
+
+    Each event carries the batch totals plus only the items that changed
+    since the previous event (all items in the first one).
+    """
+    items = await fetch_batch_items(client, batch_id)
+    if not items:
+        async def error_stream():
+            data = json.dumps({"phase": "failed", "progress": 0, "message": "Batch not found", "error": "Batch not found"})
+            yield f"event: error\ndata: {data}\n\n"
+        return StreamingResponse(error_stream(), media_type="text/event-stream")
+
+    terminal = (TaskPhase.COMPLETED.value, TaskPhase.FAILED.value)
+
+    async def event_stream():
+        nonlocal items
+        sent: dict[str, dict] = {}
+        elapsed = 0.0
+        while elapsed < BATCH_STREAM_TIMEOUT:
+            tasks = await get_tasks([item["id"] for item in items])
+            snapshot = [_batch_item_state(item, tasks.get(item["id"])) for item in items]
+            states = [state for state, _ in snapshot]
+            changed = [state for state in states if sent.get(state["id"]) != state]
+            sent.update((state["id"], state) for state in changed)
+
+            completed = sum(s["phase"] == TaskPhase.COMPLETED.value for s in states)
+            failed = sum(s["phase"] == TaskPhase.FAILED.value for s in states)
+            done = completed + failed == len(states)
+            progress = sum(100 if s["phase"] in terminal else s["progress"] for s in states)
+            payload = {
+                "phase": TaskPhase.COMPLETED.value if done else TaskPhase.CONVERTING.value,
+                "progress": progress // len(states),
+                "message": f"{completed} of {len(states)} files converted"
+                + (f", {failed} failed" if failed else ""),
+                "total": len(states),
+                "completed": completed,
+                "failed": failed,
+                "items": changed,
+            }
+            yield f"data: {json.dumps(payload)}\n\n"
+            if done:
+                return
+
+            versions = {
+                state["id"]: version
+                for state, version in snapshot
+                if version is not None and state["phase"] not in terminal
+            }
+            if not await wait_for_any_update(versions, HEARTBEAT_INTERVAL):
+                yield ": heartbeat\n\n"
+                elapsed += HEARTBEAT_INTERVAL
+                if len(versions) < len(states) - completed - failed:
+                    # Some items report progress elsewhere; fall back to the log
+                    items = await fetch_batch_items(client, batch_id)
+
+        data = json.dumps({"phase": "failed", "progress": 0, "message": "Stream timeout", "error": "Stream timeout"})
+        yield f"event: timeout\ndata: {data}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
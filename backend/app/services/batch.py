@@ -0,0 +1,149 @@
+"""Batch conversions: many files submitted, tracked and downloaded as one.
+
+Every file in a batch is an ordinary conversion (its own conversion_logs row
+and job) tagged with a shared ``batch_id``. Batch jobs are queued at
+PRIORITY_BATCH and each worker runs only a few of them at once, so bulk work
+never crowds out interactive conversions.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import zipfile
+from collections.abc import AsyncIterator
+
+from app.config import settings
+from app.models import ConversionStatus
+from app.services.conversion_runner import ConversionJob, run_conversion_inline
+from app.services.storage import StorageBackend
+from app.utils.archive import ZIP_CHUNK_BYTES, StreamSink, zip_entry
+
+BATCH_ITEM_COLUMNS = (
+    "id, original_filename, status, error_message, converted_storage_path, created_at"
+)
+
+
+async def fetch_batch_items(client, batch_id: str) -> list[dict]:
+    result = await (
+        client.table("conversion_logs")
+        .select(BATCH_ITEM_COLUMNS)
+        .eq("batch_id", batch_id)
+        .order("created_at")
+        .execute()
+    )
+    return result.data
+
+
+async def run_batch_inline(
+    jobs: list[tuple[ConversionJob, str]], client, storage: StorageBackend
+) -> None:
+    """Convert (job, input_path) pairs in this process, batch_concurrency at a time."""
+    slots = asyncio.Semaphore(settings.batch_concurrency)
+
+    async def run(job: ConversionJob, input_path: str) -> None:
+        async with slots:
+            await run_conversion_inline(job, input_path, client, storage)
+
+    await asyncio.gather(*(run(job, path) for job, path in jobs))
+
+
+def _archive_names(items: list[dict]) -> dict[str, str]:
+    """Map item id to a unique name inside the archive."""
+    names: dict[str, str] = {}
+    used: set[str] = set()
+    for item in items:
+        path = item.get("converted_storage_path")
+        if item["status"] != ConversionStatus.COMPLETED.value or not path:
+            continue
+        name = path.rsplit("/", 1)[-1]
+        stem, ext = os.path.splitext(name)
+        counter = 1
+        while name in used:
+            name = f"{stem} ({counter}){ext}"
+            counter += 1
+        used.add(name)
+        names[item["id"]] = name
+    return names
+
+
+async def stream_batch_zip(
+    items: list[dict], storage: StorageBackend
+) -> AsyncIterator[bytes]:
+    """Stream a ZIP of every completed item plus a manifest.json.
+
+    Objects are fetched one ahead of the entry being written, and the archive
+    is yielded as it is produced, so memory use stays at about one chunk.
+    """
+    names = _archive_names(items)
+    completed = [item for item in items if item["id"] in names]
+    os.makedirs(settings.temp_dir, exist_ok=True)
+
+    async def fetch(item: dict) -> str:
+        fd, path = tempfile.mkstemp(dir=settings.temp_dir, prefix="batch-")
+        os.close(fd)
+        try:
+            await storage.download_file(item["converted_storage_path"], path)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    sink = StreamSink()
+    pending = asyncio.create_task(fetch(completed[0])) if completed else None
+    try:
+        with zipfile.ZipFile(sink, "w") as zf:
+            for index, item in enumerate(completed):
+                path = await pending
+                pending = (
+                    asyncio.create_task(fetch(completed[index + 1]))
+                    if index + 1 < len(completed)
+                    else None
+                )
+                try:
+                    info = zip_entry(names[item["id"]], os.path.getsize(path))
+                    with open(path, "rb") as src, zf.open(info, "w") as dst:
+                        while chunk := src.read(ZIP_CHUNK_BYTES):
+                            dst.write(chunk)
+                            yield sink.drain()
+                finally:
+                    os.remove(path)
+
+            manifest = [
+                {
+                    "id": item["id"],
+                    "original_filename": item["original_filename"],
+                    "status": item["status"],
+                    "file": names.get(item["id"]),
+                    "error_message": item.get("error_message"),
+                }
+                for item in items
+            ]
+            zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+        yield sink.drain()
+    finally:
+        if pending is not None:
+            pending.cancel()
+            results = await asyncio.gather(pending, return_exceptions=True)
+            if isinstance(results[0], str):
+                os.remove(results[0])
+
+
+async def batch_manifest(items: list[dict], storage: StorageBackend) -> list[dict]:
+    """Per-item status with signed download URLs, signed in one request."""
+    paths = [
+        item["converted_storage_path"]
+        for item in items
+        if item["status"] == ConversionStatus.COMPLETED.value and item.get("converted_storage_path")
+    ]
+    urls = dict(zip(paths, await storage.create_download_urls(paths)))
+    return [
+        {
+            "id": item["id"],
+            "original_filename": item["original_filename"],
+            "status": item["status"],
+            "error_message": item.get("error_message"),
+            "download_url": urls.get(item.get("converted_storage_path")),
+        }
+        for item in items
+    ]
@@ -1,143 +1,582 @@
 import io
+import logging
+import os
+import zlib
+from collections.abc import Callable
 
 from PIL import Image
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_path, pdfinfo_from_path
 
 from app.models import FileFormat
+from app.utils.pdf_writer import DOCUMENT_OVERHEAD_BYTES, PAGE_OVERHEAD_BYTES, JpegPdfWriter
+
+logger = logging.getLogger(__name__)
 
 MIN_IMAGE_BYTES = 1024  # 1 KB
 MIN_PDF_BYTES = 10240  # 10 KB
 
+PDF_RENDER_DPI = 200
+PDF_RENDER_WINDOW = 4  # pages rendered at a time
+# Low-resolution renders used to weigh each page's share of the budget
+PDF_PROBE_DPI = 24
+PDF_PROBE_QUALITY = 50
+PDF_PROBE_WINDOW = 32
+# (dpi, JPEG quality) for re-encoding embedded images, smallest output first.
+# Steps at or above the images' own resolution are dropped, and the search
+# always ends with full resolution at PDF_IMAGE_TOP_QUALITY, so a generous
+# target keeps the images close to the original.
+PDF_IMAGE_SETTINGS = (
+    (50, 25), (72, 35), (96, 45), (120, 60), (150, 75), (200, 82), (300, 88)
+)
+PDF_IMAGE_TOP_QUALITY = 92
+
+JPEG_MIN_QUALITY = 5
+MIN_SCALE = 0.1
+SCALE_TOLERANCE = 0.02
+
+# Pyramid levels, as divisors of the full size; JPEG decodes straight to these
+DECODE_FACTORS = (1, 2, 4, 8)
+# JPEGs this large estimate their smallest full-size encode from the 1/8
+# level before decoding at full size
+JPEG_PLAN_MIN_PIXELS = 4_000_000
+# The area-scaled estimate overshoots by up to about 1.5x, so full size is
+# skipped only when the estimate exceeds the target by more than this
+JPEG_PLAN_MARGIN = 2.0
+
+# Palette sizes bisected by the PNG search, smallest first
+PNG_PALETTE_SIZES = (16, 24, 32, 48, 64, 96, 128, 192, 256)
+PNG_PALETTE_SAMPLE = 512  # palettes are computed on a thumbnail this size
+# Encodes within this factor of the target also try other zlib strategies
+PNG_NEAR_MISS = 1.1
+PNG_STRATEGIES = (zlib.Z_FILTERED, zlib.Z_RLE)
+# Recompressing a full-color PNG rarely saves more than this, so smaller
+# targets skip straight to palettes
+PNG_LOSSLESS_MIN_RATIO = 0.7
+
+# Approximate bytes per pixel of a typical photo at a given JPEG quality,
+# used only to pick the first probe of the quality bisection.
+JPEG_BPP_MODEL: list[tuple[int, float]] = [
+    (95, 0.60),
+    (85, 0.32),
+    (75, 0.22),
+    (60, 0.16),
+    (40, 0.11),
+    (20, 0.07),
+    (10, 0.05),
+]
+
 
 def compress_image_to_target(
-    file_bytes: bytes, source_format: FileFormat, target_size_bytes: int
+    input_path: str, source_format: FileFormat, target_size_bytes: int
 ) -> bytes:
     """Compress a JPG or PNG to fit within target_size_bytes."""
     if target_size_bytes < MIN_IMAGE_BYTES:
         raise ValueError(f"Target size must be at least {MIN_IMAGE_BYTES // 1024} KB for images")
 
-    img = Image.open(io.BytesIO(file_bytes))
-
     if source_format == FileFormat.JPG:
-        return _compress_jpeg(img, target_size_bytes)
+        return _compress_jpeg(_ImagePyramid(input_path, _jpeg_mode), target_size_bytes)
     elif source_format == FileFormat.PNG:
-        return _compress_png(img, target_size_bytes)
+        return _compress_png(
+            _ImagePyramid(input_path, _normalize_png_mode),
+            target_size_bytes,
+            os.path.getsize(input_path),
+        )
     else:
         raise ValueError(f"Unsupported image format for compression: {source_format.value}")
 
 
-def _compress_jpeg(img: Image.Image, target_size_bytes: int) -> bytes:
-    """Iterative JPEG quality reduction, then progressive resizing."""
+class _ImagePyramid:
+    """An image decoded lazily at the reduced sizes a search asks for.
+
+    Level n is the image at 1/n size for n in DECODE_FACTORS. JPEG files are
+    decoded straight to a level by DCT scaling (Image.draft), so a search
+    that only needs a third of the width never decodes the full image;
+    other sources are box-reduced (Image.reduce) from the full image.
+    Levels are normalized with normalize and cached, so each is decoded at
+    most once however many scales are tried.
+    """
+
+    def __init__(
+        self,
+        source: str | Image.Image,
+        normalize: Callable[[Image.Image], Image.Image],
+    ) -> None:
+        self._path = source if isinstance(source, str) else None
+        self._normalize = normalize
+        self._levels: dict[int, Image.Image] = {}
+        if isinstance(source, str):
+            # Reads the header only
+            with Image.open(source) as img:
+                self.size: tuple[int, int] = img.size
+        else:
+            self.size = source.size
+            self._levels[1] = normalize(source)
+
+    @property
+    def full(self) -> Image.Image:
+        return self.level(1)
+
+    def level(self, factor: int) -> Image.Image:
+        if factor not in self._levels:
+            self._levels[factor] = self._decode(factor)
+        return self._levels[factor]
+
+    def _decode(self, factor: int) -> Image.Image:
+        if self._path is not None and (factor == 1 or 1 not in self._levels):
+            img = Image.open(self._path)
+            w, h = self.size
+            # Only JPEG supports draft, which keeps the file's mode
+            if factor == 1 or img.draft(None, (-(-w // factor), -(-h // factor))):
+                img.load()
+                return self._normalize(img)
+            img.close()
+        return self.full.reduce(factor)
+
+    def resized(self, scale: float) -> Image.Image:
+        """The image at scale, resampled from the smallest level at least that large."""
+        if scale >= 1.0:
+            return self.full
+        w, h = self.size
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        factor = max(f for f in DECODE_FACTORS if f == 1 or scale <= 1 / f)
+        source = self.level(factor)
+        if source.size == size:
+            return source
+        return source.resize(size, Image.LANCZOS)
+
+
+def _jpeg_mode(img: Image.Image) -> Image.Image:
     if img.mode in ("RGBA", "P"):
-        img = img.convert("RGB")
+        return img.convert("RGB")
+    return img
 
-    # Try quality reduction first (95 → 5)
-    for quality in range(95, 4, -5):
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=quality, optimize=True)
-        if buf.tell() <= target_size_bytes:
-            return buf.getvalue()
-
-    # Quality alone wasn't enough — progressively resize
-    scale = 0.9
-    while scale > 0.1:
-        w, h = img.size
-        resized = img.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.LANCZOS)
-        buf = io.BytesIO()
-        resized.save(buf, format="JPEG", quality=5, optimize=True)
-        if buf.tell() <= target_size_bytes:
-            return buf.getvalue()
-        scale -= 0.1
 
-    raise ValueError("Cannot compress image to the requested target size")
+def _compress_jpeg(pyramid: _ImagePyramid, target_size_bytes: int) -> bytes:
+    """Bisect JPEG quality, then output scale, until the target is met."""
+    result = _search_jpeg(pyramid, target_size_bytes, max_quality=95)
+    if result is None:
+        raise ValueError("Cannot compress image to the requested target size")
+    return result
+
 
+def _seed_jpeg_quality(pixels: int, target_size_bytes: int, max_quality: int) -> int:
+    """Estimate a starting quality from the target's bytes-per-pixel budget."""
+    budget = target_size_bytes / max(1, pixels)
+    for quality, bpp in JPEG_BPP_MODEL:
+        if budget >= bpp:
+            return max(JPEG_MIN_QUALITY, min(quality, max_quality))
+    return JPEG_MIN_QUALITY
 
-def _compress_png(img: Image.Image, target_size_bytes: int) -> bytes:
-    """Color quantization (256 colors), then progressive resizing."""
-    # Quantize to 256 colors
-    quantized = img.quantize(colors=256).convert(img.mode)
 
+def _search_jpeg(
+    pyramid: _ImagePyramid, target_size_bytes: int, max_quality: int
+) -> bytes | None:
+    """Find the best JPEG encoding of the image that fits target_size_bytes.
+
+    First bisects quality at full size, seeded from JPEG_BPP_MODEL. If even
+    the minimum quality is too large, searches the scale factor at minimum
+    quality, assuming encoded size tracks area. For large images the
+    smallest full-size encode is first estimated from the 1/8 level, and
+    when that is far over the target the full-size search is skipped, so
+    the full image is never decoded. Encodes are cached across trials.
+    Returns None if no scale down to MIN_SCALE fits.
+    """
+    encode_cache: dict[tuple[int, float], bytes] = {}
+
+    def encode(quality: int, scale: float) -> bytes:
+        scale = round(scale, 3)
+        key = (quality, scale)
+        if key not in encode_cache:
+            buf = io.BytesIO()
+            pyramid.resized(scale).save(buf, format="JPEG", quality=quality, optimize=True)
+            encode_cache[key] = buf.getvalue()
+        return encode_cache[key]
+
+    w, h = pyramid.size
+    smallest_full: int | None = None
+    if w * h >= JPEG_PLAN_MIN_PIXELS:
+        estimate = len(encode(JPEG_MIN_QUALITY, 1 / 8)) * 64
+        if estimate > target_size_bytes * JPEG_PLAN_MARGIN:
+            smallest_full = estimate
+
+    # Highest quality that fits at full size
+    best: bytes | None = None
+    lo, hi = JPEG_MIN_QUALITY, max_quality
+    if smallest_full is not None:
+        hi = lo - 1
+    probe = _seed_jpeg_quality(w * h, target_size_bytes, max_quality)
+    while lo <= hi:
+        data = encode(probe, 1.0)
+        if len(data) <= target_size_bytes:
+            best = data
+            lo = probe + 1
+        else:
+            hi = probe - 1
+        probe = (lo + hi + 1) // 2
+    if best is not None:
+        return best
+
+    # Largest scale that fits at minimum quality; encoded size tracks area
+    if smallest_full is None:
+        smallest_full = len(encode(JPEG_MIN_QUALITY, 1.0))
+    lo_scale, hi_scale = MIN_SCALE, 1.0
+    probe_scale = min(0.95, max(MIN_SCALE, (target_size_bytes / smallest_full) ** 0.5))
+    while hi_scale - lo_scale > SCALE_TOLERANCE:
+        data = encode(JPEG_MIN_QUALITY, probe_scale)
+        if len(data) <= target_size_bytes:
+            best = data
+            lo_scale = probe_scale
+        else:
+            hi_scale = probe_scale
+        # Step by the area model rather than halving, so probes stay near
+        # the answer and never need a larger pyramid level than it does
+        if hi_scale - lo_scale > 2 * SCALE_TOLERANCE:
+            guess = probe_scale * (target_size_bytes / len(data)) ** 0.5
+            probe_scale = min(max(guess, lo_scale + SCALE_TOLERANCE), hi_scale - SCALE_TOLERANCE)
+        else:
+            probe_scale = (lo_scale + hi_scale) / 2
+    return best
+
+
+def _compress_png(pyramid: _ImagePyramid, target_size_bytes: int, source_bytes: int) -> bytes:
+    """Lossless recompression, then palette bisection, then resizing."""
+    lossless = target_size_bytes >= source_bytes * PNG_LOSSLESS_MIN_RATIO
+    result = _search_png(pyramid, target_size_bytes, lossless)
+    if result is None:
+        raise ValueError("Cannot compress image to the requested target size")
+    return result
+
+
+def _normalize_png_mode(img: Image.Image) -> Image.Image:
+    """Convert to L, RGB or RGBA, the modes the PNG search works in."""
+    if img.mode in ("L", "RGB"):
+        return img
+    if img.mode == "RGBA":
+        # Fully opaque alpha is dead weight
+        if img.getchannel("A").getextrema() == (255, 255):
+            return img.convert("RGB")
+        return img
+    if img.mode in ("LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        return _normalize_png_mode(img.convert("RGBA"))
+    if img.mode in ("1", "I", "I;16", "F"):
+        return img.convert("L")
+    return img.convert("RGB")
+
+
+def _encode_png(img: Image.Image, compress_type: int | None = None) -> bytes:
     buf = io.BytesIO()
-    quantized.save(buf, format="PNG", optimize=True)
-    if buf.tell() <= target_size_bytes:
-        return buf.getvalue()
-
-    # Progressively resize
-    scale = 0.9
-    while scale > 0.1:
-        w, h = quantized.size
-        resized = quantized.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.LANCZOS)
-        buf = io.BytesIO()
-        resized.save(buf, format="PNG", optimize=True)
-        if buf.tell() <= target_size_bytes:
-            return buf.getvalue()
-        scale -= 0.1
+    if compress_type is None:
+        img.save(buf, format="PNG", optimize=True)
+    else:
+        img.save(buf, format="PNG", optimize=True, compress_type=compress_type)
+    return buf.getvalue()
+
+
+def _search_png(
+    pyramid: _ImagePyramid, target_size_bytes: int, try_lossless: bool = True
+) -> bytes | None:
+    """Find the largest, most faithful PNG encoding of the image within budget.
+
+    Tries, in order and stopping at the first fit: lossless recompression
+    (unless try_lossless is false) and an exact palette if the image has at
+    most 256 colors; palettes bisected over PNG_PALETTE_SIZES at full size,
+    finally the scale, bisected with the smallest palette. Nothing is
+    dithered: the noise costs more bytes than a larger palette would. RGBA
+    images keep their alpha through octree quantization. Palettes of RGB and
+    L images are computed once per size on a thumbnail, downscaled images
+    are resampled from the nearest pyramid level, and quantized images are
+    memoized across trials. Returns None if nothing down to MIN_SCALE fits.
+    """
+    img = pyramid.full
+    has_alpha = img.mode == "RGBA"
+    palette_cache: dict[int, Image.Image] = {}
+    quantized_cache: dict[tuple[float, int], Image.Image] = {}
 
-    raise ValueError("Cannot compress image to the requested target size")
+    def fit(candidate: Image.Image) -> bytes | None:
+        data = _encode_png(candidate)
+        if len(data) <= target_size_bytes:
+            return data
+        # A near miss may fit with another zlib strategy
+        if len(data) <= target_size_bytes * PNG_NEAR_MISS:
+            for strategy in PNG_STRATEGIES:
+                data = _encode_png(candidate, strategy)
+                if len(data) <= target_size_bytes:
+                    return data
+        return None
 
+    def quantized(scale: float, colors: int) -> Image.Image:
+        scale = round(scale, 3)
+        key = (scale, colors)
+        if key not in quantized_cache:
+            source = pyramid.resized(scale)
+            if has_alpha:
+                quantized_cache[key] = source.quantize(
+                    colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE
+                )
+            else:
+                if colors not in palette_cache:
+                    sample = pyramid.resized(PNG_PALETTE_SAMPLE / max(img.size))
+                    palette_cache[colors] = sample.quantize(colors)
+                quantized_cache[key] = source.quantize(
+                    palette=palette_cache[colors], dither=Image.Dither.NONE
+                )
+        return quantized_cache[key]
 
-def compress_pdf_to_target(file_bytes: bytes, target_size_bytes: int) -> bytes:
-    """Rasterize PDF pages, compress each as JPEG, reassemble as PDF."""
+    # Lossless
+    best = fit(img) if try_lossless else None
+    if best is not None:
+        return best
+    if not has_alpha:
+        colors = img.getcolors(256)
+        if colors is not None:
+            best = fit(img.quantize(len(colors), dither=Image.Dither.NONE))
+            if best is not None:
+                return best
+
+    # Most colors that fit at full size
+    lo, hi = 0, len(PNG_PALETTE_SIZES) - 1
+    probe = hi
+    while lo <= hi:
+        data = fit(quantized(1.0, PNG_PALETTE_SIZES[probe]))
+        if data is not None:
+            best = data
+            lo = probe + 1
+        else:
+            hi = probe - 1
+        probe = (lo + hi + 1) // 2
+    if best is not None:
+        return best
+
+    # Largest scale that fits with the smallest palette; size tracks area
+    min_colors = PNG_PALETTE_SIZES[0]
+    smallest = len(_encode_png(quantized(1.0, min_colors)))
+    lo_scale, hi_scale = MIN_SCALE, 1.0
+    probe_scale = min(0.95, max(MIN_SCALE, (target_size_bytes / smallest) ** 0.5))
+    while hi_scale - lo_scale > SCALE_TOLERANCE:
+        data = fit(quantized(probe_scale, min_colors))
+        if data is not None:
+            best = data
+            lo_scale = probe_scale
+        else:
+            hi_scale = probe_scale
+        probe_scale = (lo_scale + hi_scale) / 2
+    return best
+
+
+def compress_pdf_to_target(input_path: str, target_size_bytes: int) -> bytes:
+    """Compress a PDF, keeping its text and vector content if possible.
+
+    Falls back to rasterizing every page when recompressing the document's
+    own objects cannot reach the target.
+    """
     if target_size_bytes < MIN_PDF_BYTES:
         raise ValueError(f"Target size must be at least {MIN_PDF_BYTES // 1024} KB for PDFs")
 
-    pages = convert_from_bytes(file_bytes)
-    if not pages:
-        raise ValueError("PDF has no pages")
+    try:
+        result = _compress_pdf_structure(input_path, target_size_bytes)
+    except Exception as e:
+        logger.warning("Structural PDF compression failed, rasterizing: %s", e)
+        result = None
+    if result is not None:
+        return result
+    return _rasterize_pdf_to_target(input_path, target_size_bytes)
 
-    per_page_budget = target_size_bytes // len(pages)
 
-    compressed_pages: list[Image.Image] = []
-    for page in pages:
-        page_rgb = page.convert("RGB")
-        compressed_page = _compress_single_page(page_rgb, per_page_budget)
-        compressed_pages.append(Image.open(io.BytesIO(compressed_page)))
+def _pdf_images(doc) -> dict[int, tuple[int, float | None]]:
+    """Map each rewritable image xref to (a page showing it, its highest dpi).
 
-    buf = io.BytesIO()
-    if len(compressed_pages) == 1:
-        compressed_pages[0].save(buf, format="PDF")
-    else:
-        compressed_pages[0].save(buf, format="PDF", save_all=True, append_images=compressed_pages[1:])
+    An image drawn on several pages, or several times on one, is one object
+    and is listed once, at the resolution of its largest placement. Images
+    with a soft mask are left out: replacing them would drop the mask.
+    """
+    images: dict[int, tuple[int, float | None]] = {}
+    for page in doc:
+        for xref, smask, width, height, *_ in page.get_images(full=True):
+            if smask:
+                continue
+            page_number, dpi = images.get(xref, (page.number, None))
+            for rect in page.get_image_rects(xref):
+                if rect.width > 0 and rect.height > 0:
+                    placed = max(width * 72 / rect.width, height * 72 / rect.height)
+                    dpi = placed if dpi is None else max(dpi, placed)
+            images[xref] = (page_number, dpi)
+    return images
 
-    result = buf.getvalue()
-    if len(result) > target_size_bytes:
-        # Try with lower DPI by resizing pages down
-        scale = target_size_bytes / len(result) * 0.9
-        if scale < 0.1:
-            raise ValueError("Cannot compress PDF to the requested target size")
-        resized_pages = []
-        for page in compressed_pages:
-            w, h = page.size
-            resized = page.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.LANCZOS)
-            resized_pages.append(resized)
+
+def _rewrite_images(doc, dpi: int | None, quality: int) -> None:
+    """Re-encode each image object once as JPEG, downsampled to dpi.
+
+    An encode that is not smaller than the image's current stream is not
+    used. Images whose placement is unknown keep their resolution.
+    """
+    import pymupdf
+
+    for xref, (page_number, image_dpi) in _pdf_images(doc).items():
+        pix = pymupdf.Pixmap(doc, xref)
+        if pix.alpha or pix.n not in (1, 3):
+            pix = pymupdf.Pixmap(pymupdf.csRGB, pix, 0)
+        img = Image.frombytes("L" if pix.n == 1 else "RGB", (pix.width, pix.height), pix.samples)
+        if dpi is not None and image_dpi is not None and image_dpi > dpi:
+            scale = dpi / image_dpi
+            img = img.resize(
+                (max(1, round(img.width * scale)), max(1, round(img.height * scale))),
+                Image.LANCZOS,
+            )
         buf = io.BytesIO()
-        if len(resized_pages) == 1:
-            resized_pages[0].save(buf, format="PDF")
+        img.save(buf, format="JPEG", quality=quality, optimize=True)
+        if buf.tell() < len(doc.xref_stream_raw(xref)):
+            doc[page_number].replace_image(xref, stream=buf.getvalue())
+
+
+def _pdf_bytes(input_path: str, image_settings: tuple[int | None, int] | None) -> bytes:
+    """Rewrite the PDF, optionally re-encoding its images at (dpi, quality).
+
+    A dpi of None keeps the images' resolution. Saving with garbage
+    collection level 4 drops unused objects and merges identical streams;
+    content streams, fonts and images are deflated.
+    """
+    import pymupdf
+
+    doc = pymupdf.open(input_path)
+    try:
+        if image_settings is not None:
+            _rewrite_images(doc, *image_settings)
+        return doc.tobytes(
+            garbage=4,
+            clean=True,
+            deflate=True,
+            deflate_images=True,
+            deflate_fonts=True,
+            use_objstms=1,
+        )
+    finally:
+        doc.close()
+
+
+def _compress_pdf_structure(input_path: str, target_size_bytes: int) -> bytes | None:
+    """Recompress the PDF's objects without rendering any page.
+
+    First a lossless rewrite; then, if the document has raster images,
+    image downsampling and JPEG quality bisected over the settings below
+    the images' resolution (see PDF_IMAGE_SETTINGS). Returns None if even
+    the smallest setting does not fit.
+    """
+    data = _pdf_bytes(input_path, None)
+    if len(data) <= target_size_bytes:
+        return data
+
+    import pymupdf
+
+    with pymupdf.open(input_path) as doc:
+        images = _pdf_images(doc)
+    if not images:
+        return None
+    max_dpi = max((dpi for _, dpi in images.values() if dpi is not None), default=None)
+    settings = [
+        setting
+        for setting in PDF_IMAGE_SETTINGS
+        if max_dpi is not None and setting[0] < max_dpi
+    ]
+    settings.append((None, PDF_IMAGE_TOP_QUALITY))
+
+    # Most faithful image setting that fits
+    best = None
+    lo, hi = 0, len(settings) - 1
+    probe = hi
+    while lo <= hi:
+        data = _pdf_bytes(input_path, settings[probe])
+        if len(data) <= target_size_bytes:
+            best = data
+            lo = probe + 1
         else:
-            resized_pages[0].save(buf, format="PDF", save_all=True, append_images=resized_pages[1:])
-        result = buf.getvalue()
+            hi = probe - 1
+        probe = (lo + hi + 1) // 2
+    return best
+
+
+def _rasterize_pdf_to_target(input_path: str, target_size_bytes: int) -> bytes:
+    """Rasterize PDF pages, compress each as JPEG, reassemble as PDF.
+
+    Each page gets a share of the byte budget proportional to its
+    complexity (see _page_weights) rather than an equal split. Pages are
+    rendered PDF_RENDER_WINDOW at a time and their JPEG encodes are streamed
+    straight into the output, so peak memory is bounded by the window rather
+    than the page count, and the output is assembled once.
+    """
+    page_count = int(pdfinfo_from_path(input_path).get("Pages", 0))
+    if not page_count:
+        raise ValueError("PDF has no pages")
+
+    page_budget = target_size_bytes - DOCUMENT_OVERHEAD_BYTES - page_count * PAGE_OVERHEAD_BYTES
+    if page_budget < page_count:
+        raise ValueError("Cannot compress PDF to the requested target size")
+
+    weights = _page_weights(input_path, page_count)
+    remaining_budget = page_budget
+    remaining_weight = sum(weights)
+
+    output = io.BytesIO()
+    writer = JpegPdfWriter(output)
+    index = 0
+    for first in range(1, page_count + 1, PDF_RENDER_WINDOW):
+        last = min(first + PDF_RENDER_WINDOW - 1, page_count)
+        pages = convert_from_path(
+            input_path, dpi=PDF_RENDER_DPI, first_page=first, last_page=last
+        )
+        for page in pages:
+            # Share of what is left, so bytes a simple page did not use go
+            # to the pages still to come
+            weight = weights[index] if index < len(weights) else 1
+            budget = remaining_budget * weight // max(1, remaining_weight)
+            compressed_page = _compress_single_page(page.convert("RGB"), budget)
+            _add_jpeg_page(writer, compressed_page, page.size)
+            remaining_budget -= len(compressed_page)
+            remaining_weight -= weight
+            index += 1
+        del pages
+    writer.close()
 
+    result = output.getvalue()
+    if len(result) > target_size_bytes:
+        raise ValueError("Cannot compress PDF to the requested target size")
     return result
 
 
+def _page_weights(input_path: str, page_count: int) -> list[int]:
+    """Estimate each page's complexity as the JPEG size of a thumbnail render.
+
+    A blank page's thumbnail is little more than the JPEG headers, while a
+    photo page's is many times larger, roughly in proportion to the bytes
+    each needs at full resolution.
+    """
+    weights = []
+    for first in range(1, page_count + 1, PDF_PROBE_WINDOW):
+        last = min(first + PDF_PROBE_WINDOW - 1, page_count)
+        for page in convert_from_path(
+            input_path, dpi=PDF_PROBE_DPI, first_page=first, last_page=last
+        ):
+            buf = io.BytesIO()
+            page.convert("RGB").save(buf, format="JPEG", quality=PDF_PROBE_QUALITY)
+            weights.append(buf.tell())
+    return weights
+
+
+def _add_jpeg_page(writer: JpegPdfWriter, jpeg_bytes: bytes, rendered_size: tuple[int, int]) -> None:
+    """Append a compressed page, keeping the page's original physical size."""
+    with Image.open(io.BytesIO(jpeg_bytes)) as encoded:
+        pixel_size, mode = encoded.size, encoded.mode
+    page_size = (
+        rendered_size[0] * 72 / PDF_RENDER_DPI,
+        rendered_size[1] * 72 / PDF_RENDER_DPI,
+    )
+    writer.add_page(jpeg_bytes, pixel_size, mode, page_size)
+
+
 def _compress_single_page(img: Image.Image, target_bytes: int) -> bytes:
     """Compress a single page image as JPEG within budget."""
-    for quality in range(85, 4, -10):
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=quality, optimize=True)
-        if buf.tell() <= target_bytes:
-            return buf.getvalue()
-
-    # Resize as fallback
-    scale = 0.8
-    while scale > 0.1:
-        w, h = img.size
-        resized = img.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.LANCZOS)
-        buf = io.BytesIO()
-        resized.save(buf, format="JPEG", quality=5, optimize=True)
-        if buf.tell() <= target_bytes:
-            return buf.getvalue()
-        scale -= 0.1
+    result = _search_jpeg(_ImagePyramid(img, _jpeg_mode), target_bytes, max_quality=85)
+    if result is not None:
+        return result
 
     # Return best effort
     buf = io.BytesIO()
@@ -148,12 +587,12 @@ def _compress_single_page(img: Image.Image, target_bytes: int) -> bytes:
 
 
 def compress_file(
-    file_bytes: bytes, source_format: FileFormat, target_size_bytes: int
+    input_path: str, source_format: FileFormat, target_size_bytes: int
 ) -> bytes:
     """Dispatch to the correct compressor based on format."""
     if source_format in (FileFormat.JPG, FileFormat.PNG):
-        return compress_image_to_target(file_bytes, source_format, target_size_bytes)
+        return compress_image_to_target(input_path, source_format, target_size_bytes)
     elif source_format == FileFormat.PDF:
-        return compress_pdf_to_target(file_bytes, target_size_bytes)
+        return compress_pdf_to_target(input_path, target_size_bytes)
     else:
         raise ValueError(f"Compression is not supported for {source_format.value} files")
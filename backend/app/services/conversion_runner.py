@@ -0,0 +1,346 @@
+"""Conversion pipeline shared by the API (inline mode) and queue workers."""
+
+import asyncio
+import logging
+import os
+from dataclasses import asdict, dataclass
+
+from app.config import settings
+from app.dependencies import get_job_queue
+from app.models import ConversionStatus, FileFormat, FORMAT_TO_EXTENSION
+from app.services import metrics
+from app.services.converter import convert_file, get_supported_targets
+from app.services.converters.result import (
+    ConvertedFile,
+    discard_result,
+    result_size,
+    result_source,
+)
+from app.services.result_cache import disk_cache, find_stored_result
+from app.services.storage import StorageBackend
+from app.services.task_store import TaskPhase, update_task
+from app.utils.mime import validate_file_type
+from app.utils.upload import SpooledUpload
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_MAP = {
+    FileFormat.JPG: "image/jpeg",
+    FileFormat.PNG: "image/png",
+    FileFormat.GIF: "image/gif",
+    FileFormat.SVG: "image/svg+xml",
+    FileFormat.PDF: "application/pdf",
+    FileFormat.DOCX: "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    FileFormat.PPTX: "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    FileFormat.TXT: "text/plain",
+}
+
+# Upper bounds for the SVG render options, so surfaces stay a sane size
+MAX_RENDER_SIDE = 8192
+MAX_RENDER_DPI = 1200
+
+
+@dataclass
+class ConversionJob:
+    conversion_id: str
+    filename: str
+    source_format: FileFormat
+    target_format: FileFormat
+    content_type: str
+    selected_pages: list[int] | None = None
+    # width, height and dpi for SVG sources (see parse_render_options)
+    render_options: dict | None = None
+    cache_key: str | None = None
+    # Set once the original is in storage (always the case for queued jobs)
+    original_path: str | None = None
+
+    def to_payload(self) -> dict:
+        payload = asdict(self)
+        payload["source_format"] = self.source_format.value
+        payload["target_format"] = self.target_format.value
+        return payload
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "ConversionJob":
+        fields = {k: v for k, v in payload.items() if k in cls.__dataclass_fields__}
+        fields["source_format"] = FileFormat(fields["source_format"])
+        fields["target_format"] = FileFormat(fields["target_format"])
+        return cls(**fields)
+
+
+def check_conversion(
+    filename: str, upload: SpooledUpload, target_format: FileFormat
+) -> FileFormat:
+    """Validate an upload for conversion and return its source format.
+
+    Raises ValueError if the file type is not allowed or cannot be converted
+    to target_format.
+    """
+    # Validate the file type from the leading bytes
+    source_format = validate_file_type(filename, upload.head, upload.path)
+
+    # Check conversion is supported
+    supported = get_supported_targets(source_format)
+    if target_format not in supported:
+        raise ValueError(
+            f"Cannot convert {source_format.value} to {target_format.value}. "
+            f"Supported targets: {[t.value for t in supported]}"
+        )
+    return source_format
+
+
+def parse_render_options(fields: dict[str, str]) -> dict[str, int]:
+    """Read the optional SVG output size from form fields.
+
+    width and height are pixels and dpi the raster resolution; all are
+    positive integers, capped at MAX_RENDER_SIDE and MAX_RENDER_DPI. Raises
+    ValueError on a bad value.
+    """
+    options = {}
+    limits = {"width": MAX_RENDER_SIDE, "height": MAX_RENDER_SIDE, "dpi": MAX_RENDER_DPI}
+    for name, limit in limits.items():
+        value = fields.get(name)
+        if value is None or value == "":
+            continue
+        try:
+            number = int(value)
+        except ValueError:
+            raise ValueError(f"{name} must be an integer") from None
+        if not 0 < number <= limit:
+            raise ValueError(f"{name} must be between 1 and {limit}")
+        options[name] = number
+    return options
+
+
+def converted_name_for(job: ConversionJob) -> tuple[str, str]:
+    """Return the (file name, content type) of the job's converted output."""
+    base_name = job.filename.rsplit(".", 1)[0] if "." in job.filename else job.filename
+
+    is_pdf_to_image = (
+        job.source_format == FileFormat.PDF
+        and job.target_format in (FileFormat.JPG, FileFormat.PNG, FileFormat.GIF)
+    )
+    is_single_page = (
+        is_pdf_to_image
+        and job.selected_pages is not None
+        and len(job.selected_pages) == 1
+    )
+    if is_pdf_to_image and not is_single_page:
+        return base_name + ".zip", "application/zip"
+    return base_name + FORMAT_TO_EXTENSION[job.target_format], CONTENT_TYPE_MAP[job.target_format]
+
+
+def converted_path_for(job: ConversionJob, attempt: int | None = None) -> str:
+    """Storage path of the job's converted output; see run_conversion."""
+    converted_name, _ = converted_name_for(job)
+    if attempt is not None:
+        return f"converted/{job.conversion_id}/{attempt}/{converted_name}"
+    return f"converted/{job.conversion_id}/{converted_name}"
+
+
+async def run_conversion(
+    job: ConversionJob,
+    input_path: str,
+    client,
+    storage: StorageBackend,
+    attempt: int | None = None,
+) -> None:
+    """Upload, convert and record a conversion. Raises on failure.
+
+    Queued jobs pass their attempt number, which keeps the result of a
+    worker that lost its lease apart from the one that took the job over.
+    """
+    conversion_id = job.conversion_id
+    labels = {"source": job.source_format.value, "target": job.target_format.value}
+    original_upload: asyncio.Task | None = None
+    converted: bytes | ConvertedFile | None = None
+    in_flight = metrics.IN_FLIGHT.labels(kind="conversion")
+    in_flight.inc()
+    try:
+        # Identical earlier conversion: copy its result within the bucket, so
+        # this one downloads under its own file name
+        if job.cache_key is not None:
+            stored = await find_stored_result(client, "conversion_logs", job.cache_key)
+            if stored and stored.get("converted_storage_path"):
+                converted_path = converted_path_for(job, attempt)
+                with metrics.observe(
+                    metrics.CONVERSION_PHASE_SECONDS,
+                    phase=TaskPhase.UPLOADING_RESULT.value,
+                    **labels,
+                ):
+                    await storage.copy_file(stored["converted_storage_path"], converted_path)
+                await client.table("conversion_logs").update(
+                    {
+                        "status": ConversionStatus.COMPLETED.value,
+                        # The identical original is never downloaded
+                        "original_storage_path": job.original_path
+                        or stored["original_storage_path"],
+                        "converted_storage_path": converted_path,
+                    }
+                ).eq("id", conversion_id).execute()
+                update_task(
+                    conversion_id,
+                    phase=TaskPhase.COMPLETED,
+                    progress=100,
+                    message="Conversion complete",
+                )
+                metrics.CONVERSIONS.labels(**labels, status="cached").inc()
+                return
+
+        # Upload the original in the background while converting
+        original_path = job.original_path
+        if original_path is None:
+            original_path = f"originals/{conversion_id}/{job.filename}"
+
+            async def upload_original() -> None:
+                with metrics.observe(
+                    metrics.CONVERSION_PHASE_SECONDS,
+                    phase=TaskPhase.UPLOADING_ORIGINAL.value,
+                    **labels,
+                ):
+                    await storage.upload_file(original_path, input_path, job.content_type)
+
+            original_upload = asyncio.create_task(upload_original())
+        metrics.CONVERSION_INPUT_BYTES.labels(**labels).observe(os.path.getsize(input_path))
+
+        # Convert
+        update_task(
+            conversion_id,
+            phase=TaskPhase.CONVERTING,
+            progress=0,
+            message="Starting conversion...",
+        )
+
+        def progress_cb(progress: int, message: str) -> None:
+            update_task(
+                conversion_id,
+                phase=TaskPhase.CONVERTING,
+                progress=progress,
+                message=message,
+            )
+
+        with metrics.observe(
+            metrics.CONVERSION_PHASE_SECONDS, phase=TaskPhase.CONVERTING.value, **labels
+        ):
+            if job.cache_key is not None:
+                cached_path = await asyncio.to_thread(disk_cache.get_file, job.cache_key)
+                if cached_path is not None:
+                    converted = ConvertedFile(cached_path)
+            if converted is None:
+                converted = await convert_file(
+                    input_path,
+                    job.source_format,
+                    job.target_format,
+                    selected_pages=job.selected_pages,
+                    progress_cb=progress_cb,
+                    render_options=job.render_options,
+                )
+                if job.cache_key is not None:
+                    await asyncio.to_thread(
+                        disk_cache.put, job.cache_key, result_source(converted)
+                    )
+        metrics.CONVERSION_OUTPUT_BYTES.labels(**labels).observe(result_size(converted))
+
+        # Upload converted
+        update_task(
+            conversion_id,
+            phase=TaskPhase.UPLOADING_RESULT,
+            progress=0,
+            message="Uploading converted file...",
+        )
+        if original_upload is not None:
+            await original_upload
+
+        _, content_type = converted_name_for(job)
+        converted_path = converted_path_for(job, attempt)
+        with metrics.observe(
+            metrics.CONVERSION_PHASE_SECONDS, phase=TaskPhase.UPLOADING_RESULT.value, **labels
+        ):
+            # Large results go up from disk in chunks
+            await storage.upload_file(converted_path, result_source(converted), content_type)
+
+        # Update log
+        await client.table("conversion_logs").update(
+            {
+                "status": ConversionStatus.COMPLETED.value,
+                "original_storage_path": original_path,
+                "converted_storage_path": converted_path,
+            }
+        ).eq("id", conversion_id).execute()
+
+        update_task(
+            conversion_id,
+            phase=TaskPhase.COMPLETED,
+            progress=100,
+            message="Conversion complete",
+        )
+        metrics.CONVERSIONS.labels(**labels, status="completed").inc()
+    except Exception as e:
+        metrics.CONVERSIONS.labels(**labels, status="failed").inc()
+        metrics.CONVERSION_ERRORS.labels(**labels, error=metrics.error_class(e)).inc()
+        raise
+    finally:
+        in_flight.dec()
+        metrics.refresh_converter_pool_rss()
+        discard_result(converted)
+        # The original upload still reads the input file
+        if original_upload is not None and not original_upload.done():
+            original_upload.cancel()
+            await asyncio.gather(original_upload, return_exceptions=True)
+
+
+async def record_conversion_failure(conversion_id: str, error: str, client) -> None:
+    await client.table("conversion_logs").update(
+        {
+            "status": ConversionStatus.FAILED.value,
+            "error_message": error,
+        }
+    ).eq("id", conversion_id).execute()
+
+    update_task(
+        conversion_id,
+        phase=TaskPhase.FAILED,
+        progress=0,
+        message="Conversion failed",
+        error=error,
+    )
+
+
+async def run_conversion_inline(
+    job: ConversionJob, input_path: str, client, storage: StorageBackend
+) -> None:
+    """Background task for the inline (no queue) mode; owns input_path."""
+    try:
+        await run_conversion(job, input_path, client, storage)
+    except Exception as e:
+        logger.exception("Conversion %s failed", job.conversion_id)
+        await record_conversion_failure(job.conversion_id, str(e), client)
+    finally:
+        try:
+            os.remove(input_path)
+        except FileNotFoundError:
+            pass
+
+
+async def enqueue_conversion(
+    job: ConversionJob, upload: SpooledUpload, storage: StorageBackend, priority: int
+) -> None:
+    """Store the original so any worker can run the job, then enqueue it."""
+    job.original_path = f"originals/{job.conversion_id}/{job.filename}"
+    with metrics.observe(
+        metrics.CONVERSION_PHASE_SECONDS,
+        phase=TaskPhase.UPLOADING_ORIGINAL.value,
+        source=job.source_format.value,
+        target=job.target_format.value,
+    ):
+        await storage.upload_file(job.original_path, upload.path, upload.content_type)
+
+    payload = job.to_payload()
+    if settings.embedded_worker and settings.job_queue_backend == "sqlite":
+        # Every worker is on this host and can skip downloading the original
+        payload["input_path"] = upload.path
+    else:
+        upload.remove()
+
+    queue = await get_job_queue()
+    await queue.enqueue(job.conversion_id, payload, priority=priority)
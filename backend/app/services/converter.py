@@ -1,80 +1,151 @@
-import asyncio
-from collections.abc import Callable
+"""Conversion registry.
+
+Converter backends (Pillow, cairosvg, pdf2image, python-docx, fpdf2,
+LibreOffice) are only imported when a conversion first needs them, so the
+API starts without paying for libraries it may never use. ``warm_up`` loads
+chosen backends ahead of time instead.
+"""
+
+import importlib
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from typing import Union
 
 from app.models import FileFormat
-from app.services.converters.document import (
-    convert_docx_to_txt,
-    convert_txt_to_docx,
-    convert_txt_to_pdf,
-)
-from app.services.converters.image import convert_image
-from app.services.converters.libreoffice import convert_with_libreoffice
-from app.services.converters.pdf import convert_pdf_to_docx, convert_pdf_to_image
-from app.services.converters.svg import convert_svg
+from app.services.converters.result import ConvertedFile
+from app.services.executor import run_in_pool
+
+logger = logging.getLogger(__name__)
 
+# Converters take the path of the input file on local disk
 ConverterFn = Union[
-    Callable[[bytes, FileFormat, FileFormat], bytes],
-    Callable[[bytes, FileFormat, FileFormat], "asyncio.coroutines"],
+    Callable[..., bytes | ConvertedFile],
+    Callable[..., Awaitable[bytes]],
 ]
 
+# Modules under app.services.converters, in warm-up order
+BACKENDS = ("image", "svg", "pdf", "document", "libreoffice")
+
+
+@dataclass(frozen=True)
+class LazyConverter:
+    """A converter function that is imported on first use.
+
+    Calling it imports the backend, so pool jobs pickle just the names and
+    only the worker process ever loads the library.
+    """
+
+    backend: str
+    name: str
+    takes_pages: bool = False
+    # Accepts width, height and dpi for the rendered output
+    takes_render_options: bool = False
+    # Async converters wait on subprocesses in the calling process
+    in_pool: bool = True
+
+    def load(self) -> ConverterFn:
+        module = importlib.import_module(f"app.services.converters.{self.backend}")
+        return getattr(module, self.name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+
+_image = LazyConverter("image", "convert_image")
+_svg = LazyConverter("svg", "convert_svg", takes_render_options=True)
+_pdf_to_image = LazyConverter("pdf", "convert_pdf_to_image", takes_pages=True)
+_libreoffice = LazyConverter("libreoffice", "convert_with_libreoffice", in_pool=False)
+
 # Maps (source_format, target_format) to converter function
-CONVERSION_MATRIX: dict[tuple[FileFormat, FileFormat], ConverterFn] = {
+CONVERSION_MATRIX: dict[tuple[FileFormat, FileFormat], LazyConverter] = {
     # Image conversions
-    (FileFormat.JPG, FileFormat.PNG): convert_image,
-    (FileFormat.JPG, FileFormat.GIF): convert_image,
-    (FileFormat.PNG, FileFormat.JPG): convert_image,
-    (FileFormat.PNG, FileFormat.GIF): convert_image,
-    (FileFormat.GIF, FileFormat.JPG): convert_image,
-    (FileFormat.GIF, FileFormat.PNG): convert_image,
+    (FileFormat.JPG, FileFormat.PNG): _image,
+    (FileFormat.JPG, FileFormat.GIF): _image,
+    (FileFormat.PNG, FileFormat.JPG): _image,
+    (FileFormat.PNG, FileFormat.GIF): _image,
+    (FileFormat.GIF, FileFormat.JPG): _image,
+    (FileFormat.GIF, FileFormat.PNG): _image,
     # SVG conversions
-    (FileFormat.SVG, FileFormat.PNG): convert_svg,
-    (FileFormat.SVG, FileFormat.JPG): convert_svg,
-    (FileFormat.SVG, FileFormat.GIF): convert_svg,
-    (FileFormat.SVG, FileFormat.PDF): convert_svg,
+    (FileFormat.SVG, FileFormat.PNG): _svg,
+    (FileFormat.SVG, FileFormat.JPG): _svg,
+    (FileFormat.SVG, FileFormat.GIF): _svg,
+    (FileFormat.SVG, FileFormat.PDF): _svg,
     # PDF conversions
-    (FileFormat.PDF, FileFormat.JPG): convert_pdf_to_image,
-    (FileFormat.PDF, FileFormat.PNG): convert_pdf_to_image,
-    (FileFormat.PDF, FileFormat.GIF): convert_pdf_to_image,
-    (FileFormat.PDF, FileFormat.DOCX): convert_pdf_to_docx,
+    (FileFormat.PDF, FileFormat.JPG): _pdf_to_image,
+    (FileFormat.PDF, FileFormat.PNG): _pdf_to_image,
+    (FileFormat.PDF, FileFormat.GIF): _pdf_to_image,
+    (FileFormat.PDF, FileFormat.DOCX): LazyConverter(
+        "pdf_docx", "convert_pdf_to_docx", takes_pages=True, in_pool=False
+    ),
     # Document conversions
-    (FileFormat.DOCX, FileFormat.TXT): convert_docx_to_txt,
-    (FileFormat.DOCX, FileFormat.PDF): convert_with_libreoffice,
-    (FileFormat.PPTX, FileFormat.PDF): convert_with_libreoffice,
-    (FileFormat.TXT, FileFormat.DOCX): convert_txt_to_docx,
-    (FileFormat.TXT, FileFormat.PDF): convert_txt_to_pdf,
+    (FileFormat.DOCX, FileFormat.TXT): LazyConverter("document", "convert_docx_to_txt"),
+    (FileFormat.DOCX, FileFormat.PDF): _libreoffice,
+    (FileFormat.PPTX, FileFormat.PDF): _libreoffice,
+    (FileFormat.TXT, FileFormat.DOCX): LazyConverter("document", "convert_txt_to_docx"),
+    (FileFormat.TXT, FileFormat.PDF): LazyConverter("document", "convert_txt_to_pdf"),
 }
 
 
+def warm_up(backends: list[str]) -> list[str]:
+    """Import backends and run their warm_up hook (fonts, codecs, native libs).
+
+    Failures are logged and skipped; returns the backends that warmed up.
+    """
+    warmed = []
+    for backend in backends:
+        if backend not in BACKENDS:
+            logger.warning("Unknown converter backend %r, not warming it", backend)
+            continue
+        try:
+            module = importlib.import_module(f"app.services.converters.{backend}")
+            hook = getattr(module, "warm_up", None)
+            if hook is not None:
+                hook()
+        except Exception as e:
+            # Usually a missing system dependency (poppler, cairo)
+            logger.warning("Warming up %s converters failed: %s", backend, e)
+            continue
+        warmed.append(backend)
+    return warmed
+
+
 def get_supported_targets(source: FileFormat) -> list[FileFormat]:
     """Return list of formats this source can be converted to."""
     return [target for (src, target) in CONVERSION_MATRIX if src == source]
 
 
 async def convert_file(
-    input_bytes: bytes,
+    input_path: str,
     source: FileFormat,
     target: FileFormat,
     selected_pages: list[int] | None = None,
     progress_cb: Callable[[int, str], None] | None = None,
-) -> bytes:
-    """Run the appropriate converter. Raises ValueError if unsupported."""
-    converter = CONVERSION_MATRIX.get((source, target))
-    if converter is None:
+    render_options: dict | None = None,
+) -> bytes | ConvertedFile:
+    """Run the appropriate converter. Raises ValueError if unsupported.
+
+    Large outputs come back as a ConvertedFile the caller must remove.
+    """
+    entry = CONVERSION_MATRIX.get((source, target))
+    if entry is None:
         raise ValueError(
             f"Conversion from {source.value} to {target.value} is not supported"
         )
 
     kwargs: dict = {}
-    if progress_cb is not None:
-        kwargs["progress_cb"] = progress_cb
-    if converter is convert_pdf_to_image and selected_pages is not None:
+    if entry.takes_pages and selected_pages is not None:
         kwargs["selected_pages"] = selected_pages
+    if entry.takes_render_options and render_options:
+        kwargs.update(render_options)
 
-    result = converter(input_bytes, source, target, **kwargs)
-
-    # Handle async converters (like libreoffice)
-    if asyncio.iscoroutine(result):
-        result = await result
+    # Async converters (like libreoffice) only wait on subprocesses
+    if not entry.in_pool:
+        if progress_cb is not None:
+            kwargs["progress_cb"] = progress_cb
+        return await entry.load()(input_path, source, target, **kwargs)
 
-    return result
+    # CPU-bound converters run in the process pool to keep the event loop free
+    return await run_in_pool(
+        entry, input_path, source, target, progress_cb=progress_cb, **kwargs
+    )
@@ -1,61 +1,139 @@
+import codecs
 import io
-from collections.abc import Callable
-
-from docx import Document
-from fpdf import FPDF
+import os
+import tempfile
+from collections.abc import Callable, Iterator
 
+from app.config import settings
 from app.models import FileFormat
+from app.services.converters.result import ConvertedFile
+from app.utils.docx_text import iter_docx_lines
+from app.utils.text_writer import DOCX_TEMPLATE, TextDocxWriter, TextPdfWriter
+
+TEXT_CHUNK_BYTES = 64 * 1024  # longest piece of a line read at once
 
 
 def convert_docx_to_txt(
-    input_bytes: bytes,
+    input_path: str,
     source: FileFormat,
     target: FileFormat,
     progress_cb: Callable[[int, str], None] | None = None,
-) -> bytes:
-    """Extract text from DOCX."""
+) -> ConvertedFile:
+    """Extract text from DOCX, one line per paragraph or table row."""
+    message = "Extracting text from document..."
     if progress_cb:
-        progress_cb(50, "Extracting text from document...")
-    doc = Document(io.BytesIO(input_bytes))
-    text = "\n".join(p.text for p in doc.paragraphs)
-    return text.encode("utf-8")
+        progress_cb(5, message)
+    report = _progress_reporter(progress_cb, message)
+
+    os.makedirs(settings.temp_dir, exist_ok=True)
+    fd, output_path = tempfile.mkstemp(dir=settings.temp_dir, prefix="text-", suffix=".txt")
+    try:
+        with open(fd, "w", encoding="utf-8", newline="") as f:
+            for i, line in enumerate(iter_docx_lines(input_path, report)):
+                if i:
+                    f.write("\n")
+                f.write(line)
+    except BaseException:
+        os.remove(output_path)
+        raise
+    return ConvertedFile(output_path)
 
 
 def convert_txt_to_docx(
-    input_bytes: bytes,
+    input_path: str,
     source: FileFormat,
     target: FileFormat,
     progress_cb: Callable[[int, str], None] | None = None,
-) -> bytes:
-    """Create a DOCX from plain text."""
-    if progress_cb:
-        progress_cb(50, "Creating document...")
-    text = input_bytes.decode("utf-8")
-    doc = Document()
-    for line in text.split("\n"):
-        doc.add_paragraph(line)
-
-    output = io.BytesIO()
-    doc.save(output)
-    return output.getvalue()
+) -> ConvertedFile:
+    """Create a DOCX from plain text, one paragraph per line."""
+    return _write_text_document(
+        input_path, TextDocxWriter, "docx", "Creating document...", progress_cb
+    )
 
 
 def convert_txt_to_pdf(
-    input_bytes: bytes,
+    input_path: str,
     source: FileFormat,
     target: FileFormat,
     progress_cb: Callable[[int, str], None] | None = None,
-) -> bytes:
-    """Create a PDF from plain text using fpdf2."""
+) -> ConvertedFile:
+    """Create a PDF from plain text, laid out as fpdf2's multi_cell would."""
+    return _write_text_document(
+        input_path, TextPdfWriter, "pdf", "Generating PDF...", progress_cb
+    )
+
+
+def _write_text_document(
+    input_path: str,
+    writer_cls: type[TextPdfWriter] | type[TextDocxWriter],
+    ext: str,
+    message: str,
+    progress_cb: Callable[[int, str], None] | None,
+) -> ConvertedFile:
+    """Stream the text file through writer_cls into a file in temp_dir."""
     if progress_cb:
-        progress_cb(50, "Generating PDF...")
-    text = input_bytes.decode("utf-8")
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.set_font("Helvetica", size=11)
+        progress_cb(5, message)
+
+    os.makedirs(settings.temp_dir, exist_ok=True)
+    fd, output_path = tempfile.mkstemp(dir=settings.temp_dir, prefix="text-", suffix=f".{ext}")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer = writer_cls(f)
+            for text, line_end in _read_text(input_path, progress_cb, message):
+                writer.add_line(text, continues=not line_end)
+            writer.close()
+    except BaseException:
+        os.remove(output_path)
+        raise
+    return ConvertedFile(output_path)
+
+
+def _read_text(
+    input_path: str,
+    progress_cb: Callable[[int, str], None] | None,
+    message: str,
+) -> Iterator[tuple[str, bool]]:
+    """Yield (text, ends_line) for each line of a UTF-8 file.
+
+    Lines longer than TEXT_CHUNK_BYTES come in several pieces, only the last
+    of which ends the line, so memory stays bounded whatever the input.
+    Progress follows the bytes read.
+    """
+    total = max(1, os.path.getsize(input_path))
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    report = _progress_reporter(progress_cb, message)
+    done = 0
+    with open(input_path, "rb") as f:
+        while raw := f.readline(TEXT_CHUNK_BYTES):
+            done += len(raw)
+            line_end = raw.endswith(b"\n")
+            text = decoder.decode(raw)
+            yield text.rstrip("\r\n") if line_end else text, line_end
+            report(done / total)
+    decoder.decode(b"", final=True)
+
+
+def _progress_reporter(
+    progress_cb: Callable[[int, str], None] | None, message: str
+) -> Callable[[float], None]:
+    """Map a completed fraction onto 5-95%, reporting each percent once."""
+    reported = 5
+
+    def report(fraction: float) -> None:
+        nonlocal reported
+        pct = 5 + int(90 * fraction)
+        if progress_cb and pct > reported:
+            reported = pct
+            progress_cb(pct, message)
+
+    return report
 
-    for line in text.split("\n"):
-        pdf.multi_cell(0, 6, line)
 
-    return pdf.output()
+def warm_up() -> None:
+    """Load the text writers, python-docx's default template and the XML parser."""
+    for writer_cls in (TextPdfWriter, TextDocxWriter):
+        writer = writer_cls(io.BytesIO())
+        writer.add_line("Aa")
+        writer.close()
+    for _ in iter_docx_lines(DOCX_TEMPLATE):
+        pass
@@ -7,13 +7,13 @@ from app.models import FileFormat
 
 
 def convert_image(
-    input_bytes: bytes,
+    input_path: str,
     source: FileFormat,
     target: FileFormat,
     progress_cb: Callable[[int, str], None] | None = None,
 ) -> bytes:
     """Convert between JPG, PNG, and GIF using Pillow."""
-    img = Image.open(io.BytesIO(input_bytes))
+    img = Image.open(input_path)
 
     # Handle RGBA → RGB for JPG (no alpha channel)
     if target == FileFormat.JPG and img.mode in ("RGBA", "P"):
@@ -39,3 +39,11 @@ def convert_image(
     output = io.BytesIO()
     img.save(output, format=format_map[target])
     return output.getvalue()
+
+
+def warm_up() -> None:
+    """Load Pillow's plugins and the JPEG, PNG and GIF codecs."""
+    Image.init()
+    img = Image.new("RGB", (8, 8))
+    for pil_format in ("JPEG", "PNG", "GIF"):
+        img.save(io.BytesIO(), format=pil_format)
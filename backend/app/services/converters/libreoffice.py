@@ -1,14 +1,17 @@
 import asyncio
 import os
+import shutil
 import tempfile
 from collections.abc import Callable
 
 from app.config import settings
 from app.models import FileFormat
+from app.services.libreoffice_pool import get_libreoffice_pool
+from app.services.metrics import LIBREOFFICE_SECONDS, observe
 
 
 async def convert_with_libreoffice(
-    input_bytes: bytes,
+    input_path: str,
     source: FileFormat,
     target: FileFormat,
     progress_cb: Callable[[int, str], None] | None = None,
@@ -19,26 +22,42 @@ async def convert_with_libreoffice(
     if input_ext is None:
         raise ValueError(f"LibreOffice converter does not support {source}")
 
-    if progress_cb:
-        progress_cb(10, "Starting LibreOffice...")
-
     with tempfile.TemporaryDirectory(dir=settings.temp_dir) as tmp:
-        input_path = os.path.join(tmp, f"input{input_ext}")
-        with open(input_path, "wb") as f:
-            f.write(input_bytes)
-
-        process = await asyncio.create_subprocess_exec(
-            "libreoffice",
-            "--headless",
-            "--convert-to",
-            "pdf",
-            "--outdir",
-            tmp,
-            input_path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await process.communicate()
+        # soffice picks the import filter and output name from the file name,
+        # and the spooled upload has no extension
+        work_path = os.path.join(tmp, f"input{input_ext}")
+        shutil.copyfile(input_path, work_path)
+
+        if settings.libreoffice_pool_size > 0:
+            if progress_cb:
+                progress_cb(10, "Waiting for LibreOffice...")
+            pool = await get_libreoffice_pool()
+            if progress_cb:
+                progress_cb(20, "Rendering document...")
+            with observe(LIBREOFFICE_SECONDS, mode="pool"):
+                result = await pool.convert(work_path, convert_to="pdf")
+            if progress_cb:
+                progress_cb(90, "Conversion complete")
+            return result
+
+        if progress_cb:
+            progress_cb(10, "Starting LibreOffice...")
+
+        with observe(LIBREOFFICE_SECONDS, mode="subprocess"):
+            process = await asyncio.create_subprocess_exec(
+                "libreoffice",
+                "--headless",
+                # Isolated profile so concurrent runs don't collide on the default one
+                f"-env:UserInstallation=file://{os.path.join(tmp, 'profile')}",
+                "--convert-to",
+                "pdf",
+                "--outdir",
+                tmp,
+                work_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, stderr = await process.communicate()
 
         if process.returncode != 0:
             raise RuntimeError(
@@ -2,45 +2,102 @@ import io
 import os
 import tempfile
 import zipfile
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_bytes, convert_from_path, pdfinfo_from_path
 from PIL import Image
 
 from app.config import settings
 from app.models import FileFormat
+from app.services.converters.result import ConvertedFile
+from app.utils.archive import zip_entry
 
 MAX_PDF_PAGES = 50
+PDF_RENDER_THREADS = min(4, os.cpu_count() or 1)
+
+
+def _render_batches(pages: list[int]) -> list[tuple[int, int]]:
+    """Split pages, in order, into runs of consecutive pages rendered together.
+
+    Each run is at most PDF_RENDER_THREADS long, so only that many rendered
+    pages are in memory at once.
+    """
+    batches: list[tuple[int, int]] = []
+    for page in pages:
+        if (
+            batches
+            and page == batches[-1][1] + 1
+            and page - batches[-1][0] < PDF_RENDER_THREADS
+        ):
+            batches[-1] = (batches[-1][0], page)
+        else:
+            batches.append((page, page))
+    return batches
+
+
+def _render_pages(input_path: str, pages: list[int]) -> Iterator[Image.Image]:
+    """Yield the rendered pages in order, a small batch at a time."""
+    for first, last in _render_batches(pages):
+        # pdf2image page numbers are 1-based and inclusive
+        yield from convert_from_path(
+            input_path,
+            dpi=200,
+            first_page=first + 1,
+            last_page=last + 1,
+            thread_count=last - first + 1,
+        )
+
+
+def _encode(img: Image.Image, pil_format: str, mode: str | None) -> bytes:
+    if mode and img.mode != mode:
+        img = img.convert(mode)
+    buffer = io.BytesIO()
+    img.save(buffer, format=pil_format)
+    return buffer.getvalue()
 
 
 def convert_pdf_to_image(
-    input_bytes: bytes,
+    input_path: str,
     source: FileFormat,
     target: FileFormat,
     selected_pages: list[int] | None = None,
     progress_cb: Callable[[int, str], None] | None = None,
-) -> bytes:
-    """Convert PDF pages to images. Returns raw image bytes for a single page, or a ZIP archive for multiple pages."""
+) -> bytes | ConvertedFile:
+    """Convert PDF pages to images.
+
+    Returns raw image bytes for a single page. Several pages are encoded as
+    they are rendered and written to a ZIP file on disk, so only a render
+    batch is in memory at once; the file is returned as a ConvertedFile.
+
+    The archive is finished before it is uploaded rather than streamed into
+    the upload: it is built in a pool worker while the upload runs in the
+    parent, the disk cache keeps a hard link to the file, and a resumable
+    upload needs the final size and can resume from the file.
+    """
     if progress_cb:
         progress_cb(5, "Extracting pages from PDF...")
 
-    images = convert_from_bytes(input_bytes, dpi=200)
-    if not images:
+    page_count = int(pdfinfo_from_path(input_path).get("Pages", 0))
+    if not page_count:
         raise ValueError("Could not extract pages from PDF")
-    if len(images) > MAX_PDF_PAGES:
-        raise ValueError(f"PDF has {len(images)} pages, maximum is {MAX_PDF_PAGES}")
 
     if selected_pages is not None:
         for idx in selected_pages:
-            if idx < 0 or idx >= len(images):
+            if idx < 0 or idx >= page_count:
                 raise ValueError(
-                    f"Invalid page index {idx}. PDF has {len(images)} pages (valid: 0-{len(images) - 1})"
+                    f"Invalid page index {idx}. PDF has {page_count} pages (valid: 0-{page_count - 1})"
                 )
-        images = [images[i] for i in selected_pages]
+        wanted = selected_pages
+    else:
+        wanted = list(range(page_count))
+
+    # Repeated indexes are each rendered, so they count against the limit
+    total = len(wanted)
+    if total > MAX_PDF_PAGES:
+        raise ValueError(f"Requested {total} pages, maximum is {MAX_PDF_PAGES}")
 
-    total = len(images)
     if progress_cb:
-        progress_cb(10, f"Extracted {total} page{'s' if total != 1 else ''}")
+        progress_cb(10, f"Extracting {total} page{'s' if total != 1 else ''}")
 
     format_map = {
         FileFormat.JPG: ("JPEG", "RGB", "jpg"),
@@ -50,56 +107,58 @@ def convert_pdf_to_image(
 
     pil_format, mode, ext = format_map[target]
 
-    if len(images) == 1:
-        img = images[0]
-        if mode and img.mode != mode:
-            img = img.convert(mode)
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format=pil_format)
+    if total == 1:
+        (img,) = _render_pages(input_path, wanted)
+        data = _encode(img, pil_format, mode)
         if progress_cb:
             progress_cb(90, "Page converted")
-        return img_buffer.getvalue()
-
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for i, img in enumerate(images, start=1):
-            if mode and img.mode != mode:
-                img = img.convert(mode)
-            img_buffer = io.BytesIO()
-            img.save(img_buffer, format=pil_format)
-            zf.writestr(f"page_{i}.{ext}", img_buffer.getvalue())
-            if progress_cb:
-                pct = 10 + int(80 * i / total)
-                progress_cb(pct, f"Converting page {i} of {total}")
-
-    return zip_buffer.getvalue()
-
-
-def convert_pdf_to_docx(
-    input_bytes: bytes,
-    source: FileFormat,
-    target: FileFormat,
-    progress_cb: Callable[[int, str], None] | None = None,
-) -> bytes:
-    """Convert PDF to DOCX using pdf2docx."""
-    from pdf2docx import Converter
-
-    if progress_cb:
-        progress_cb(10, "Parsing PDF structure...")
-
-    with tempfile.TemporaryDirectory(dir=settings.temp_dir) as tmp:
-        pdf_path = os.path.join(tmp, "input.pdf")
-        docx_path = os.path.join(tmp, "output.docx")
-
-        with open(pdf_path, "wb") as f:
-            f.write(input_bytes)
-
-        cv = Converter(pdf_path)
-        cv.convert(docx_path)
-        cv.close()
-
-        if progress_cb:
-            progress_cb(90, "PDF converted to DOCX")
-
-        with open(docx_path, "rb") as f:
-            return f.read()
+        return data
+
+    os.makedirs(settings.temp_dir, exist_ok=True)
+    fd, zip_path = tempfile.mkstemp(dir=settings.temp_dir, prefix="pages-", suffix=".zip")
+    try:
+        with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w") as zf:
+            for i, img in enumerate(_render_pages(input_path, wanted), start=1):
+                zf.writestr(zip_entry(f"page_{i}.{ext}"), _encode(img, pil_format, mode))
+                img.close()
+                if progress_cb:
+                    pct = 10 + int(80 * i / total)
+                    progress_cb(pct, f"Converting page {i} of {total}")
+    except BaseException:
+        os.remove(zip_path)
+        raise
+
+    return ConvertedFile(zip_path)
+
+
+def _sample_pdf() -> bytes:
+    """A one-page PDF with a line of Helvetica text."""
+    content = b"BT /F1 12 Tf 10 10 Td (Aa) Tj ET"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 72 36]"
+        b" /Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return bytes(out)
+
+
+def warm_up() -> None:
+    """Import pdf2docx and render a page with poppler to load it and its fonts."""
+    import pdf2docx  # noqa: F401
+
+    convert_from_bytes(_sample_pdf(), dpi=10)
@@ -0,0 +1,139 @@
+"""PDF to DOCX with pdf2docx, parsed a page range per converter worker.
+
+Parsing (layout, tables, fonts) is nearly all of pdf2docx's time, and each
+page is parsed independently, so the pages are split into contiguous shards
+parsed in parallel across the converter pool. The parsed layouts are then
+restored into one Converter in a final job that writes the document, the
+same way pdf2docx's own multi-processing mode merges them. Header and footer
+detection runs per shard, as it does there.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import tempfile
+from collections.abc import Callable
+
+from app.config import settings
+from app.models import FileFormat
+from app.services.converters.result import ConvertedFile
+from app.services.executor import run_in_pool
+
+logger = logging.getLogger(__name__)
+
+# Fewer pages than this per worker are not worth another document open
+MIN_PAGES_PER_SHARD = 4
+
+
+async def convert_pdf_to_docx(
+    input_path: str,
+    source: FileFormat,
+    target: FileFormat,
+    selected_pages: list[int] | None = None,
+    progress_cb: Callable[[int, str], None] | None = None,
+) -> ConvertedFile:
+    """Convert the PDF, or just selected_pages (0-based), to DOCX."""
+    if progress_cb:
+        progress_cb(5, "Parsing PDF structure...")
+
+    page_count = await run_in_pool(_page_count, input_path)
+    if selected_pages is not None:
+        for idx in selected_pages:
+            if idx < 0 or idx >= page_count:
+                raise ValueError(
+                    f"Invalid page index {idx}. PDF has {page_count} pages (valid: 0-{page_count - 1})"
+                )
+        pages = sorted(set(selected_pages))
+    else:
+        pages = list(range(page_count))
+    if not pages:
+        raise ValueError("PDF has no pages")
+
+    shards = _shard_pages(pages, settings.converter_workers)
+    parsed = [0] * len(shards)
+
+    def shard_progress(index: int) -> Callable[[int, str], None]:
+        def report(pages_done: int, message: str) -> None:
+            parsed[index] = pages_done
+            if progress_cb:
+                done = sum(parsed)
+                progress_cb(10 + 75 * done // len(pages), f"Parsed page {done} of {len(pages)}")
+
+        return report
+
+    layouts = await asyncio.gather(
+        *(
+            run_in_pool(_parse_shard, input_path, shard, progress_cb=shard_progress(i))
+            for i, shard in enumerate(shards)
+        )
+    )
+
+    if progress_cb:
+        progress_cb(85, "Creating document...")
+    output_path = await run_in_pool(_make_docx, input_path, layouts)
+    if progress_cb:
+        progress_cb(95, "PDF converted to DOCX")
+    return ConvertedFile(output_path)
+
+
+def _shard_pages(pages: list[int], workers: int) -> list[list[int]]:
+    """Split pages, in order, into at most workers contiguous, even shards."""
+    count = max(1, min(workers, len(pages) // MIN_PAGES_PER_SHARD))
+    size = math.ceil(len(pages) / count)
+    return [pages[i : i + size] for i in range(0, len(pages), size)]
+
+
+def _page_count(input_path: str) -> int:
+    import pymupdf
+
+    with pymupdf.open(input_path) as doc:
+        return doc.page_count
+
+
+def _parse_shard(
+    input_path: str,
+    pages: list[int],
+    progress_cb: Callable[[int, str], None] | None = None,
+) -> dict:
+    """Parse pages and return their stored layouts (runs in a pool worker).
+
+    progress_cb receives the number of pages parsed so far, not a percentage.
+    """
+    from pdf2docx import Converter
+
+    cv = Converter(input_path)
+    try:
+        options = cv.default_settings
+        cv.load_pages(pages=pages).parse_document(**options)
+        for done, page in enumerate((p for p in cv.pages if not p.skip_parsing), start=1):
+            try:
+                page.parse(**options)
+            except Exception as e:
+                # As pdf2docx does by default, drop the page rather than the document
+                logger.warning("Skipping PDF page %d, parsing failed: %s", page.id + 1, e)
+            if progress_cb:
+                progress_cb(done, f"Parsed page {page.id + 1}")
+        return cv.store()
+    finally:
+        cv.close()
+
+
+def _make_docx(input_path: str, layouts: list[dict]) -> str:
+    """Write the parsed layouts as one DOCX in temp_dir and return its path."""
+    from pdf2docx import Converter
+
+    os.makedirs(settings.temp_dir, exist_ok=True)
+    fd, docx_path = tempfile.mkstemp(dir=settings.temp_dir, prefix="pdf-", suffix=".docx")
+    os.close(fd)
+    cv = Converter(input_path)
+    try:
+        for layout in layouts:
+            cv.restore(layout)
+        cv.make_docx(docx_path, **cv.default_settings)
+    except BaseException:
+        os.remove(docx_path)
+        raise
+    finally:
+        cv.close()
+    return docx_path
@@ -0,0 +1,34 @@
+import os
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ConvertedFile:
+    """Converter output written to a local file instead of returned as bytes.
+
+    Used for outputs too large to hold in memory (multi-page archives). The
+    caller owns the file and removes it once uploaded.
+    """
+
+    path: str
+
+
+def result_size(result: bytes | ConvertedFile) -> int:
+    if isinstance(result, ConvertedFile):
+        return os.path.getsize(result.path)
+    return len(result)
+
+
+def result_source(result: bytes | ConvertedFile) -> bytes | str:
+    """The result in the form storage and the disk cache take (bytes or a path)."""
+    if isinstance(result, ConvertedFile):
+        return result.path
+    return result
+
+
+def discard_result(result: bytes | ConvertedFile | None) -> None:
+    if isinstance(result, ConvertedFile):
+        try:
+            os.remove(result.path)
+        except FileNotFoundError:
+            pass
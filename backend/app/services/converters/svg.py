@@ -1,44 +1,161 @@
+"""SVG rendering with cairosvg.
+
+Raster targets are drawn into a cairo image surface and encoded straight
+from its pixel buffer, without a PNG encode and decode in between. Parsed
+SVG trees are kept per worker, so converting one upload to several targets
+or sizes parses it once.
+"""
+
+import hashlib
 import io
+import sys
+from collections import OrderedDict
 from collections.abc import Callable
 
 import cairosvg
+from cairosvg.parser import Node, Tree
+from cairosvg.surface import PDFSurface, PNGSurface
 from PIL import Image
 
 from app.models import FileFormat
 
+# CSS pixels per inch, the resolution cairosvg renders at by default
+SVG_BASE_DPI = 96
+# Largest raster output; an ARGB32 surface takes 4 bytes a pixel. Checked
+# on the final size, as a large dpi on a large drawing passes each option's
+# own limit.
+SVG_MAX_PIXELS = 40_000_000
+# Parsed trees kept per worker, and the largest input worth keeping
+SVG_TREE_CACHE_SIZE = 16
+SVG_TREE_CACHE_MAX_BYTES = 1024 * 1024
+# cairo's ARGB32 is a native-endian 32-bit word of premultiplied color:
+# B, G, R, A bytes on little-endian hosts
+_ARGB32_RAW_MODE = "BGRa" if sys.byteorder == "little" else "aRGB"
+
+_trees: OrderedDict[bytes, Tree] = OrderedDict()
+
 
 def convert_svg(
-    input_bytes: bytes,
+    input_path: str,
     source: FileFormat,
     target: FileFormat,
+    width: int | None = None,
+    height: int | None = None,
+    dpi: int | None = None,
     progress_cb: Callable[[int, str], None] | None = None,
 ) -> bytes:
-    """Convert SVG to PNG, JPG, GIF, or PDF."""
+    """Convert SVG to PNG, JPG, GIF, or PDF.
+
+    width and height set the output size in pixels; given one of them, the
+    other follows the aspect ratio. Otherwise dpi scales the SVG's own size
+    for raster targets (a CSS pixel is 1/96 inch).
+    """
+    if progress_cb:
+        progress_cb(20, "Parsing SVG...")
+
+    with open(input_path, "rb") as f:
+        input_bytes = f.read()
+    tree = _parse_tree(input_bytes)
+
     if progress_cb:
         progress_cb(50, "Rendering SVG...")
 
     if target == FileFormat.PDF:
-        return cairosvg.svg2pdf(bytestring=input_bytes)
+        output = io.BytesIO()
+        surface = PDFSurface(
+            tree, output, SVG_BASE_DPI, output_width=width, output_height=height
+        )
+        surface.finish()
+        return output.getvalue()
 
-    # First convert to PNG via cairosvg
-    png_bytes = cairosvg.svg2png(bytestring=input_bytes)
+    scale = (dpi or SVG_BASE_DPI) / SVG_BASE_DPI
+    surface = _BoundedPNGSurface(
+        tree, None, SVG_BASE_DPI, scale=scale, output_width=width, output_height=height
+    )
+    try:
+        if target == FileFormat.PNG:
+            output = io.BytesIO()
+            surface.cairo.write_to_png(output)
+            return output.getvalue()
 
-    if target == FileFormat.PNG:
-        return png_bytes
+        if target in (FileFormat.JPG, FileFormat.GIF):
+            img = _surface_to_rgb(surface.cairo)
+            output = io.BytesIO()
+            img.save(output, format="JPEG" if target == FileFormat.JPG else "GIF")
+            return output.getvalue()
+    finally:
+        surface.finish()
 
-    # For JPG/GIF, use Pillow on the PNG
-    img = Image.open(io.BytesIO(png_bytes))
+    raise ValueError(f"Unsupported SVG target: {target}")
 
-    if target == FileFormat.JPG:
-        img = img.convert("RGB")
-        output = io.BytesIO()
-        img.save(output, format="JPEG")
-        return output.getvalue()
 
-    if target == FileFormat.GIF:
-        img = img.convert("RGB")
-        output = io.BytesIO()
-        img.save(output, format="GIF")
-        return output.getvalue()
+class _BoundedPNGSurface(PNGSurface):
+    """PNGSurface that refuses to allocate more than SVG_MAX_PIXELS."""
 
-    raise ValueError(f"Unsupported SVG target: {target}")
+    def _create_surface(self, width, height):
+        # Called with the final size, before any pixel memory is allocated
+        if int(width) * int(height) > SVG_MAX_PIXELS:
+            raise ValueError(
+                f"Rendered image would be {int(width)}x{int(height)} pixels; "
+                f"the limit is {SVG_MAX_PIXELS // 1_000_000} megapixels"
+            )
+        return super()._create_surface(width, height)
+
+
+def _surface_to_rgb(image_surface) -> Image.Image:
+    """Decode a cairo ARGB32 surface to RGB without a PNG round trip.
+
+    Color is un-premultiplied and alpha dropped, which is what cairo's PNG
+    writer followed by a conversion to RGB gives.
+    """
+    image_surface.flush()
+    img = Image.frombuffer(
+        "RGBa",
+        (image_surface.get_width(), image_surface.get_height()),
+        image_surface.get_data(),
+        "raw",
+        _ARGB32_RAW_MODE,
+        image_surface.get_stride(),
+        1,
+    )
+    return img.convert("RGB")
+
+
+def _parse_tree(data: bytes) -> Tree:
+    """Parse an SVG, reusing an earlier parse of the same bytes.
+
+    Rendering writes computed values back into the nodes (pattern opacity,
+    mask geometry, bounding boxes), so callers always get a private copy.
+    """
+    if len(data) > SVG_TREE_CACHE_MAX_BYTES:
+        return Tree(bytestring=data)
+    key = hashlib.sha256(data).digest()
+    tree = _trees.get(key)
+    if tree is None:
+        tree = Tree(bytestring=data)
+        _trees[key] = tree
+        if len(_trees) > SVG_TREE_CACHE_SIZE:
+            _trees.popitem(last=False)
+    else:
+        _trees.move_to_end(key)
+    return _copy_node(tree)
+
+
+def _copy_node(node: Node, parent: Node | None = None) -> Node:
+    """Copy a node's properties and children; the XML and CSS are shared."""
+    # dict.__new__ skips Tree.__new__, which would look the tree up by URL
+    copy = dict.__new__(type(node))
+    dict.update(copy, node)
+    copy.__dict__.update(node.__dict__)
+    if parent is not None:
+        copy.parent = parent
+    copy.children = [_copy_node(child, copy) for child in node.children]
+    return copy
+
+
+def warm_up() -> None:
+    """Load cairo and build the fontconfig cache by rendering some text."""
+    cairosvg.svg2png(
+        bytestring=b'<svg xmlns="http://www.w3.org/2000/svg" width="16" height="16">'
+        b'<text x="0" y="12" font-size="10">Aa</text></svg>'
+    )
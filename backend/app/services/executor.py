@@ -0,0 +1,284 @@
+"""Process-pool execution engine for CPU-bound converters.
+
+Synchronous converters run in worker processes so a long rasterization never
+blocks the event loop. Workers report progress through a shared queue that a
+reader thread forwards to the caller's ``progress_cb`` on the event loop.
+"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import weakref
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Extra time the parent waits beyond the in-worker timeout before it assumes
+# the worker is wedged in native code and kills it. Counted from when a
+# worker picks the job up, not from submission, so time queued behind other
+# jobs never trips it.
+HARD_TIMEOUT_GRACE = 10  # seconds
+# How long a finished job waits for its last progress messages to arrive
+PROGRESS_DRAIN_SECONDS = 1
+
+_mp_context = multiprocessing.get_context("spawn")
+
+_executor: ProcessPoolExecutor | None = None
+_progress_queue = None
+_reader_thread: threading.Thread | None = None
+_jobs: dict[int, "_Job"] = {}
+_job_ids = itertools.count()
+_lock = threading.Lock()
+# Pools broken on purpose by killing a wedged worker; see _kill_worker
+_killed_pools: weakref.WeakSet[ProcessPoolExecutor] = weakref.WeakSet()
+
+# Set inside worker processes by _init_worker
+_worker_queue = None
+_warmed_backends: list[str] = []
+
+
+class _JobTimeout(Exception):
+    pass
+
+
+class _Job:
+    """Parent-side state of a submitted job, updated by the progress reader."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        progress_cb: Callable[[int, str], None] | None,
+    ) -> None:
+        self.loop = loop
+        self.progress_cb = progress_cb
+        self.pid: int | None = None
+        self.started = asyncio.Event()
+        # Set once every progress message the job sent has been forwarded
+        self.finished = asyncio.Event()
+
+
+def _init_worker(queue, warm_backends: list[str]) -> None:
+    global _worker_queue, _warmed_backends
+    _worker_queue = queue
+    if warm_backends:
+        from app.services.converter import warm_up
+
+        _warmed_backends = warm_up(warm_backends)
+
+
+def warmed_backends() -> list[str]:
+    """Backends this worker process loaded at start (run it in the pool)."""
+    return _warmed_backends
+
+
+def _on_alarm(signum, frame):
+    raise _JobTimeout()
+
+
+def _run_job(
+    job_id: int,
+    fn: Callable[..., Any],
+    args: tuple,
+    kwargs: dict,
+    timeout: int | None,
+    report_progress: bool,
+) -> Any:
+    """Entry point executed inside a worker process."""
+    if _worker_queue is not None:
+        # A None progress is a marker: with the worker's pid when the job
+        # starts, with None after its last progress message
+        _worker_queue.put((job_id, None, os.getpid()))
+    if report_progress and _worker_queue is not None:
+        def progress_cb(progress: int, message: str) -> None:
+            _worker_queue.put((job_id, progress, message))
+
+        kwargs = {**kwargs, "progress_cb": progress_cb}
+
+    if timeout:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.alarm(timeout)
+    try:
+        return fn(*args, **kwargs)
+    except _JobTimeout:
+        raise TimeoutError(f"Conversion timed out after {timeout}s") from None
+    finally:
+        if timeout:
+            signal.alarm(0)
+        if report_progress and _worker_queue is not None:
+            _worker_queue.put((job_id, None, None))
+
+
+def _read_progress(queue) -> None:
+    """Forward worker progress messages to callbacks on their event loops."""
+    while True:
+        item = queue.get()
+        if item is None:
+            return
+        job_id, progress, message = item
+        job = _jobs.get(job_id)
+        if job is None:
+            continue
+        try:
+            if progress is not None:
+                if job.progress_cb is not None:
+                    job.loop.call_soon_threadsafe(job.progress_cb, progress, message)
+            elif message is not None:
+                job.pid = message
+                job.loop.call_soon_threadsafe(job.started.set)
+            else:
+                # Runs after the callbacks scheduled above
+                job.loop.call_soon_threadsafe(job.finished.set)
+        except RuntimeError:
+            # Loop already closed
+            _jobs.pop(job_id, None)
+
+
+def start_pool() -> ProcessPoolExecutor:
+    """Create the worker pool and progress reader if not already running."""
+    global _executor, _progress_queue, _reader_thread
+    with _lock:
+        if _executor is not None:
+            return _executor
+        if _progress_queue is None:
+            _progress_queue = _mp_context.Queue()
+            _reader_thread = threading.Thread(
+                target=_read_progress,
+                args=(_progress_queue,),
+                name="converter-progress",
+                daemon=True,
+            )
+            _reader_thread.start()
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.converter_workers,
+            mp_context=_mp_context,
+            initializer=_init_worker,
+            # Every worker, including replacements after a crash, starts warm
+            initargs=(_progress_queue, settings.warmup_backends),
+        )
+        logger.info("Started converter pool with %d workers", settings.converter_workers)
+        return _executor
+
+
+def worker_pids() -> list[int]:
+    """PIDs of the current pool's worker processes."""
+    executor = _executor
+    processes = (getattr(executor, "_processes", None) or {}) if executor else {}
+    return list(processes)
+
+
+def _discard_pool(executor: ProcessPoolExecutor) -> None:
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _kill_worker(executor: ProcessPoolExecutor, pid: int) -> None:
+    """Kill the worker process wedged on a job and retire its pool.
+
+    ProcessPoolExecutor has no public way to stop a running job, and it
+    cannot replace a single worker: losing one breaks the pool, which then
+    stops the other workers and fails their jobs with BrokenProcessPool.
+    The pool is marked so run_in_pool resubmits those jobs to a new pool
+    instead of reporting a crash.
+    """
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+        _killed_pools.add(executor)
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    executor.shutdown(wait=False)
+
+
+def shutdown_pool() -> None:
+    """Stop the worker pool and the progress reader thread."""
+    global _executor, _progress_queue, _reader_thread
+    with _lock:
+        executor, _executor = _executor, None
+        queue, _progress_queue = _progress_queue, None
+        reader, _reader_thread = _reader_thread, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+    if queue is not None:
+        queue.put(None)
+        if reader is not None:
+            reader.join(timeout=5)
+        queue.close()
+    _jobs.clear()
+
+
+async def run_in_pool(
+    fn: Callable[..., Any],
+    *args: Any,
+    progress_cb: Callable[[int, str], None] | None = None,
+    timeout: int | None = None,
+    **kwargs: Any,
+) -> Any:
+    """Run ``fn(*args, **kwargs)`` in a worker process and await the result.
+
+    If ``progress_cb`` is given it is passed to ``fn`` as a keyword argument
+    and its calls are relayed back to this event loop. Raises TimeoutError if
+    the job runs longer than ``timeout`` seconds once a worker has started it
+    (defaults to the configured conversion timeout) and RuntimeError if the
+    worker process dies. A job lost because another job's wedged worker was
+    killed is resubmitted.
+    """
+    if timeout is None:
+        timeout = settings.conversion_timeout_seconds
+    loop = asyncio.get_running_loop()
+    wait_for = timeout + HARD_TIMEOUT_GRACE if timeout else None
+
+    while True:
+        executor = start_pool()
+        job_id = next(_job_ids)
+        job = _jobs[job_id] = _Job(loop, progress_cb)
+        try:
+            future = asyncio.wrap_future(
+                executor.submit(
+                    _run_job, job_id, fn, args, kwargs, timeout, progress_cb is not None
+                )
+            )
+            # However long the job waits in the executor queue, the hard
+            # deadline only runs once a worker has it
+            start = asyncio.ensure_future(job.started.wait())
+            try:
+                await asyncio.wait({future, start}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                start.cancel()
+            done, _ = await asyncio.wait({future}, timeout=wait_for)
+            if not done:
+                logger.error("Worker did not honour %ss timeout, killing it", timeout)
+                _kill_worker(executor, job.pid)
+                future.cancel()
+                raise TimeoutError(f"Conversion timed out after {timeout}s")
+            result = future.result()
+            if progress_cb is not None:
+                # The result can overtake the job's last progress messages
+                try:
+                    await asyncio.wait_for(job.finished.wait(), PROGRESS_DRAIN_SECONDS)
+                except TimeoutError:
+                    pass
+            return result
+        except BrokenProcessPool:
+            if executor in _killed_pools:
+                logger.warning("Pool was recycled for another job's timeout, resubmitting")
+                continue
+            logger.error("Converter worker crashed, recycling pool")
+            _discard_pool(executor)
+            raise RuntimeError("Conversion worker crashed") from None
+        finally:
+            _jobs.pop(job_id, None)
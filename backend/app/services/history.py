@@ -0,0 +1,164 @@
+"""Conversion and compression history, newest first.
+
+Pages are read by keyset on ``(created_at, id)``: a cursor holds the last row
+of the previous page and the next page starts just after it, so every page
+is one index range scan however deep it is (see add_history_indexes.sql).
+Only the columns the history models show are selected.
+
+Rendered pages are kept for ``history_cache_ttl_seconds`` and served with an
+ETag, so repeated loads of the history page neither query the database nor
+resend an unchanged body. Entries are not invalidated on writes, which may
+happen in any worker; a new conversion shows up within the TTL.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.config import settings
+
+HISTORY_MAX_LIMIT = 100
+HISTORY_CACHE_MAX_ENTRIES = 256
+
+CONVERSION_HISTORY_COLUMNS = (
+    "id, original_filename, source_format, target_format, status, error_message,"
+    " file_size_bytes, created_at, updated_at"
+)
+COMPRESSION_HISTORY_COLUMNS = (
+    "id, original_filename, source_format, original_size_bytes, target_size_bytes,"
+    " compressed_size_bytes, status, error_message, created_at, updated_at"
+)
+
+
+def encode_cursor(row: dict) -> str:
+    """Opaque cursor pointing just past row."""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Return the (created_at, id) a cursor points past. Raises ValueError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        # Both end up in a PostgREST filter, so only well-formed values pass
+        if not isinstance(created_at, str) or not isinstance(row_id, str):
+            raise ValueError
+        datetime.fromisoformat(created_at)
+        uuid.UUID(row_id)
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError("Invalid cursor") from None
+    return created_at, row_id
+
+
+async def fetch_history(
+    client,
+    table: str,
+    columns: str,
+    limit: int,
+    cursor: str | None = None,
+    **filters: str | None,
+) -> dict:
+    """Return {"items", "next_cursor"} for one page of table.
+
+    filters are equality matches on columns; None values are ignored.
+    Raises ValueError for a malformed cursor.
+    """
+    query = client.table(table).select(columns)
+    for column, value in filters.items():
+        if value is not None:
+            query = query.eq(column, value)
+    if cursor is not None:
+        created_at, row_id = decode_cursor(cursor)
+        # The OR is exact but the planner cannot bound an index scan with it;
+        # the redundant lte gives it the range
+        query = query.lte("created_at", created_at).or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{row_id})'
+        )
+    # One extra row tells whether there is a next page
+    result = await (
+        query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+    )
+    rows = result.data
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"items": rows[:limit], "next_cursor": next_cursor}
+
+
+class ResponseCache:
+    """TTL cache of rendered JSON bodies and their ETags, LRU-bounded."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, bytes, str]] = OrderedDict()
+
+    def get(self, key: tuple) -> tuple[bytes, str] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, body, etag = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return body, etag
+
+    def put(self, key: tuple, body: bytes) -> str:
+        """Store body and return its ETag."""
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        if self._ttl > 0:
+            self._entries[key] = (time.monotonic() + self._ttl, body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+
+history_cache = ResponseCache(settings.history_cache_ttl_seconds, HISTORY_CACHE_MAX_ENTRIES)
+
+
+async def history_response(
+    request: Request,
+    client,
+    table: str,
+    columns: str,
+    page_model: type[BaseModel],
+    limit: int,
+    cursor: str | None = None,
+    **filters: str | None,
+) -> Response:
+    """A history page as JSON, from history_cache when fresh.
+
+    Answers 304 when If-None-Match names the current ETag. Raises ValueError
+    for a malformed cursor.
+    """
+    key = (table, limit, cursor, tuple(sorted(filters.items())))
+    cached = history_cache.get(key)
+    if cached is None:
+        page = await fetch_history(client, table, columns, limit, cursor, **filters)
+        body = page_model.model_validate(page).model_dump_json().encode("utf-8")
+        etag = history_cache.put(key, body)
+    else:
+        body, etag = cached
+
+    # Browsers revalidate on every load and get a 304 while nothing changed
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """Whether an If-None-Match header (weak tags included) names etag."""
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in tags or "*" in tags
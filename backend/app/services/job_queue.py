@@ -0,0 +1,304 @@
+"""Durable queue of conversion jobs shared by the API and worker processes.
+
+The API enqueues a job once the original is safely in storage; workers
+(``python -m app.worker``, or the worker embedded in the API process) claim
+jobs by priority and age, run them and either complete, retry or fail them.
+
+Two backends are available (``job_queue_backend``):
+
+* ``sqlite``: a WAL-mode database file under ``temp_dir``. Survives restarts
+  and can be shared by every process on one host.
+* ``postgres``: job columns on the existing ``conversion_logs`` table,
+  claimed with ``FOR UPDATE SKIP LOCKED`` through the
+  ``claim_conversion_job`` function, so API and worker pods can scale
+  independently.
+
+A claimed job holds a lease that its worker renews with ``heartbeat`` while
+the job runs; if the worker dies, the job becomes claimable again once the
+lease expires. complete, retry, fail and heartbeat only act while the
+caller still holds that claim (same worker and attempt), so a worker whose
+lease lapsed cannot disturb the job's new owner.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Protocol
+
+from supabase import AsyncClient
+
+from app.services.executor import HARD_TIMEOUT_GRACE
+
+# Interactive conversions run ahead of batch work
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = -1
+
+
+@dataclass
+class Job:
+    id: str
+    payload: dict
+    priority: int = PRIORITY_INTERACTIVE
+    attempts: int = 0  # including the current one
+    worker_id: str = ""  # who holds the claim
+
+
+class JobQueue(Protocol):
+    async def enqueue(self, job_id: str, payload: dict, priority: int = PRIORITY_INTERACTIVE) -> None:
+        """Add a job, ready to be claimed immediately."""
+        ...
+
+    async def claim(self, worker_id: str, min_priority: int | None = None) -> Job | None:
+        """Take the highest-priority ready job, or None if there is none.
+
+        With min_priority, only jobs at or above that priority are considered.
+        """
+        ...
+
+    async def heartbeat(self, job: Job) -> bool:
+        """Renew the job's lease. Returns False if the claim has been lost."""
+        ...
+
+    async def complete(self, job: Job) -> None:
+        ...
+
+    async def retry(self, job: Job, error: str, delay: float) -> None:
+        """Release a claimed job so it can be claimed again after delay seconds."""
+        ...
+
+    async def fail(self, job: Job, error: str) -> None:
+        ...
+
+    async def depth(self, priority: int | None = None) -> int:
+        """Number of jobs waiting to be claimed, optionally at one priority."""
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+def lease_seconds(timeout_seconds: int) -> int:
+    """How long a claimed job may run before it is considered abandoned."""
+    return timeout_seconds + 2 * HARD_TIMEOUT_GRACE
+
+
+def heartbeat_seconds(lease: int) -> float:
+    """How often a running job's lease is renewed; a few beats fit in it."""
+    return lease / 3
+
+
+class SQLiteJobQueue:
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            state TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            available_at REAL NOT NULL,
+            locked_by TEXT,
+            locked_at REAL,
+            last_error TEXT,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_claim_idx
+            ON jobs (state, priority DESC, created_at);
+    """
+
+    def __init__(self, path: str, lease_seconds: int):
+        self._lease = lease_seconds
+        self._lock = threading.Lock()
+        # Autocommit mode; claims take an explicit write lock
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _enqueue(self, job_id: str, payload: dict, priority: int) -> None:
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, payload, priority, available_at, created_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (job_id, json.dumps(payload), priority, now, now),
+        )
+
+    def _claim(self, worker_id: str, min_priority: int | None) -> Job | None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, payload, priority, attempts FROM jobs"
+                    " WHERE ((state = 'queued' AND available_at <= ?)"
+                    " OR (state = 'running' AND locked_at < ?))"
+                    " AND (? IS NULL OR priority >= ?)"
+                    " ORDER BY priority DESC, created_at LIMIT 1",
+                    (now, now - self._lease, min_priority, min_priority),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = 'running', attempts = attempts + 1,"
+                        " locked_by = ?, locked_at = ? WHERE id = ?",
+                        (worker_id, now, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return Job(
+            id=row[0],
+            payload=json.loads(row[1]),
+            priority=row[2],
+            attempts=row[3] + 1,
+            worker_id=worker_id,
+        )
+
+    async def enqueue(self, job_id: str, payload: dict, priority: int = PRIORITY_INTERACTIVE) -> None:
+        await asyncio.to_thread(self._enqueue, job_id, payload, priority)
+
+    async def claim(self, worker_id: str, min_priority: int | None = None) -> Job | None:
+        return await asyncio.to_thread(self._claim, worker_id, min_priority)
+
+    # Only the current claim may change a running job
+    _OWNED = " WHERE id = ? AND locked_by = ? AND attempts = ?"
+
+    async def heartbeat(self, job: Job) -> bool:
+        cursor = await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET locked_at = ?" + self._OWNED + " AND state = 'running'",
+            (time.time(), job.id, job.worker_id, job.attempts),
+        )
+        return cursor.rowcount > 0
+
+    async def complete(self, job: Job) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "DELETE FROM jobs" + self._OWNED,
+            (job.id, job.worker_id, job.attempts),
+        )
+
+    async def retry(self, job: Job, error: str, delay: float) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET state = 'queued', available_at = ?, last_error = ?,"
+            " locked_by = NULL, locked_at = NULL" + self._OWNED,
+            (time.time() + delay, error, job.id, job.worker_id, job.attempts),
+        )
+
+    async def fail(self, job: Job, error: str) -> None:
+        # The outcome is recorded in conversion_logs; the job itself is done
+        await self.complete(job)
+
+    async def depth(self, priority: int | None = None) -> int:
+        cursor = await asyncio.to_thread(
+            self._execute,
+            "SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND (? IS NULL OR priority = ?)",
+            (priority, priority),
+        )
+        return cursor.fetchone()[0]
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PostgresJobQueue:
+    """Jobs stored as columns of their conversion_logs row."""
+
+    def __init__(self, client: AsyncClient, lease_seconds: int):
+        self._client = client
+        self._lease = lease_seconds
+
+    def _table(self):
+        return self._client.table("conversion_logs")
+
+    def _update_owned(self, job: Job, values: dict):
+        """An update that only applies while job's claim is current."""
+        return (
+            self._table()
+            .update(values)
+            .eq("id", job.id)
+            .eq("job_locked_by", job.worker_id)
+            .eq("job_attempts", job.attempts)
+        )
+
+    async def enqueue(self, job_id: str, payload: dict, priority: int = PRIORITY_INTERACTIVE) -> None:
+        await self._table().update(
+            {
+                "job_state": "queued",
+                "job_payload": payload,
+                "job_priority": priority,
+                "job_attempts": 0,
+                "job_available_at": datetime.now(timezone.utc).isoformat(),
+            }
+        ).eq("id", job_id).execute()
+
+    async def claim(self, worker_id: str, min_priority: int | None = None) -> Job | None:
+        result = await self._client.rpc(
+            "claim_conversion_job",
+            {
+                "p_worker_id": worker_id,
+                "p_lease_seconds": self._lease,
+                "p_min_priority": min_priority,
+            },
+        ).execute()
+        if not result.data:
+            return None
+        row = result.data[0]
+        return Job(
+            id=row["id"],
+            payload=row["job_payload"],
+            priority=row["job_priority"],
+            attempts=row["job_attempts"],
+            worker_id=worker_id,
+        )
+
+    async def heartbeat(self, job: Job) -> bool:
+        # Stamped with the database clock, which claims compare against
+        result = await self._client.rpc(
+            "heartbeat_conversion_job",
+            {"p_id": job.id, "p_worker_id": job.worker_id, "p_attempts": job.attempts},
+        ).execute()
+        return bool(result.data)
+
+    async def complete(self, job: Job) -> None:
+        await self._update_owned(job, {"job_state": "done", "job_locked_by": None}).execute()
+
+    async def retry(self, job: Job, error: str, delay: float) -> None:
+        available_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        await self._update_owned(
+            job,
+            {
+                "job_state": "queued",
+                "job_available_at": available_at.isoformat(),
+                "job_error": error,
+                "job_locked_by": None,
+            },
+        ).execute()
+
+    async def fail(self, job: Job, error: str) -> None:
+        await self._update_owned(
+            job, {"job_state": "failed", "job_error": error, "job_locked_by": None}
+        ).execute()
+
+    async def depth(self, priority: int | None = None) -> int:
+        query = self._table().select("id", count="exact").eq("job_state", "queued")
+        if priority is not None:
+            query = query.eq("job_priority", priority)
+        result = await query.limit(1).execute()
+        return result.count or 0
+
+    async def close(self) -> None:
+        pass
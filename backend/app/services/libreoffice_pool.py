@@ -0,0 +1,258 @@
+"""Pool of long-lived headless LibreOffice instances for Office→PDF conversion.
+
+Each slot runs an ``unoserver`` process (under an interpreter that can import
+``uno``) which owns one soffice instance with its own user profile. Jobs are
+sent over XML-RPC, so a conversion costs only the render time instead of a
+LibreOffice cold start. Instances are health-checked before use and recycled
+after ``libreoffice_max_jobs`` jobs, when soffice grows past
+``libreoffice_max_rss_mb``, or after any failure.
+
+Every API and worker process runs its own pool, so instances take ports
+the OS hands out at start and keep their profiles and pid files under names
+that include the process id.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import time
+import xmlrpc.client
+from dataclasses import dataclass
+
+from unoserver.client import UnoClient
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+STARTUP_TIMEOUT = 60  # seconds
+STOP_TIMEOUT = 10  # seconds
+
+
+@dataclass
+class _OfficeInstance:
+    index: int
+    profile_dir: str
+    pid_file: str
+    port: int = 0
+    uno_port: int = 0
+    process: asyncio.subprocess.Process | None = None
+    jobs: int = 0
+
+
+def _free_ports(count: int) -> list[int]:
+    """Ports on 127.0.0.1 that nothing is listening on right now."""
+    sockets = []
+    try:
+        # Held open together so the OS hands out distinct ports
+        for _ in range(count):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sockets.append(sock)
+            sock.bind(("127.0.0.1", 0))
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def _soffice_rss_mb(pid_file: str) -> float:
+    """Resident memory of the instance's soffice process, 0 if unknown."""
+    try:
+        with open(pid_file) as f:
+            pid = int(f.read().strip())
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return 0.0
+
+
+def _ping(port: int) -> bool:
+    try:
+        with xmlrpc.client.ServerProxy(f"http://127.0.0.1:{port}") as proxy:
+            proxy.info()
+        return True
+    except (OSError, xmlrpc.client.Error):
+        return False
+
+
+class LibreOfficePool:
+    def __init__(
+        self,
+        size: int,
+        max_jobs: int,
+        max_rss_mb: int,
+        queue_size: int,
+    ):
+        pid = os.getpid()
+        self._instances = [
+            _OfficeInstance(
+                index=i,
+                profile_dir=os.path.join(settings.temp_dir, f"lo-profile-{pid}-{i}"),
+                pid_file=os.path.join(settings.temp_dir, f"lo-{pid}-{i}.pid"),
+            )
+            for i in range(size)
+        ]
+        self._max_jobs = max_jobs
+        self._max_rss_mb = max_rss_mb
+        self._queue_size = queue_size
+        self._idle: asyncio.Queue[_OfficeInstance] = asyncio.Queue()
+        self._waiting = 0
+
+    async def start(self) -> None:
+        results = await asyncio.gather(
+            *(self._start_instance(inst) for inst in self._instances),
+            return_exceptions=True,
+        )
+        for inst, result in zip(self._instances, results):
+            if isinstance(result, Exception):
+                # Retried by _ensure_healthy when the instance is first used
+                logger.error("LibreOffice instance %d failed to start: %s", inst.index, result)
+            self._idle.put_nowait(inst)
+        logger.info("Started LibreOffice pool with %d instances", len(self._instances))
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(self._stop_instance(inst) for inst in self._instances))
+        # Named after this process, so nothing else would ever reuse them
+        for inst in self._instances:
+            shutil.rmtree(inst.profile_dir, ignore_errors=True)
+            try:
+                os.remove(inst.pid_file)
+            except FileNotFoundError:
+                pass
+
+    async def _start_instance(self, inst: _OfficeInstance) -> None:
+        os.makedirs(inst.profile_dir, exist_ok=True)
+        inst.jobs = 0
+        # Fresh ports each start; another process may have taken the old ones
+        inst.port, inst.uno_port = _free_ports(2)
+        inst.process = await asyncio.create_subprocess_exec(
+            settings.libreoffice_python,
+            "-m",
+            "unoserver.server",
+            "--interface",
+            "127.0.0.1",
+            "--port",
+            str(inst.port),
+            "--uno-port",
+            str(inst.uno_port),
+            "--user-installation",
+            inst.profile_dir,
+            "--libreoffice-pid-file",
+            inst.pid_file,
+            "--conversion-timeout",
+            str(settings.conversion_timeout_seconds),
+            "--quiet",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if inst.process.returncode is not None:
+                raise RuntimeError(
+                    f"LibreOffice instance {inst.index} exited during startup "
+                    f"(code {inst.process.returncode})"
+                )
+            if await asyncio.to_thread(_ping, inst.port):
+                return
+            await asyncio.sleep(0.5)
+        await self._stop_instance(inst)
+        raise RuntimeError(f"LibreOffice instance {inst.index} did not start in time")
+
+    async def _stop_instance(self, inst: _OfficeInstance) -> None:
+        process, inst.process = inst.process, None
+        if process is None or process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def _recycle(self, inst: _OfficeInstance, reason: str) -> None:
+        logger.info("Recycling LibreOffice instance %d: %s", inst.index, reason)
+        await self._stop_instance(inst)
+        # A crashed instance can leave a corrupt profile behind
+        shutil.rmtree(inst.profile_dir, ignore_errors=True)
+        try:
+            await self._start_instance(inst)
+        except Exception:
+            # Left stopped; the next job that picks it up retries the start
+            logger.exception("Failed to restart LibreOffice instance %d", inst.index)
+
+    async def _ensure_healthy(self, inst: _OfficeInstance) -> None:
+        if inst.process is None or inst.process.returncode is not None:
+            await self._recycle(inst, "process not running")
+        elif not await asyncio.to_thread(_ping, inst.port):
+            await self._recycle(inst, "health check failed")
+        if inst.process is None or inst.process.returncode is not None:
+            raise RuntimeError("LibreOffice is unavailable")
+
+    async def convert(self, input_path: str, convert_to: str = "pdf") -> bytes:
+        """Convert a document file on the next free instance.
+
+        LibreOffice picks the import filter from input_path's extension.
+        Raises RuntimeError if the wait queue is full or the conversion fails.
+        """
+        if self._waiting >= self._queue_size and self._idle.empty():
+            raise RuntimeError("LibreOffice is busy, please try again later")
+
+        self._waiting += 1
+        try:
+            inst = await self._idle.get()
+        finally:
+            self._waiting -= 1
+
+        try:
+            await self._ensure_healthy(inst)
+            client = UnoClient(server="127.0.0.1", port=str(inst.port))
+            try:
+                result = await asyncio.to_thread(
+                    client.convert, inpath=input_path, convert_to=convert_to
+                )
+            except Exception as e:
+                await self._recycle(inst, f"conversion failed: {e}")
+                raise RuntimeError(f"LibreOffice conversion failed: {e}") from e
+
+            inst.jobs += 1
+            if inst.jobs >= self._max_jobs:
+                await self._recycle(inst, f"reached {inst.jobs} jobs")
+            elif _soffice_rss_mb(inst.pid_file) > self._max_rss_mb:
+                await self._recycle(inst, "memory limit exceeded")
+            return result
+        finally:
+            self._idle.put_nowait(inst)
+
+
+_pool: LibreOfficePool | None = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_libreoffice_pool() -> LibreOfficePool:
+    """Return the shared pool, starting it on first use."""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            pool = LibreOfficePool(
+                size=settings.libreoffice_pool_size,
+                max_jobs=settings.libreoffice_max_jobs,
+                max_rss_mb=settings.libreoffice_max_rss_mb,
+                queue_size=settings.libreoffice_queue_size,
+            )
+            await pool.start()
+            _pool = pool
+        return _pool
+
+
+async def stop_libreoffice_pool() -> None:
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.stop()
+            _pool = None
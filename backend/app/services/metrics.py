@@ -0,0 +1,222 @@
+"""Prometheus metrics for conversions, compressions and their dependencies.
+
+Timings are recorded in the process that awaits the work (API or worker),
+never inside converter pool workers, so recording costs a label lookup and
+a histogram update per phase. The API serves metrics at ``/api/metrics``
+and a standalone worker on ``metrics_port``. Queue depth and converter pool
+memory are sampled only when scraped.
+
+With several processes per host (``uvicorn --workers``, or workers next to
+the API), set ``PROMETHEUS_MULTIPROC_DIR`` to a directory shared by all of
+them and emptied before they start. Each process then writes its samples
+there and any of them serves the host's combined metrics; otherwise a scrape
+only sees the process that happened to answer it. prometheus_client reads
+the variable on import, so it must be in the environment, not in .env.
+"""
+
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import httpx
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+from app.services.executor import worker_pids
+from app.services.job_queue import PRIORITY_BATCH, PRIORITY_INTERACTIVE, JobQueue
+
+# Seconds: fast cache hits up to slow document renders
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CALL_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = tuple(2**n * 1024 for n in range(0, 17, 2))  # 1KB .. 64MB
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+CONVERSION_PHASE_SECONDS = Histogram(
+    "conversion_phase_seconds",
+    "Time spent in each conversion phase",
+    ["phase", "source", "target"],
+    buckets=PHASE_BUCKETS,
+)
+CONVERSION_INPUT_BYTES = Histogram(
+    "conversion_input_bytes",
+    "Size of conversion inputs",
+    ["source", "target"],
+    buckets=SIZE_BUCKETS,
+)
+CONVERSION_OUTPUT_BYTES = Histogram(
+    "conversion_output_bytes",
+    "Size of conversion outputs",
+    ["source", "target"],
+    buckets=SIZE_BUCKETS,
+)
+CONVERSIONS = Counter(
+    "conversions_total",
+    "Conversion attempts by outcome (completed, cached or failed)",
+    ["source", "target", "status"],
+)
+CONVERSION_ERRORS = Counter(
+    "conversion_errors_total",
+    "Failed conversion attempts by exception class",
+    ["source", "target", "error"],
+)
+
+COMPRESSION_PHASE_SECONDS = Histogram(
+    "compression_phase_seconds",
+    "Time spent in each compression phase",
+    ["phase", "source"],
+    buckets=PHASE_BUCKETS,
+)
+COMPRESSION_INPUT_BYTES = Histogram(
+    "compression_input_bytes",
+    "Size of compression inputs",
+    ["source"],
+    buckets=SIZE_BUCKETS,
+)
+COMPRESSION_OUTPUT_BYTES = Histogram(
+    "compression_output_bytes",
+    "Size of compression outputs",
+    ["source"],
+    buckets=SIZE_BUCKETS,
+)
+COMPRESSIONS = Counter(
+    "compressions_total",
+    "Compressions by outcome (completed, cached or failed)",
+    ["source", "status"],
+)
+COMPRESSION_ERRORS = Counter(
+    "compression_errors_total",
+    "Failed compressions by exception class",
+    ["source", "error"],
+)
+
+IN_FLIGHT = Gauge(
+    "jobs_in_flight",
+    "Conversions and compressions currently running",
+    ["kind"],
+    multiprocess_mode="livesum",
+)
+QUEUE_DEPTH = Gauge(
+    "job_queue_depth",
+    "Jobs waiting in the conversion queue",
+    ["priority"],
+    multiprocess_mode="livemostrecent",
+)
+STORAGE_SECONDS = Histogram(
+    "storage_operation_seconds",
+    "Object storage call latency",
+    ["operation"],
+    buckets=CALL_BUCKETS,
+)
+DB_SECONDS = Histogram(
+    "db_request_seconds",
+    "Database (PostgREST) request latency to response headers",
+    ["table", "method"],
+    buckets=CALL_BUCKETS,
+)
+LIBREOFFICE_SECONDS = Histogram(
+    "libreoffice_conversion_seconds",
+    "LibreOffice render time, pooled instance or one-shot subprocess",
+    ["mode"],
+    buckets=PHASE_BUCKETS,
+)
+CONVERTER_POOL_RSS = Gauge(
+    "converter_pool_resident_memory_bytes",
+    "Resident memory of the converter pool workers combined",
+    multiprocess_mode="livesum",
+)
+# Resident memory of this process is the default process_resident_memory_bytes,
+# which multiprocess mode does not collect
+
+
+@contextmanager
+def observe(histogram: Histogram, **labels: str) -> Iterator[None]:
+    """Time the block into histogram, whether it succeeds or raises."""
+    child = histogram.labels(**labels)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        child.observe(time.perf_counter() - start)
+
+
+def error_class(error: BaseException) -> str:
+    return type(error).__name__
+
+
+def instrument_http_client(session: httpx.AsyncClient) -> None:
+    """Time every PostgREST request made through session into DB_SECONDS."""
+
+    async def on_request(request: httpx.Request) -> None:
+        request.extensions["metrics_start"] = time.perf_counter()
+
+    async def on_response(response: httpx.Response) -> None:
+        start = response.request.extensions.get("metrics_start")
+        if start is None:
+            return
+        # /rest/v1/<table> or /rest/v1/rpc/<function>
+        table = response.request.url.path.split("/rest/v1/", 1)[-1].strip("/")
+        DB_SECONDS.labels(table=table, method=response.request.method).observe(
+            time.perf_counter() - start
+        )
+
+    session.event_hooks["request"].append(on_request)
+    session.event_hooks["response"].append(on_response)
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _converter_pool_rss() -> float:
+    return float(sum(_rss_bytes(pid) for pid in worker_pids()))
+
+
+if MULTIPROCESS:
+    # Callbacks cannot be shared, so every process samples its own pool on
+    # scrapes and when it finishes a job; see refresh_converter_pool_rss
+    _exposition = CollectorRegistry()
+    multiprocess.MultiProcessCollector(_exposition)
+else:
+    CONVERTER_POOL_RSS.set_function(_converter_pool_rss)
+    _exposition = REGISTRY
+
+
+def refresh_converter_pool_rss() -> None:
+    """Record this process's converter pool memory for other processes' scrapes."""
+    if MULTIPROCESS:
+        CONVERTER_POOL_RSS.set(_converter_pool_rss())
+
+
+def mark_process_dead() -> None:
+    """Drop this process's live gauges from the shared samples, on shutdown."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+async def render_metrics(queue: JobQueue | None = None) -> tuple[bytes, str]:
+    """Sample the queue depth, then return the exposition body and content type."""
+    if queue is not None:
+        for name, priority in (("interactive", PRIORITY_INTERACTIVE), ("batch", PRIORITY_BATCH)):
+            QUEUE_DEPTH.labels(priority=name).set(await queue.depth(priority))
+    refresh_converter_pool_rss()
+    return generate_latest(_exposition), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve metrics over HTTP (standalone workers)."""
+    start_http_server(port, registry=_exposition)
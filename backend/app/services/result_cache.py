@@ -0,0 +1,206 @@
+"""Content-addressed cache of conversion and compression results.
+
+Results are keyed by a hash of the input bytes, the operation parameters and
+CONVERTER_VERSION. Two tiers are consulted:
+
+* storage: a completed log row with the same ``cache_key`` whose objects are
+  already in the bucket, so nothing needs converting or uploading;
+* disk: result files kept under ``temp_dir`` with LRU eviction once the
+  host's processes together exceed ``result_cache_max_bytes``.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from supabase import AsyncClient
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever converter or compressor output changes, so stale results are
+# never served for new requests.
+CONVERTER_VERSION = "8"
+
+
+def compute_cache_key(content_sha256: str, operation: str, **params) -> str:
+    """Combine the input's SHA-256 with everything that affects the output."""
+    digest = hashlib.sha256()
+    digest.update(content_sha256.encode("ascii"))
+    meta = json.dumps(
+        {"op": operation, "version": CONVERTER_VERSION, **params},
+        sort_keys=True,
+        default=str,
+    )
+    digest.update(meta.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Byte-budgeted LRU cache of result files in a local directory.
+
+    Sizes and last-use times live in a SQLite index next to the files, so
+    every process on the host shares the one budget.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            used_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_used_idx ON entries (used_at);
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self._dir = directory
+        self._max_bytes = max_bytes
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._dir, key)
+
+    def _db(self) -> sqlite3.Connection:
+        """Open the index on first use; call with _lock held."""
+        if self._conn is None:
+            os.makedirs(self._dir, exist_ok=True)
+            conn = sqlite3.connect(
+                os.path.join(self._dir, "index.db"),
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self._SCHEMA)
+            # Files from before the index existed; keys are hex digests, so
+            # names with a dot (the index, temporary files) are not entries
+            found = []
+            for entry in os.scandir(self._dir):
+                if entry.is_file() and "." not in entry.name:
+                    stat = entry.stat()
+                    found.append((entry.name, stat.st_size, stat.st_atime))
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries (key, size, used_at) VALUES (?, ?, ?)", found
+            )
+            self._conn = conn
+        return self._conn
+
+    def _touch(self, key: str) -> bool:
+        """Mark an entry used. False if it is not in the cache."""
+        with self._lock:
+            cursor = self._db().execute(
+                "UPDATE entries SET used_at = ? WHERE key = ?", (time.time(), key)
+            )
+        return cursor.rowcount > 0
+
+    def _forget(self, key: str) -> None:
+        """Drop an entry whose file has gone."""
+        with self._lock:
+            self._db().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def get(self, key: str) -> bytes | None:
+        if not self._touch(key):
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            self._forget(key)
+            return None
+
+    def get_file(self, key: str) -> str | None:
+        """Return a private copy of the entry under temp_dir, or None.
+
+        The caller owns the copy; evicting the entry does not touch it. It
+        is a hard link where possible, so large results are not read.
+        """
+        if not self._touch(key):
+            return None
+        source = self._path(key)
+        path = os.path.join(settings.temp_dir, f"cached-{uuid.uuid4().hex}")
+        try:
+            os.link(source, path)
+        except FileNotFoundError:
+            self._forget(key)
+            return None
+        except OSError:  # not on the same filesystem
+            try:
+                shutil.copyfile(source, path)
+            except FileNotFoundError:
+                self._forget(key)
+                return None
+        return path
+
+    def put(self, key: str, data: bytes | str) -> None:
+        """Store result bytes, or a copy of the local file at path data."""
+        size = len(data) if isinstance(data, bytes) else os.path.getsize(data)
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            self._db()
+        tmp_path = self._path(key) + f".{uuid.uuid4().hex}.tmp"
+        if isinstance(data, bytes):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        else:
+            shutil.copyfile(data, tmp_path)
+        os.replace(tmp_path, self._path(key))
+
+        evicted = []
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, size, used_at) VALUES (?, ?, ?)",
+                    (key, size, time.time()),
+                )
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self._max_bytes:
+                    for old_key, old_size in conn.execute(
+                        "SELECT key, size FROM entries ORDER BY used_at"
+                    ).fetchall():
+                        if total <= self._max_bytes:
+                            break
+                        evicted.append(old_key)
+                        total -= old_size
+                    conn.executemany(
+                        "DELETE FROM entries WHERE key = ?", [(k,) for k in evicted]
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+
+disk_cache = DiskCache(
+    os.path.join(settings.temp_dir, "result-cache"),
+    settings.result_cache_max_bytes,
+)
+
+
+async def find_stored_result(client: AsyncClient, table: str, cache_key: str) -> dict | None:
+    """Return a completed log row with the same cache key, if any."""
+    result = await (
+        client.table(table)
+        .select("*")
+        .eq("cache_key", cache_key)
+        .eq("status", "completed")
+        .limit(1)
+        .execute()
+    )
+    return result.data[0] if result.data else None
@@ -1,26 +1,218 @@
-from supabase import Client
+"""Object storage backends.
+
+``SupabaseStorage`` talks to Supabase Storage through the shared async client
+(pooled HTTP connections) and switches to resumable TUS uploads for large
+files. ``MemoryStorage`` keeps objects in process and is used for tests and
+offline benchmarks (``storage_backend = "memory"``).
+"""
+
+import asyncio
+import base64
+import logging
+import os
+from typing import Protocol
+
+import httpx
+from supabase import AsyncClient
 
 from app.config import settings
+from app.services.metrics import STORAGE_SECONDS, observe
+
+logger = logging.getLogger(__name__)
+
+# Supabase requires 6MB chunks for resumable uploads
+TUS_CHUNK_BYTES = 6 * 1024 * 1024
+TUS_RETRIES = 3
+
+
+class StorageBackend(Protocol):
+    async def upload_file(self, path: str, file: bytes | str, content_type: str) -> str:
+        """Upload file contents, or a local file by path. Returns the storage path."""
+        ...
+
+    async def create_download_url(self, path: str, expires_in: int = 3600) -> str:
+        """Create a signed download URL (default 1hr expiry)."""
+        ...
+
+    async def create_download_urls(self, paths: list[str], expires_in: int = 3600) -> list[str]:
+        """Create signed download URLs for several objects in one request."""
+        ...
+
+    async def download_file(self, path: str, dest: str) -> None:
+        """Download an object to a local file."""
+        ...
+
+    async def copy_file(self, source: str, dest: str) -> None:
+        """Copy an object to a new path without downloading it."""
+        ...
+
+    async def delete_file(self, path: str) -> None:
+        """Delete a file from storage."""
+        ...
+
+
+def _file_size(file: bytes | str) -> int:
+    return len(file) if isinstance(file, bytes) else os.path.getsize(file)
+
+
+class SupabaseStorage:
+    def __init__(self, client: AsyncClient):
+        self._client = client
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.storage_max_connections,
+                max_keepalive_connections=settings.storage_max_connections,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def upload_file(self, path: str, file: bytes | str, content_type: str) -> str:
+        if _file_size(file) > settings.storage_resumable_threshold_bytes:
+            with observe(STORAGE_SECONDS, operation="upload_resumable"):
+                await self._upload_resumable(path, file, content_type)
+        else:
+            with observe(STORAGE_SECONDS, operation="upload"):
+                await self._client.storage.from_(settings.supabase_bucket).upload(
+                    path, file, {"content-type": content_type}
+                )
+        return path
+
+    async def create_download_url(self, path: str, expires_in: int = 3600) -> str:
+        with observe(STORAGE_SECONDS, operation="sign_url"):
+            result = await self._client.storage.from_(
+                settings.supabase_bucket
+            ).create_signed_url(path, expires_in)
+        return result["signedURL"]
+
+    async def create_download_urls(self, paths: list[str], expires_in: int = 3600) -> list[str]:
+        if not paths:
+            return []
+        with observe(STORAGE_SECONDS, operation="sign_urls"):
+            results = await self._client.storage.from_(
+                settings.supabase_bucket
+            ).create_signed_urls(paths, expires_in)
+        return [result["signedURL"] for result in results]
+
+    async def download_file(self, path: str, dest: str) -> None:
+        url = await self.create_download_url(path, expires_in=600)
+        with observe(STORAGE_SECONDS, operation="download"):
+            async with self._http.stream("GET", url) as response:
+                response.raise_for_status()
+                with open(dest, "wb") as f:
+                    async for chunk in response.aiter_bytes():
+                        f.write(chunk)
+
+    async def copy_file(self, source: str, dest: str) -> None:
+        with observe(STORAGE_SECONDS, operation="copy"):
+            await self._client.storage.from_(settings.supabase_bucket).copy(source, dest)
+
+    async def delete_file(self, path: str) -> None:
+        with observe(STORAGE_SECONDS, operation="delete"):
+            await self._client.storage.from_(settings.supabase_bucket).remove([path])
+
+    async def _upload_resumable(self, path: str, file: bytes | str, content_type: str) -> None:
+        """Upload in TUS chunks, resuming from the server's offset after a failure."""
+        size = _file_size(file)
+        endpoint = f"{settings.supabase_url.rstrip('/')}/storage/v1/upload/resumable"
+        headers = {
+            "authorization": f"Bearer {settings.supabase_service_role_key}",
+            "apikey": settings.supabase_service_role_key,
+            "tus-resumable": "1.0.0",
+        }
+
+        def b64(value: str) -> str:
+            return base64.b64encode(value.encode("utf-8")).decode("ascii")
+
+        metadata = ",".join(
+            f"{key} {b64(value)}"
+            for key, value in (
+                ("bucketName", settings.supabase_bucket),
+                ("objectName", path),
+                ("contentType", content_type),
+            )
+        )
+        response = await self._http.post(
+            endpoint,
+            headers={**headers, "upload-length": str(size), "upload-metadata": metadata},
+        )
+        response.raise_for_status()
+        location = response.headers["location"]
+
+        handle = open(file, "rb") if isinstance(file, str) else None
+        try:
+            offset = 0
+            failures = 0
+            while offset < size:
+                if handle is not None:
+                    handle.seek(offset)
+                    chunk = await asyncio.to_thread(handle.read, TUS_CHUNK_BYTES)
+                else:
+                    chunk = file[offset : offset + TUS_CHUNK_BYTES]
+                try:
+                    response = await self._http.patch(
+                        location,
+                        content=chunk,
+                        headers={
+                            **headers,
+                            "upload-offset": str(offset),
+                            "content-type": "application/offset+octet-stream",
+                        },
+                    )
+                    response.raise_for_status()
+                    offset = int(response.headers["upload-offset"])
+                    failures = 0
+                except httpx.HTTPError as e:
+                    failures += 1
+                    if failures > TUS_RETRIES:
+                        raise
+                    logger.warning("Resumable upload of %s failed at %d: %s", path, offset, e)
+                    await asyncio.sleep(2 ** failures)
+                    head = await self._http.head(location, headers=headers)
+                    head.raise_for_status()
+                    offset = int(head.headers["upload-offset"])
+        finally:
+            if handle is not None:
+                handle.close()
+
+
+class MemoryStorage:
+    """In-process storage backend for tests and offline runs."""
+
+    def __init__(self):
+        self.objects: dict[str, tuple[bytes, str]] = {}
 
+    async def upload_file(self, path: str, file: bytes | str, content_type: str) -> str:
+        if isinstance(file, str):
+            with open(file, "rb") as f:
+                file = f.read()
+        if path in self.objects:
+            raise ValueError(f"Object already exists: {path}")
+        self.objects[path] = (file, content_type)
+        return path
 
-def upload_file(
-    client: Client, path: str, file_bytes: bytes, content_type: str
-) -> str:
-    """Upload file to Supabase storage. Returns the storage path."""
-    client.storage.from_(settings.supabase_bucket).upload(
-        path, file_bytes, {"content-type": content_type}
-    )
-    return path
+    async def create_download_url(self, path: str, expires_in: int = 3600) -> str:
+        if path not in self.objects:
+            raise ValueError(f"Object not found: {path}")
+        return f"memory://{settings.supabase_bucket}/{path}"
 
+    async def create_download_urls(self, paths: list[str], expires_in: int = 3600) -> list[str]:
+        return [await self.create_download_url(path, expires_in) for path in paths]
 
-def create_download_url(client: Client, path: str, expires_in: int = 3600) -> str:
-    """Create a signed download URL (default 1hr expiry)."""
-    result = client.storage.from_(settings.supabase_bucket).create_signed_url(
-        path, expires_in
-    )
-    return result["signedURL"]
+    async def download_file(self, path: str, dest: str) -> None:
+        if path not in self.objects:
+            raise ValueError(f"Object not found: {path}")
+        with open(dest, "wb") as f:
+            f.write(self.objects[path][0])
 
+    async def copy_file(self, source: str, dest: str) -> None:
+        if source not in self.objects:
+            raise ValueError(f"Object not found: {source}")
+        if dest in self.objects:
+            raise ValueError(f"Object already exists: {dest}")
+        self.objects[dest] = self.objects[source]
 
-def delete_file(client: Client, path: str) -> None:
-    """Delete a file from Supabase storage."""
-    client.storage.from_(settings.supabase_bucket).remove([path])
+    async def delete_file(self, path: str) -> None:
+        self.objects.pop(path, None)
@@ -1,8 +1,33 @@
-"""In-memory progress store for conversion tasks, used to push SSE updates."""
+"""Progress store for conversion tasks, used to push SSE updates.
+
+The conversion and the SSE stream reading its progress can run in different
+processes (several uvicorn workers, or a separate job worker), so the store
+is pluggable (``progress_backend``):
+
+* ``memory``: a dict in this process; only for single-process deployments.
+* ``sqlite``: a WAL-mode database under ``temp_dir`` shared by every process
+  on the host. Each process runs one poller for all of its subscribers, so
+  any number of streams cost a single indexed query per poll interval.
+  Queries run on one thread per process, off the event loop; updates are
+  queued to it in order and not waited for. Creating a task is waited for,
+  so another process can read it as soon as its id is handed out.
+
+Entries expire ``progress_ttl_seconds`` after their last update.
+"""
 
 import asyncio
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import Enum
+from typing import Protocol
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
 
 
 class TaskPhase(str, Enum):
@@ -19,20 +44,285 @@ class TaskProgress:
     progress: int = 0
     message: str = ""
     error: str | None = None
-    event: asyncio.Event = field(default_factory=asyncio.Event)
+    version: int = 0  # increases with every update
+    updated_at: float = field(default_factory=time.time)
+
+
+class ProgressBackend(Protocol):
+    async def create(self, task_id: str) -> TaskProgress:
+        """Add a task; it is visible to every process once this returns."""
+        ...
+
+    async def get(self, task_id: str) -> TaskProgress | None:
+        ...
+
+    async def get_many(self, task_ids: list[str]) -> dict[str, TaskProgress]:
+        """The tasks among task_ids that exist, by id."""
+        ...
+
+    def update(self, task_id: str, **changes) -> None:
+        """Apply non-None changes to an existing task and wake its subscribers."""
+        ...
+
+    def remove(self, task_id: str) -> None:
+        ...
+
+    async def wait(self, versions: dict[str, int], timeout: float) -> bool:
+        """Wait until any of the tasks moves past its version. False on timeout."""
+        ...
+
+
+class _Subscribers:
+    """Per-task events for streams waiting in this process."""
+
+    def __init__(self):
+        # task_id -> (event, version the subscribers have seen)
+        self._waiting: dict[str, tuple[asyncio.Event, int]] = {}
+
+    def notify(self, task_id: str) -> None:
+        entry = self._waiting.pop(task_id, None)
+        if entry is not None:
+            entry[0].set()
+
+    def watched(self) -> dict[str, int]:
+        return {task_id: version for task_id, (_, version) in self._waiting.items()}
+
+    def __bool__(self) -> bool:
+        return bool(self._waiting)
+
+    async def wait(self, versions: dict[str, int], timeout: float) -> bool:
+        # One event per task, shared by every subscriber; replaced after firing
+        for task_id, version in versions.items():
+            if task_id not in self._waiting:
+                self._waiting[task_id] = (asyncio.Event(), version)
+        waiters = [
+            asyncio.ensure_future(self._waiting[task_id][0].wait()) for task_id in versions
+        ]
+        try:
+            done, _ = await asyncio.wait(
+                waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            return bool(done)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+
+def _changed(versions: dict[str, int], current: dict[str, TaskProgress]) -> bool:
+    """Whether any task moved past its version or is gone."""
+    return any(
+        task_id not in current or current[task_id].version != version
+        for task_id, version in versions.items()
+    )
+
+
+class MemoryProgressBackend:
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._tasks: dict[str, TaskProgress] = {}
+        self._subscribers = _Subscribers()
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self._ttl
+        for task_id in [k for k, v in self._tasks.items() if v.updated_at < cutoff]:
+            del self._tasks[task_id]
+
+    async def create(self, task_id: str) -> TaskProgress:
+        self._evict()
+        task = TaskProgress()
+        self._tasks[task_id] = task
+        return task
+
+    async def get(self, task_id: str) -> TaskProgress | None:
+        return self._tasks.get(task_id)
+
+    async def get_many(self, task_ids: list[str]) -> dict[str, TaskProgress]:
+        return {task_id: self._tasks[task_id] for task_id in task_ids if task_id in self._tasks}
 
+    def update(self, task_id: str, **changes) -> None:
+        task = self._tasks.get(task_id)
+        if task is None:
+            return
+        for name, value in changes.items():
+            if value is not None:
+                setattr(task, name, value)
+        task.version += 1
+        task.updated_at = time.time()
+        self._subscribers.notify(task_id)
 
-_tasks: dict[str, TaskProgress] = {}
+    def remove(self, task_id: str) -> None:
+        self._tasks.pop(task_id, None)
+        self._subscribers.notify(task_id)
 
+    async def wait(self, versions: dict[str, int], timeout: float) -> bool:
+        if _changed(versions, await self.get_many(list(versions))):
+            return True
+        return await self._subscribers.wait(versions, timeout)
 
-def create_task(task_id: str) -> TaskProgress:
-    task = TaskProgress()
-    _tasks[task_id] = task
-    return task
 
+class SQLiteProgressBackend:
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS progress (
+            task_id TEXT PRIMARY KEY,
+            phase TEXT NOT NULL,
+            progress INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            error TEXT,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS progress_updated_idx ON progress (updated_at);
+    """
 
-def get_task(task_id: str) -> TaskProgress | None:
-    return _tasks.get(task_id)
+    _COLUMNS = "task_id, phase, progress, message, error, version, updated_at"
+
+    def __init__(self, path: str, ttl: float, poll_interval: float):
+        self._ttl = ttl
+        self._poll_interval = poll_interval
+        # Owns the connection: keeps sqlite off the event loop and applies
+        # updates in the order they were made
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="progress")
+        self._conn = sqlite3.connect(
+            path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Progress is disposable; skip fsyncs
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.executescript(self._SCHEMA)
+        self._subscribers = _Subscribers()
+        self._poller: asyncio.Task | None = None
+
+    def _write(self, sql: str, params: tuple = ()) -> None:
+        """Queue a statement without waiting for it."""
+        self._executor.submit(self._conn.execute, sql, params).add_done_callback(
+            _log_write_error
+        )
+
+    async def _execute(self, sql: str, params: tuple = ()) -> None:
+        """Run a statement after every write queued before it, and wait for it."""
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._conn.execute, sql, params
+        )
+
+    async def _fetch(self, sql: str, params: tuple = ()) -> list[tuple]:
+        """Run a query after every write queued before it."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, lambda: self._conn.execute(sql, params).fetchall()
+        )
+
+    async def create(self, task_id: str) -> TaskProgress:
+        task = TaskProgress()
+        self._write("DELETE FROM progress WHERE updated_at < ?", (time.time() - self._ttl,))
+        await self._execute(
+            f"INSERT OR REPLACE INTO progress ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (task_id, task.phase.value, task.progress, task.message, task.error,
+             task.version, task.updated_at),
+        )
+        return task
+
+    async def get(self, task_id: str) -> TaskProgress | None:
+        return (await self.get_many([task_id])).get(task_id)
+
+    async def get_many(self, task_ids: list[str]) -> dict[str, TaskProgress]:
+        if not task_ids:
+            return {}
+        placeholders = ",".join("?" * len(task_ids))
+        rows = await self._fetch(
+            f"SELECT {self._COLUMNS} FROM progress WHERE task_id IN ({placeholders})",
+            tuple(task_ids),
+        )
+        return {
+            row[0]: TaskProgress(
+                phase=TaskPhase(row[1]),
+                progress=row[2],
+                message=row[3],
+                error=row[4],
+                version=row[5],
+                updated_at=row[6],
+            )
+            for row in rows
+        }
+
+    def update(self, task_id: str, **changes) -> None:
+        columns = {
+            name: value.value if isinstance(value, Enum) else value
+            for name, value in changes.items()
+            if value is not None
+        }
+        assignments = "".join(f"{name} = ?, " for name in columns)
+        self._write(
+            f"UPDATE progress SET {assignments}version = version + 1,"
+            " updated_at = ? WHERE task_id = ?",
+            (*columns.values(), time.time(), task_id),
+        )
+        # Subscribers re-read after the write, which is queued ahead of them
+        self._subscribers.notify(task_id)
+
+    def remove(self, task_id: str) -> None:
+        self._write("DELETE FROM progress WHERE task_id = ?", (task_id,))
+        self._subscribers.notify(task_id)
+
+    async def wait(self, versions: dict[str, int], timeout: float) -> bool:
+        if _changed(versions, await self.get_many(list(versions))):
+            return True
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        return await self._subscribers.wait(versions, timeout)
+
+    async def _poll(self) -> None:
+        """Wake local subscribers whose task was changed by any process."""
+        while self._subscribers:
+            await asyncio.sleep(self._poll_interval)
+            watched = self._subscribers.watched()
+            if not watched:
+                continue
+            placeholders = ",".join("?" * len(watched))
+            current = dict(
+                await self._fetch(
+                    f"SELECT task_id, version FROM progress WHERE task_id IN ({placeholders})",
+                    tuple(watched),
+                )
+            )
+            for task_id, version in watched.items():
+                # Missing rows were removed or expired
+                if current.get(task_id) != version:
+                    self._subscribers.notify(task_id)
+
+
+def _log_write_error(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Failed to write task progress", exc_info=future.exception())
+
+
+_backend: ProgressBackend | None = None
+
+
+def _get_backend() -> ProgressBackend:
+    global _backend
+    if _backend is None:
+        if settings.progress_backend == "sqlite":
+            os.makedirs(settings.temp_dir, exist_ok=True)
+            path = settings.progress_store_path or os.path.join(settings.temp_dir, "progress.db")
+            _backend = SQLiteProgressBackend(
+                path, settings.progress_ttl_seconds, settings.progress_poll_seconds
+            )
+        else:
+            _backend = MemoryProgressBackend(settings.progress_ttl_seconds)
+    return _backend
+
+
+async def create_task(task_id: str) -> TaskProgress:
+    """Add a task; its SSE stream can be opened from any process once this returns."""
+    return await _get_backend().create(task_id)
+
+
+async def get_task(task_id: str) -> TaskProgress | None:
+    return await _get_backend().get(task_id)
+
+
+async def get_tasks(task_ids: list[str]) -> dict[str, TaskProgress]:
+    """The tasks among task_ids that exist, by id, read in one go."""
+    return await _get_backend().get_many(task_ids)
 
 
 def update_task(
@@ -43,21 +333,21 @@ def update_task(
     message: str | None = None,
     error: str | None = None,
 ) -> None:
-    task = _tasks.get(task_id)
-    if task is None:
-        return
-    if phase is not None:
-        task.phase = phase
-    if progress is not None:
-        task.progress = progress
-    if message is not None:
-        task.message = message
-    if error is not None:
-        task.error = error
-    # Wake any waiting SSE stream
-    task.event.set()
-    task.event.clear()
+    _get_backend().update(task_id, phase=phase, progress=progress, message=message, error=error)
 
 
 def remove_task(task_id: str) -> None:
-    _tasks.pop(task_id, None)
+    _get_backend().remove(task_id)
+
+
+async def wait_for_update(task_id: str, version: int, timeout: float) -> bool:
+    """Wait until the task changes from version (or is removed). False on timeout."""
+    return await _get_backend().wait({task_id: version}, timeout)
+
+
+async def wait_for_any_update(versions: dict[str, int], timeout: float) -> bool:
+    """wait_for_update over several tasks at once. False if none changed in time."""
+    if not versions:
+        await asyncio.sleep(timeout)
+        return False
+    return await _get_backend().wait(versions, timeout)
@@ -0,0 +1,69 @@
+"""Start-up warm-up of converter backends, reported by /api/ready.
+
+The API serves requests straight away; warm-up runs in the background and
+only moves the first-use cost (library imports, font caches, a LibreOffice
+cold start) off the first requests.
+"""
+
+import asyncio
+import logging
+import time
+
+from app.config import settings
+from app.services.executor import run_in_pool, warmed_backends
+from app.services.libreoffice_pool import get_libreoffice_pool
+
+logger = logging.getLogger(__name__)
+
+_state = {"status": "cold", "backends": [], "seconds": None}
+
+
+def warm_status() -> dict:
+    """``status`` and ``backends``, the warm ones.
+
+    The status is cold (not warmed up, or nothing could be), warming, warm,
+    degraded (some backends failed and load on first use instead) or
+    disabled (warmup_backends is empty).
+    """
+    return dict(_state)
+
+
+async def warm_up() -> None:
+    """Start every pool worker (each loads warmup_backends) and LibreOffice."""
+    backends = list(settings.warmup_backends)
+    if settings.libreoffice_pool_size == 0 and "libreoffice" in backends:
+        backends.remove("libreoffice")  # one-shot mode, nothing to start
+    if not backends:
+        _state["status"] = "disabled"
+        return
+    _state["status"] = "warming"
+    start = time.monotonic()
+    warmed: set[str] = set()
+
+    # Workers warm up in their initializer; a job per worker waits for them
+    results = await asyncio.gather(
+        *(run_in_pool(warmed_backends) for _ in range(settings.converter_workers)),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.warning("Converter worker warm-up failed: %s", result)
+        else:
+            warmed.update(result)
+
+    if "libreoffice" in backends:
+        try:
+            await get_libreoffice_pool()
+        except Exception:
+            logger.exception("Starting the LibreOffice pool failed")
+        else:
+            warmed.add("libreoffice")
+
+    _state["backends"] = [backend for backend in backends if backend in warmed]
+    _state["seconds"] = round(time.monotonic() - start, 2)
+    if not _state["backends"]:
+        _state["status"] = "cold"
+        logger.error("Warm-up failed for every backend")
+        return
+    _state["status"] = "warm" if len(_state["backends"]) == len(backends) else "degraded"
+    logger.info("Warmed up %s in %.2fs", ", ".join(_state["backends"]), _state["seconds"])
@@ -0,0 +1,56 @@
+"""ZIP writing shared by multi-page conversions and batch downloads.
+
+Entries that are already compressed (images, PDFs, OOXML, ZIPs) are stored
+as-is: deflate cannot shrink them and would only burn CPU.
+"""
+
+import os
+import zipfile
+from datetime import datetime
+
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".pdf", ".docx", ".pptx", ".zip"}
+ZIP_CHUNK_BYTES = 1024 * 1024
+
+
+def zip_entry(name: str, size: int | None = None) -> zipfile.ZipInfo:
+    """ZipInfo for name, stored or deflated according to its extension."""
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    if size is not None:
+        info.file_size = size
+    info.compress_type = (
+        zipfile.ZIP_STORED
+        if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS
+        else zipfile.ZIP_DEFLATED
+    )
+    return info
+
+
+class StreamSink:
+    """Write-only, non-seekable buffer, so ZipFile emits a streamable archive.
+
+    ZipFile writes local headers with data descriptors instead of seeking
+    back, and the caller drains what has been written so far.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, *args) -> int:
+        raise OSError("not seekable")
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
@@ -0,0 +1,140 @@
+"""Streaming plain-text extraction from DOCX files.
+
+Each part's XML is parsed incrementally and every finished top-level block
+is dropped from the tree, so memory is bounded by the largest paragraph or
+table rather than the document.
+"""
+
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from collections.abc import Callable, Iterator
+from typing import BinaryIO
+
+WORD_NAMESPACES = {
+    "http://schemas.openxmlformats.org/wordprocessingml/2006/main",
+    "http://purl.oclc.org/ooxml/wordprocessingml/main",  # Strict OOXML
+}
+MC_NAMESPACE = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+DOCX_BODY_PART = "word/document.xml"
+_HEADER_PART = re.compile(r"word/header(\d*)\.xml")
+_FOOTER_PART = re.compile(r"word/footer(\d*)\.xml")
+# Run content other than w:t that python-docx also renders as text
+_RUN_TEXT = {"tab": "\t", "ptab": "\t", "br": "\n", "cr": "\n", "noBreakHyphen": "-"}
+# Parts whose direct children are the blocks (paragraphs and tables)
+_CONTAINERS = {"body", "hdr", "ftr"}
+
+
+def iter_docx_lines(
+    input_path: str, progress_cb: Callable[[float], None] | None = None
+) -> Iterator[str]:
+    """Yield the text of a DOCX a paragraph or table row at a time.
+
+    Header paragraphs come first and footer paragraphs last, blank ones
+    skipped. A table row is one line of tab-separated cells, and text box
+    paragraphs come just before the paragraph they are anchored in.
+    progress_cb gets the fraction of the body parsed so far.
+    """
+    try:
+        zf = zipfile.ZipFile(input_path)
+    except zipfile.BadZipFile as e:
+        raise ValueError("Invalid DOCX file") from e
+    with zf:
+        names = zf.namelist()
+        if DOCX_BODY_PART not in names:
+            raise ValueError("Invalid DOCX file: no word/document.xml")
+        for name in _numbered_parts(names, _HEADER_PART):
+            yield from (line for line in _iter_part(zf, name) if line.strip())
+        yield from _iter_part(zf, DOCX_BODY_PART, progress_cb)
+        for name in _numbered_parts(names, _FOOTER_PART):
+            yield from (line for line in _iter_part(zf, name) if line.strip())
+
+
+def _numbered_parts(names: list[str], pattern: re.Pattern) -> list[str]:
+    """Names matching pattern, ordered by their number (header1, header2, ...)."""
+    numbered = []
+    for name in names:
+        match = pattern.fullmatch(name)
+        if match:
+            numbered.append((int(match.group(1) or 0), name))
+    return [name for _, name in sorted(numbered)]
+
+
+class _CountingReader:
+    """File wrapper reporting the fraction of its size read so far."""
+
+    def __init__(self, fp: BinaryIO, size: int, progress_cb: Callable[[float], None]):
+        self._fp = fp
+        self._size = max(1, size)
+        self._read = 0
+        self._progress_cb = progress_cb
+
+    def read(self, n: int = -1) -> bytes:
+        data = self._fp.read(n)
+        self._read += len(data)
+        self._progress_cb(min(1.0, self._read / self._size))
+        return data
+
+
+def _iter_part(
+    zf: zipfile.ZipFile, name: str, progress_cb: Callable[[float], None] | None = None
+) -> Iterator[str]:
+    info = zf.getinfo(name)
+    with zf.open(info) as raw:
+        source = _CountingReader(raw, info.file_size, progress_cb) if progress_cb else raw
+
+        container = None
+        paragraphs: list[list[str]] = []  # text of each open paragraph
+        rows: list[list[str]] = []  # cells of the open row of each open table
+        cells: list[list[str]] = []  # paragraphs of each open cell
+        in_properties = 0  # inside w:pPr, whose w:tabs are tab stops
+        in_fallback = 0  # inside mc:Fallback, a copy of content already read
+
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            namespace, _, tag = elem.tag[1:].partition("}")
+            if namespace == MC_NAMESPACE and tag == "Fallback":
+                in_fallback += 1 if event == "start" else -1
+                continue
+            if in_fallback or namespace not in WORD_NAMESPACES:
+                continue
+
+            if event == "start":
+                if tag == "p":
+                    paragraphs.append([])
+                elif tag == "pPr":
+                    in_properties += 1
+                elif tag == "tr":
+                    rows.append([])
+                elif tag == "tc":
+                    cells.append([])
+                elif tag in _CONTAINERS and container is None:
+                    container = elem
+                continue
+
+            if tag == "t":
+                if paragraphs:
+                    paragraphs[-1].append(elem.text or "")
+            elif tag in _RUN_TEXT:
+                if paragraphs and not in_properties:
+                    paragraphs[-1].append(_RUN_TEXT[tag])
+            elif tag == "pPr":
+                in_properties -= 1
+            elif tag == "p":
+                text = "".join(paragraphs.pop())
+                if cells:
+                    cells[-1].append(text)
+                else:
+                    yield text
+            elif tag == "tc":
+                # Cells stay on the row's line, so their paragraphs are joined
+                rows[-1].append(" ".join(text for text in cells.pop() if text))
+            elif tag == "tr":
+                row = rows.pop()
+                if cells:
+                    # A nested table's row joins the enclosing cell's text
+                    cells[-1].append(" ".join(cell for cell in row if cell))
+                else:
+                    yield "\t".join(row)
+
+            if tag in ("p", "tbl") and container is not None and not paragraphs and not rows:
+                container.clear()
@@ -1,43 +1,234 @@
+"""File type detection for uploads.
+
+Types are recognised from a fixed-size prefix (the upload's ``head``) with a
+table of signatures, so checking a file costs the same whatever its size.
+DOCX and PPTX are ZIP archives and are told apart by the names in the
+archive's central directory, read from the end of the file without
+decompressing anything. libmagic is consulted only for prefixes the table
+does not recognise.
+"""
+
+import codecs
+import struct
+
 import magic
 
 from app.models import EXTENSION_TO_FORMAT, MIME_TO_FORMAT, FileFormat
 
+# (offset, signature, format) for binary formats
+SIGNATURES: tuple[tuple[int, bytes, FileFormat], ...] = (
+    (0, b"\xff\xd8\xff", FileFormat.JPG),
+    (0, b"\x89PNG\r\n\x1a\n", FileFormat.PNG),
+    (0, b"GIF87a", FileFormat.GIF),
+    (0, b"GIF89a", FileFormat.GIF),
+)
+# PDF readers accept a header anywhere in the first KiB
+PDF_SIGNATURE = b"%PDF-"
+PDF_HEADER_WINDOW = 1024
+ZIP_SIGNATURES = (b"PK\x03\x04", b"PK\x05\x06")
+# Looked for anywhere in the prefix, as an XML declaration, comments and a
+# doctype may come before the root element. Past the prefix, XML files are
+# searched this far into the file.
+SVG_ROOT = b"<svg"
+SVG_SEARCH_BYTES = 1024 * 1024
+# Share of control characters above which an 8-bit prefix is binary
+TEXT_MAX_CONTROL_RATIO = 0.01
+_TEXT_CONTROL = bytes(set(range(32)) - {0x09, 0x0A, 0x0C, 0x0D, 0x1B})
+
+# End of central directory record, its ZIP64 locator and record
+_EOCD = struct.Struct("<4s4H2IH")
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sIQI")
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_EOCD = struct.Struct("<4sQ2H2I4Q")
+_ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+_CENTRAL_HEADER = struct.Struct("<4s6H3I5H2I")
+_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+# The EOCD record is the last thing in the file but for a comment
+_EOCD_SEARCH_BYTES = _EOCD.size + 0xFFFF
+# Office writes a few dozen entries; a directory larger than this is not
+# worth reading to find out
+OOXML_MAX_CENTRAL_DIRECTORY = 1024 * 1024
+OOXML_CONTENT_TYPES = "[Content_Types].xml"
+OOXML_FOLDERS = {"word/": FileFormat.DOCX, "ppt/": FileFormat.PPTX}
+
+_magic: magic.Magic | None = None
+
 
 def detect_mime_type(file_bytes: bytes) -> str:
-    return magic.from_buffer(file_bytes, mime=True)
+    """Ask libmagic, through one handle kept for the process."""
+    global _magic
+    if _magic is None:
+        _magic = magic.Magic(mime=True)
+    return _magic.from_buffer(file_bytes)
 
 
-def validate_file_type(filename: str, file_bytes: bytes) -> FileFormat:
-    """Validate that the file's MIME type matches its extension.
+def detect_format(head: bytes, path: str) -> FileFormat | None:
+    """Identify a file from its leading bytes (and, for ZIPs, its directory).
 
-    Returns the detected FileFormat or raises ValueError.
+    Returns None for anything that is not one of the supported formats,
+    including empty files and ZIP archives that are not Office documents.
+    """
+    if not head:
+        return None
+    for offset, signature, file_format in SIGNATURES:
+        if head.startswith(signature, offset):
+            return file_format
+    if head.startswith(ZIP_SIGNATURES):
+        return ooxml_format(path)
+    if PDF_SIGNATURE in head[:PDF_HEADER_WINDOW]:
+        return FileFormat.PDF
+    if _is_text(head):
+        return FileFormat.SVG if _looks_like_svg(head, path) else FileFormat.TXT
+    return MIME_TO_FORMAT.get(detect_mime_type(head))
+
+
+def _is_text(head: bytes) -> bool:
+    """Whether the prefix reads as UTF-8, UTF-16 (with BOM) or 8-bit text."""
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return True
+    if b"\x00" in head:
+        return False
+    try:
+        # Not final: the prefix may end in the middle of a character
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return True
+    except UnicodeDecodeError:
+        pass
+    controls = len(head) - len(head.translate(None, _TEXT_CONTROL))
+    return controls <= len(head) * TEXT_MAX_CONTROL_RATIO
+
+
+def _looks_like_svg(head: bytes, path: str) -> bool:
+    """Whether XML text has an svg element, in head or further into path."""
+    if not head.lstrip(codecs.BOM_UTF8 + b" \t\r\n").startswith(b"<"):
+        return False
+    if SVG_ROOT in head:
+        return True
+    # A long preamble (comments, a doctype with entities) can push the root
+    # element past the prefix
+    try:
+        with open(path, "rb") as f:
+            f.seek(len(head))
+            tail = head[-(len(SVG_ROOT) - 1) :]
+            searched = len(head)
+            while searched < SVG_SEARCH_BYTES:
+                chunk = f.read(min(64 * 1024, SVG_SEARCH_BYTES - searched))
+                if not chunk:
+                    return False
+                if SVG_ROOT in tail + chunk:
+                    return True
+                tail = chunk[-(len(SVG_ROOT) - 1) :]
+                searched += len(chunk)
+    except OSError:
+        pass
+    return False
+
+
+def ooxml_format(path: str) -> FileFormat | None:
+    """Classify a ZIP as DOCX or PPTX from its central directory entries.
+
+    Only the end of the file and the directory are read. Returns None if the
+    archive is damaged or is not an Office Open XML document.
+    """
+    try:
+        with open(path, "rb") as f:
+            directory = _read_central_directory(f)
+    except OSError:
+        return None
+    if directory is None:
+        return None
+
+    names = set()
+    pos = 0
+    while pos + _CENTRAL_HEADER.size <= len(directory):
+        fields = _CENTRAL_HEADER.unpack_from(directory, pos)
+        if fields[0] != _CENTRAL_HEADER_SIGNATURE:
+            return None
+        name_len, extra_len, comment_len = fields[10], fields[11], fields[12]
+        start = pos + _CENTRAL_HEADER.size
+        names.add(directory[start : start + name_len].decode("utf-8", "replace"))
+        pos = start + name_len + extra_len + comment_len
+
+    if OOXML_CONTENT_TYPES not in names:
+        return None
+    found = {
+        file_format
+        for folder, file_format in OOXML_FOLDERS.items()
+        if any(name.startswith(folder) for name in names)
+    }
+    return found.pop() if len(found) == 1 else None
+
+
+def _read_central_directory(f) -> bytes | None:
+    """Return the raw central directory of the ZIP open as f, or None."""
+    size = f.seek(0, 2)
+    tail_start = max(0, size - _EOCD_SEARCH_BYTES)
+    f.seek(tail_start)
+    tail = f.read()
+    # The real record's comment runs exactly to the end of the file; a
+    # signature inside a comment does not
+    eocd = len(tail)
+    while True:
+        eocd = tail.rfind(_EOCD_SIGNATURE, 0, eocd)
+        if eocd < 0:
+            return None
+        if eocd + _EOCD.size <= len(tail):
+            fields = _EOCD.unpack_from(tail, eocd)
+            if eocd + _EOCD.size + fields[7] == len(tail):
+                break
+    _, _, _, _, entries, cd_size, cd_offset, _ = fields
+    end = tail_start + eocd  # where the directory (or ZIP64 record) ends
+
+    if entries == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        locator = eocd - _ZIP64_LOCATOR.size
+        if locator < 0:
+            return None
+        if _ZIP64_LOCATOR.unpack_from(tail, locator)[0] != _ZIP64_LOCATOR_SIGNATURE:
+            return None
+        end = tail_start + locator - _ZIP64_EOCD.size
+        if end < 0:
+            return None
+        f.seek(end)
+        record = f.read(_ZIP64_EOCD.size)
+        if len(record) < _ZIP64_EOCD.size:
+            return None
+        fields = _ZIP64_EOCD.unpack(record)
+        if fields[0] != _ZIP64_EOCD_SIGNATURE:
+            return None
+        cd_size = fields[8]
+
+    # Measured back from the end, so data prepended to the archive is fine
+    start = end - cd_size
+    if cd_size > OOXML_MAX_CENTRAL_DIRECTORY or start < 0:
+        return None
+    f.seek(start)
+    directory = f.read(cd_size)
+    return directory if len(directory) == cd_size else None
+
+
+def validate_file_type(filename: str, head: bytes, path: str) -> FileFormat:
+    """Validate that the file's content matches its extension.
+
+    head is the file's first bytes and path the whole file, which is only
+    read for ZIP-based formats. Returns the detected FileFormat or raises
+    ValueError.
     """
     ext = "." + filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
     ext_format = EXTENSION_TO_FORMAT.get(ext)
     if ext_format is None:
         raise ValueError(f"Unsupported file extension: {ext}")
 
-    mime = detect_mime_type(file_bytes)
-    mime_format = MIME_TO_FORMAT.get(mime)
-
-    # Allow text/plain MIME for some document types (DOCX/PPTX detected as zip)
-    # and allow application/octet-stream as a fallback
-    if mime_format is None and mime in (
-        "application/octet-stream",
-        "application/zip",
-        "application/x-zip-compressed",
-    ):
-        return ext_format
-
-    if mime_format is None:
-        raise ValueError(f"Unrecognized MIME type: {mime}")
-
-    if mime_format != ext_format:
-        # Allow jpeg MIME with jpg extension
-        if not (mime_format == FileFormat.JPG and ext_format == FileFormat.JPG):
-            raise ValueError(
-                f"MIME type mismatch: file appears to be {mime_format.value} "
-                f"but has extension {ext}"
-            )
+    detected = detect_format(head, path)
+    if detected is None:
+        if head.startswith(ZIP_SIGNATURES):
+            raise ValueError("ZIP archive is not a DOCX or PPTX document")
+        raise ValueError(f"Unrecognized file type for extension {ext}")
+
+    if detected != ext_format:
+        raise ValueError(
+            f"File type mismatch: file appears to be {detected.value} "
+            f"but has extension {ext}"
+        )
 
     return ext_format
@@ -0,0 +1,132 @@
+import zlib
+from typing import BinaryIO
+
+# Bytes each page adds on top of its JPEG data (page, content and image
+# objects plus the xref entries), rounded up.
+PAGE_OVERHEAD_BYTES = 512
+# Header, catalog, page tree skeleton and trailer.
+DOCUMENT_OVERHEAD_BYTES = 256
+
+_COLOR_SPACES = {
+    "L": ("DeviceGray", ""),
+    "RGB": ("DeviceRGB", ""),
+    "CMYK": ("DeviceCMYK", " /Decode [1 0 1 0 1 0 1 0]"),
+}
+
+class PdfStreamWriter:
+    """Object bookkeeping shared by the streaming PDF writers.
+
+    Objects are written as soon as they are complete; only their offsets and
+    the page object numbers are kept, for the page tree and cross-reference
+    table written on close.
+    """
+
+    def __init__(self, fp: BinaryIO):
+        self._fp = fp
+        self._offsets: dict[int, int] = {}
+        self._page_refs: list[int] = []
+        self._next_obj = 3  # 1 = catalog, 2 = page tree
+        self._written = 0
+        self._closed = False
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def bytes_written(self) -> int:
+        return self._written
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_refs)
+
+    def _write(self, data: bytes) -> None:
+        self._fp.write(data)
+        self._written += len(data)
+
+    def _write_obj(self, num: int, body: bytes) -> None:
+        self._offsets[num] = self._written
+        self._write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+
+    def _alloc(self) -> int:
+        num = self._next_obj
+        self._next_obj += 1
+        return num
+
+    def _write_page(
+        self, content: bytes, page_size: tuple[float, float], resources: str, compress: bool = False
+    ) -> None:
+        page_w, page_h = page_size
+        content_num = self._alloc()
+        if compress:
+            content = zlib.compress(content)
+            header = b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content)
+        else:
+            header = b"<< /Length %d >>\nstream\n" % len(content)
+        self._write_obj(content_num, header + content + b"\nendstream")
+
+        page_num = self._alloc()
+        self._write_obj(
+            page_num,
+            (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w:.2f} {page_h:.2f}]"
+                f" /Resources << {resources} >> /Contents {content_num} 0 R >>"
+            ).encode("ascii"),
+        )
+        self._page_refs.append(page_num)
+
+    def close(self) -> None:
+        """Write the page tree, catalog, cross-reference table and trailer."""
+        if self._closed:
+            return
+        if not self._page_refs:
+            raise ValueError("PDF has no pages")
+        self._closed = True
+
+        kids = " ".join(f"{num} 0 R" for num in self._page_refs)
+        self._write_obj(
+            2,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_refs)} >>".encode("ascii"),
+        )
+        self._write_obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self._written
+        lines = [f"xref\n0 {self._next_obj}\n", "0000000000 65535 f \n"]
+        for num in range(1, self._next_obj):
+            lines.append(f"{self._offsets[num]:010d} 00000 n \n")
+        lines.append(
+            f"trailer\n<< /Size {self._next_obj} /Root 1 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n"
+        )
+        self._write("".join(lines).encode("ascii"))
+
+
+class JpegPdfWriter(PdfStreamWriter):
+    """Write a PDF of JPEG page images to a stream, one page at a time.
+
+    JPEG data is embedded as-is with DCTDecode, so the output size is the sum
+    of the page encodes plus a small fixed overhead and nothing is re-encoded.
+    """
+
+    def add_page(
+        self,
+        jpeg_bytes: bytes,
+        pixel_size: tuple[int, int],
+        mode: str,
+        page_size: tuple[float, float],
+    ) -> None:
+        """Append a page showing jpeg_bytes scaled to page_size (in points)."""
+        if mode not in _COLOR_SPACES:
+            raise ValueError(f"Unsupported JPEG mode for PDF page: {mode}")
+        color_space, decode = _COLOR_SPACES[mode]
+        width, height = pixel_size
+        page_w, page_h = page_size
+
+        image_num = self._alloc()
+        header = (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height}"
+            f" /ColorSpace /{color_space} /BitsPerComponent 8 /Filter /DCTDecode"
+            f"{decode} /Length {len(jpeg_bytes)} >>\nstream\n"
+        ).encode("ascii")
+        self._write_obj(image_num, header + jpeg_bytes + b"\nendstream")
+
+        content = f"q {page_w:.2f} 0 0 {page_h:.2f} 0 0 cm /Im0 Do Q".encode("ascii")
+        self._write_page(content, page_size, f"/XObject << /Im0 {image_num} 0 R >>")
@@ -0,0 +1,205 @@
+"""Streaming writers for plain-text PDF and DOCX documents.
+
+Both write their output as the text is fed in, a line at a time, instead of
+building a document model, so converting a file of tens of megabytes takes
+seconds and memory independent of its length.
+"""
+
+import os
+import re
+import zipfile
+from bisect import bisect_right
+from itertools import accumulate
+from typing import BinaryIO
+from xml.sax.saxutils import escape
+
+import docx
+from fpdf.fonts import CORE_FONTS_CHARWIDTHS
+
+from app.utils.archive import zip_entry
+from app.utils.pdf_writer import PdfStreamWriter
+
+# Text page layout in points, matching fpdf2's defaults: A4, 10 mm margins,
+# 1 mm cell padding, a 15 mm bottom margin and 6 mm lines
+MM = 72 / 25.4
+A4_SIZE = (595.28, 841.89)
+TEXT_MARGIN = 10 * MM
+TEXT_PADDING = 1 * MM
+TEXT_BOTTOM_MARGIN = 15 * MM
+TEXT_LINE_HEIGHT = 6 * MM
+TEXT_FONT_SIZE = 11
+TEXT_TAB_SIZE = 8
+DOCX_FLUSH_CHARS = 256 * 1024  # body XML buffered before each write
+# Helvetica advance widths in 1/1000 em, indexed by cp1252 byte
+_HELVETICA_WIDTHS = [CORE_FONTS_CHARWIDTHS["helvetica"][chr(i)] for i in range(256)]
+
+
+class TextPdfWriter(PdfStreamWriter):
+    """Write plain text to a PDF stream in Helvetica, one page at a time.
+
+    Lines are wrapped at spaces (or mid-word when a word is wider than the
+    page) and justified using the font's advance widths, matching fpdf2's
+    multi_cell without a layout engine, and only the current page's rows are
+    held in memory. Text is encoded as cp1252, the core fonts' encoding;
+    other characters become "?".
+    """
+
+    def __init__(self, fp: BinaryIO):
+        super().__init__(fp)
+        self._font_num = self._alloc()
+        self._write_obj(
+            self._font_num,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica"
+            b" /Encoding /WinAnsiEncoding >>",
+        )
+        page_w, page_h = A4_SIZE
+        # Line width limit in font units, so widths need no scaling
+        self._max_width = (page_w - 2 * (TEXT_MARGIN + TEXT_PADDING)) * 1000 / TEXT_FONT_SIZE
+        self._lines_per_page = int(
+            (page_h - TEXT_MARGIN - TEXT_BOTTOM_MARGIN) // TEXT_LINE_HEIGHT
+        )
+        # One line above the first baseline; each line is shown with '
+        first_baseline = page_h - TEXT_MARGIN - TEXT_LINE_HEIGHT / 2 - 0.3 * TEXT_FONT_SIZE
+        self._page_start = (
+            f"BT /F1 {TEXT_FONT_SIZE} Tf {TEXT_LINE_HEIGHT:.4f} TL"
+            f" {TEXT_MARGIN + TEXT_PADDING:.2f} {first_baseline + TEXT_LINE_HEIGHT:.2f} Td\n"
+        ).encode("ascii")
+        self._lines: list[bytes] = []
+        self._word_spacing = 0.0  # Tw in effect on the current page
+
+    def add_line(self, text: str, continues: bool = False) -> None:
+        """Append one line of text, wrapped across as many rows as it needs.
+
+        Pieces of an over-long line (continues) are wrapped separately, which
+        only moves one row break to the piece boundary.
+        """
+        if "\t" in text:
+            text = text.expandtabs(TEXT_TAB_SIZE)
+        data = text.encode("cp1252", errors="replace")
+        widths = _HELVETICA_WIDTHS
+        if sum(map(widths.__getitem__, data)) <= self._max_width:
+            self._add_row(data)
+            return
+
+        ends = list(accumulate(map(widths.__getitem__, data)))
+        start = 0
+        while start < len(data):
+            base = ends[start - 1] if start else 0
+            end = bisect_right(ends, base + self._max_width, lo=start)
+            if end >= len(data):
+                self._add_row(data[start:])
+                return
+            space = data.rfind(b" ", start, end + 1)
+            if space > start:
+                row = data[start:space]
+                # Justified, like multi_cell: the gaps absorb the slack
+                slack = self._max_width - (ends[space - 1] - base)
+                self._add_row(row, slack / row.count(b" ") if b" " in row else 0)
+                start = space + 1
+            else:
+                end = max(end, start + 1)
+                self._add_row(data[start:end])
+                start = end
+
+    def _add_row(self, data: bytes, word_spacing: float = 0) -> None:
+        """Queue one row; word_spacing is extra space per gap, in font units."""
+        row = (
+            b"("
+            + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+            + b") '"
+        )
+        if word_spacing or self._word_spacing:
+            row = b"%.3f Tw " % (word_spacing * TEXT_FONT_SIZE / 1000) + row
+            self._word_spacing = word_spacing
+        self._lines.append(row)
+        if len(self._lines) == self._lines_per_page:
+            self._flush_page()
+
+    def _flush_page(self) -> None:
+        content = self._page_start + b"\n".join(self._lines) + b"\nET"
+        self._lines = []
+        self._word_spacing = 0.0
+        self._write_page(
+            content, A4_SIZE, f"/Font << /F1 {self._font_num} 0 R >>", compress=True
+        )
+
+    def close(self) -> None:
+        """Write the last page, then the document trailer."""
+        if not self._closed and (self._lines or not self._page_refs):
+            self._flush_page()
+        super().close()
+
+
+# python-docx's blank document, whose styles and settings the output reuses
+DOCX_TEMPLATE = os.path.join(os.path.dirname(docx.__file__), "templates", "default.docx")
+_DOCX_BODY = "word/document.xml"
+# Characters XML 1.0 does not allow, such as the escape codes in terminal logs
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+class TextDocxWriter:
+    """Write plain text to a DOCX stream, one paragraph per line.
+
+    Every part except the document body is copied from python-docx's
+    default template, and the body's XML is written directly as paragraphs
+    arrive, so the output matches Document().add_paragraph() per line
+    without holding the document tree in memory.
+    """
+
+    def __init__(self, fp: BinaryIO):
+        self._zip = zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED)
+        with zipfile.ZipFile(DOCX_TEMPLATE) as template:
+            for info in template.infolist():
+                if info.filename != _DOCX_BODY:
+                    self._zip.writestr(info, template.read(info))
+            body = template.read(_DOCX_BODY).decode("utf-8")
+        split = body.index("<w:body>") + len("<w:body>")
+        self._tail = body[body.index("<w:sectPr"):].encode("utf-8")
+        self._body = self._zip.open(zip_entry(_DOCX_BODY), "w", force_zip64=True)
+        self._buffer = [body[:split]]
+        self._buffered = 0
+        self._in_paragraph = False
+
+    def add_line(self, text: str, continues: bool = False) -> None:
+        """Append a line as a paragraph.
+
+        With continues, the paragraph is left open and the next call's text
+        joins it, so an over-long line can be passed in pieces.
+        """
+        if text:
+            text = escape(_XML_INVALID.sub("", text))
+            if "\t" in text:
+                text = '</w:t><w:tab/><w:t xml:space="preserve">'.join(text.split("\t"))
+            run = f'<w:r><w:t xml:space="preserve">{text}</w:t></w:r>'
+        else:
+            run = ""
+        if not self._in_paragraph:
+            if not run and not continues:
+                self._append("<w:p/>")
+                return
+            self._append("<w:p>")
+            self._in_paragraph = True
+        self._append(run)
+        if not continues:
+            self._append("</w:p>")
+            self._in_paragraph = False
+
+    def _append(self, xml: str) -> None:
+        self._buffer.append(xml)
+        self._buffered += len(xml)
+        if self._buffered >= DOCX_FLUSH_CHARS:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._body.write("".join(self._buffer).encode("utf-8"))
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self) -> None:
+        """Finish the body and write the ZIP central directory."""
+        if self._in_paragraph:
+            self._append("</w:p>")
+        self._flush()
+        self._body.write(self._tail)
+        self._body.close()
+        self._zip.close()
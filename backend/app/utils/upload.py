@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+from app.config import settings
+
+SNIFF_BYTES = 8192  # enough for the type signatures and libmagic
+MAX_FIELD_BYTES = 64 * 1024  # non-file form fields
+# Body bytes handed to the parser thread at a time: large enough that the
+# thread hop costs little next to hashing and writing them
+PARSE_BATCH_BYTES = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+@dataclass
+class SpooledUpload:
+    """An uploaded file streamed to disk, with its digest and leading bytes."""
+
+    path: str
+    filename: str
+    content_type: str
+    size: int = 0
+    sha256: str = ""
+    head: bytes = b""
+    fields: dict[str, str] = field(default_factory=dict)
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def multipart_body_schema(**fields: dict) -> dict:
+    """OpenAPI requestBody for endpoints that read the multipart body themselves."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {"file": {"type": "string", "format": "binary"}, **fields},
+                    }
+                }
+            },
+        }
+    }
+
+
+async def receive_upload(
+    request: Request, file_field: str = "file", max_bytes: int | None = None
+) -> SpooledUpload:
+    """Stream a multipart upload to settings.temp_dir.
+
+    The file part is written to disk chunk by chunk while being hashed, and
+    the size limit is enforced as bytes arrive, so memory use does not grow
+    with the upload. Parsing, hashing and writing run in a thread, a batch
+    of PARSE_BATCH_BYTES at a time, so they do not hold up the event loop.
+    Other form fields are collected as strings.
+
+    Raises UploadTooLargeError if the file exceeds max_bytes and ValueError
+    if the body is not a valid multipart upload.
+    """
+    uploads, fields = await receive_uploads(request, file_field, max_bytes)
+    upload = uploads[0]
+    upload.fields = fields
+    return upload
+
+
+async def receive_uploads(
+    request: Request,
+    file_field: str = "file",
+    max_bytes: int | None = None,
+    max_files: int = 1,
+    max_total_bytes: int | None = None,
+) -> tuple[list[SpooledUpload], dict[str, str]]:
+    """Stream every file part named file_field to settings.temp_dir.
+
+    Same as receive_upload, for up to max_files files. max_bytes applies to
+    each file and max_total_bytes to all of them together.
+    """
+    if max_bytes is None:
+        max_bytes = settings.max_upload_bytes
+    if max_total_bytes is None:
+        max_total_bytes = max_bytes
+
+    content_type, params = parse_options_header(request.headers.get("content-type"))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise ValueError("Request must be multipart/form-data")
+
+    # Reject obviously oversized bodies before reading anything
+    content_length = request.headers.get("content-length")
+    if (
+        content_length
+        and content_length.isdigit()
+        and int(content_length) > max_total_bytes + max_files * MAX_FIELD_BYTES
+    ):
+        raise UploadTooLargeError(
+            f"{'File' if max_files == 1 else 'Upload'} too large. "
+            f"Maximum size is {max_total_bytes // (1024 * 1024)}MB"
+        )
+
+    os.makedirs(settings.temp_dir, exist_ok=True)
+    uploads: list[SpooledUpload] = []
+    fields: dict[str, str] = {}
+    total = 0
+
+    # Per-part parser state
+    state: dict = {
+        "headers": {},
+        "header_field": b"",
+        "header_value": b"",
+        "name": None,
+        "value": bytearray(),
+        "upload": None,
+        "out": None,
+        "digest": None,
+        "head": bytearray(),
+        "ended": False,
+    }
+
+    def on_part_begin() -> None:
+        state.update(headers={}, name=None, value=bytearray(), upload=None)
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        state["header_value"] += data[start:end]
+
+    def on_header_end() -> None:
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished() -> None:
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition"))
+        name = disposition.get(b"name", b"").decode("latin-1")
+        state["name"] = name
+        if name != file_field:
+            return
+        if len(uploads) >= max_files:
+            raise ValueError(f"Too many files. Maximum is {max_files}")
+        fd, path = tempfile.mkstemp(dir=settings.temp_dir, prefix="upload-")
+        upload = SpooledUpload(
+            path=path,
+            filename=disposition.get(b"filename", b"").decode("utf-8", "replace"),
+            content_type="application/octet-stream",
+        )
+        uploads.append(upload)
+        part_type = state["headers"].get(b"content-type")
+        if part_type:
+            upload.content_type = part_type.decode("latin-1")
+        state.update(
+            upload=upload,
+            out=os.fdopen(fd, "wb"),
+            digest=hashlib.sha256(),
+            head=bytearray(),
+        )
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        nonlocal total
+        chunk = data[start:end]
+        upload = state["upload"]
+        if upload is not None:
+            upload.size += len(chunk)
+            total += len(chunk)
+            if upload.size > max_bytes:
+                raise UploadTooLargeError(
+                    f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB"
+                )
+            if total > max_total_bytes:
+                raise UploadTooLargeError(
+                    f"Upload too large. Maximum size is {max_total_bytes // (1024 * 1024)}MB"
+                )
+            head = state["head"]
+            if len(head) < SNIFF_BYTES:
+                head.extend(chunk[: SNIFF_BYTES - len(head)])
+            state["digest"].update(chunk)
+            state["out"].write(chunk)
+        else:
+            state["value"].extend(chunk)
+            if len(state["value"]) > MAX_FIELD_BYTES:
+                raise ValueError(f"Form field '{state['name']}' is too large")
+
+    def on_part_end() -> None:
+        upload = state["upload"]
+        if upload is not None:
+            state["out"].close()
+            state["out"] = None
+            upload.sha256 = state["digest"].hexdigest()
+            upload.head = bytes(state["head"])
+        elif state["name"]:
+            fields[state["name"]] = state["value"].decode("utf-8", "replace")
+
+    def on_end() -> None:
+        state["ended"] = True
+
+    parser = MultipartParser(
+        boundary,
+        callbacks={
+            "on_part_begin": on_part_begin,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_end": on_end,
+        },
+    )
+
+    writing: asyncio.Task | None = None
+
+    async def feed(data: bytes) -> None:
+        nonlocal writing
+        writing = asyncio.create_task(asyncio.to_thread(parser.write, data))
+        # Cancelling the wait would not stop the thread
+        await asyncio.shield(writing)
+
+    try:
+        batch = bytearray()
+        async for chunk in request.stream():
+            batch += chunk
+            if len(batch) >= PARSE_BATCH_BYTES:
+                await feed(bytes(batch))
+                batch.clear()
+        if batch:
+            await feed(bytes(batch))
+        parser.finalize()
+        if not state["ended"]:
+            raise ValueError("Upload is incomplete")
+        if not uploads:
+            raise ValueError(f"Missing '{file_field}' file in upload")
+    except BaseException:
+        if writing is not None and not writing.done():
+            # Cancelled mid-batch: let the thread finish with the files first
+            await asyncio.wait({writing})
+            writing.exception()  # the cancellation is what gets reported
+        if state["out"] is not None:
+            state["out"].close()
+        for upload in uploads:
+            upload.remove()
+        raise
+
+    return uploads, fields
+
+
+def expand_archive(
+    archive: SpooledUpload, max_files: int, max_bytes: int, max_total_bytes: int
+) -> list[SpooledUpload]:
+    """Extract a ZIP upload into one SpooledUpload per member file.
+
+    Limits are enforced on the bytes actually inflated, not the sizes the
+    archive declares. Directories and macOS resource forks are skipped.
+    """
+    uploads: list[SpooledUpload] = []
+    total = 0
+    try:
+        with zipfile.ZipFile(archive.path) as zf:
+            members = [
+                info
+                for info in zf.infolist()
+                if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+            ]
+            if len(members) > max_files:
+                raise ValueError(f"Too many files. Maximum is {max_files}")
+            for info in members:
+                fd, path = tempfile.mkstemp(dir=settings.temp_dir, prefix="upload-")
+                upload = SpooledUpload(
+                    path=path,
+                    filename=info.filename.rsplit("/", 1)[-1],
+                    content_type="application/octet-stream",
+                )
+                uploads.append(upload)
+                digest = hashlib.sha256()
+                head = bytearray()
+                with os.fdopen(fd, "wb") as out, zf.open(info) as src:
+                    while chunk := src.read(1024 * 1024):
+                        upload.size += len(chunk)
+                        total += len(chunk)
+                        if upload.size > max_bytes:
+                            raise UploadTooLargeError(
+                                f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB"
+                            )
+                        if total > max_total_bytes:
+                            raise UploadTooLargeError(
+                                f"Archive too large. Maximum size is "
+                                f"{max_total_bytes // (1024 * 1024)}MB uncompressed"
+                            )
+                        if len(head) < SNIFF_BYTES:
+                            head.extend(chunk[: SNIFF_BYTES - len(head)])
+                        digest.update(chunk)
+                        out.write(chunk)
+                upload.sha256 = digest.hexdigest()
+                upload.head = bytes(head)
+    except zipfile.BadZipFile:
+        for upload in uploads:
+            upload.remove()
+        raise ValueError("Archive is not a valid ZIP file")
+    except BaseException:
+        for upload in uploads:
+            upload.remove()
+        raise
+    return uploads
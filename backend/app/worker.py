@@ -0,0 +1,227 @@
+"""Conversion worker: claims jobs from the queue and runs them.
+
+Run standalone with ``python -m app.worker`` (set ``embedded_worker=false`` on
+the API processes to keep conversions off them), or embedded in the API
+process via the lifespan hook.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import socket
+import tempfile
+
+from app.config import settings
+from app.dependencies import close_clients, get_job_queue, get_storage, get_supabase_client
+from app.services.conversion_runner import (
+    ConversionJob,
+    record_conversion_failure,
+    run_conversion,
+)
+from app.services.executor import shutdown_pool, start_pool
+from app.services.job_queue import (
+    PRIORITY_INTERACTIVE,
+    Job,
+    JobQueue,
+    heartbeat_seconds,
+    lease_seconds,
+)
+from app.services.libreoffice_pool import stop_libreoffice_pool
+from app.services.metrics import mark_process_dead, start_metrics_server
+from app.services.storage import StorageBackend
+from app.services.task_store import TaskPhase, create_task, get_task, update_task
+from app.services.warmup import warm_up
+
+logger = logging.getLogger(__name__)
+
+# Bad input fails the same way every time
+NON_RETRYABLE = (ValueError, TimeoutError)
+
+
+async def _fetch_original(storage: StorageBackend, job: ConversionJob) -> str:
+    fd, path = tempfile.mkstemp(dir=settings.temp_dir, prefix="job-")
+    os.close(fd)
+    try:
+        await storage.download_file(job.original_path, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _remove(path: str | None) -> None:
+    if path is None:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def _keep_lease(job: Job, queue: JobQueue, owner: asyncio.Task) -> None:
+    """Renew job's lease while owner runs it; cancel owner if it is lost."""
+    interval = heartbeat_seconds(lease_seconds(settings.conversion_timeout_seconds))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            held = await queue.heartbeat(job)
+        except Exception:
+            # The lease has slack for a missed beat or two
+            logger.warning("Failed to renew the lease on job %s", job.id, exc_info=True)
+            continue
+        if not held:
+            logger.warning("Lost the lease on job %s; another worker has it", job.id)
+            owner.cancel()
+            return
+
+
+async def _process(job: Job, queue: JobQueue, client, storage: StorageBackend) -> None:
+    conversion = ConversionJob.from_payload(job.payload)
+    conversion_id = conversion.conversion_id
+    if await get_task(conversion_id) is None:
+        await create_task(conversion_id)
+
+    # The spooled upload is only there if the job was enqueued on this host
+    local_path = job.payload.get("input_path")
+    if local_path and not os.path.exists(local_path):
+        local_path = None
+    downloaded_path = None
+    lease = asyncio.create_task(_keep_lease(job, queue, asyncio.current_task()))
+
+    try:
+        if job.attempts > settings.job_max_attempts:
+            raise RuntimeError("Conversion was abandoned by its worker too many times")
+        input_path = local_path
+        if input_path is None:
+            downloaded_path = await _fetch_original(storage, conversion)
+            input_path = downloaded_path
+        await run_conversion(conversion, input_path, client, storage, attempt=job.attempts)
+        await queue.complete(job)
+        _remove(local_path)
+
+    except asyncio.CancelledError:
+        # Worker shutting down (or the lease is gone, and this is a no-op):
+        # hand the job back straight away
+        await queue.retry(job, "Worker shut down", 0)
+        raise
+
+    except Exception as e:
+        retryable = (
+            not isinstance(e, NON_RETRYABLE) and job.attempts < settings.job_max_attempts
+        )
+        if retryable:
+            delay = settings.job_retry_base_seconds * 2 ** (job.attempts - 1)
+            logger.warning(
+                "Conversion %s failed (attempt %d), retrying in %.0fs: %s",
+                conversion_id,
+                job.attempts,
+                delay,
+                e,
+            )
+            update_task(
+                conversion_id,
+                phase=TaskPhase.CONVERTING,
+                progress=0,
+                message=f"Retrying conversion (attempt {job.attempts + 1})...",
+            )
+            await queue.retry(job, str(e), delay)
+        else:
+            logger.exception("Conversion %s failed", conversion_id)
+            await record_conversion_failure(conversion_id, str(e), client)
+            await queue.fail(job, str(e))
+            _remove(local_path)
+
+    finally:
+        lease.cancel()
+        _remove(downloaded_path)
+
+
+async def run_worker(
+    queue: JobQueue,
+    worker_id: str,
+    stop: asyncio.Event,
+    max_in_flight: int | None = None,
+) -> None:
+    """Claim and run jobs until stop is set, at most max_in_flight at a time.
+
+    At most worker_max_batch_in_flight of those are batch jobs, so the rest
+    of the slots stay free for interactive conversions.
+    """
+    if max_in_flight is None:
+        max_in_flight = settings.worker_max_in_flight
+    max_batch = min(settings.worker_max_batch_in_flight, max_in_flight)
+    client = await get_supabase_client()
+    storage = await get_storage()
+    slots = asyncio.Semaphore(max_in_flight)
+    running: set[asyncio.Task] = set()
+    batch_running: set[asyncio.Task] = set()
+
+    def on_done(task: asyncio.Task) -> None:
+        running.discard(task)
+        batch_running.discard(task)
+        slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Job handler crashed", exc_info=task.exception())
+
+    logger.info("Worker %s started (max %d in flight)", worker_id, max_in_flight)
+    try:
+        while not stop.is_set():
+            await slots.acquire()
+            try:
+                min_priority = (
+                    PRIORITY_INTERACTIVE if len(batch_running) >= max_batch else None
+                )
+                job = await queue.claim(worker_id, min_priority=min_priority)
+            except Exception:
+                logger.exception("Failed to claim a job")
+                job = None
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=settings.worker_poll_seconds)
+                except TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(_process(job, queue, client, storage))
+            running.add(task)
+            if job.priority < PRIORITY_INTERACTIVE:
+                batch_running.add(task)
+            task.add_done_callback(on_done)
+    finally:
+        # Unfinished jobs go back to the queue for another worker
+        for task in list(running):
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        logger.info("Worker %s stopped", worker_id)
+
+
+async def _main() -> None:
+    os.makedirs(settings.temp_dir, exist_ok=True)
+    if settings.metrics_port:
+        start_metrics_server(settings.metrics_port)
+    start_pool()
+    await warm_up()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await run_worker(await get_job_queue(), f"{socket.gethostname()}-{os.getpid()}", stop)
+    finally:
+        await stop_libreoffice_pool()
+        shutdown_pool()
+        await close_clients()
+        mark_process_dead()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    main()
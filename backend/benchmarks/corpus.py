@@ -0,0 +1,362 @@
+"""Deterministic synthetic corpus for the benchmarks.
+
+Every file is generated from a fixed seed, so two runs (or two machines)
+benchmark byte-identical inputs. Bump CORPUS_VERSION whenever a generator
+changes so stale corpora are rebuilt and baselines are refreshed with them.
+"""
+
+import io
+import os
+import random
+import zipfile
+from dataclasses import dataclass
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.models import FileFormat
+
+CORPUS_VERSION = "1"
+SEED = 20240101
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat duis aute irure "
+    "in reprehenderit voluptate velit esse cillum fugiat nulla pariatur excepteur sint "
+    "occaecat cupidatat non proident sunt culpa qui officia deserunt mollit anim id est"
+).split()
+
+
+@dataclass(frozen=True)
+class CorpusFile:
+    name: str
+    path: str
+    format: FileFormat
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _paragraph(rng: random.Random) -> str:
+    sentences = []
+    for _ in range(rng.randint(3, 8)):
+        sentence = _words(rng, rng.randint(6, 18))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+    return " ".join(sentences)
+
+
+def _photo(rng: random.Random, size: tuple[int, int]) -> Image.Image:
+    """Photo-like RGB image: smooth gradients, soft shapes and sensor noise."""
+    width, height = size
+    # Low-frequency colour field, upscaled so it is smooth like a real scene
+    field = Image.frombytes("RGB", (16, 12), rng.randbytes(16 * 12 * 3))
+    img = field.resize(size, Image.Resampling.BICUBIC)
+
+    draw = ImageDraw.Draw(img, "RGBA")
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randint(width // 40, width // 6)
+        colour = (rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.randint(40, 160))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=colour)
+    img = img.filter(ImageFilter.GaussianBlur(radius=max(1, width // 400)))
+
+    # Fine grain so the image does not compress unrealistically well
+    grain = Image.frombytes("L", size, rng.randbytes(width * height))
+    grain = grain.point(lambda v: 128 + (v - 128) // 10)
+    return Image.merge(
+        "RGB",
+        [Image.blend(channel, grain, 0.15) for channel in img.split()],
+    )
+
+
+def _graphic(rng: random.Random, size: tuple[int, int]) -> Image.Image:
+    """Flat-colour graphic with text, the kind of PNG that palettes well."""
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    palette = [tuple(rng.randrange(256) for _ in range(3)) for _ in range(12)]
+    for _ in range(60):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        x1, y1 = x0 + rng.randint(20, 300), y0 + rng.randint(20, 200)
+        draw.rectangle((x0, y0, x1, y1), fill=rng.choice(palette), outline="black")
+    for i in range(30):
+        draw.text((20, 20 + i * 28), _words(rng, 8), fill="black")
+    return img
+
+
+def _save_image(img: Image.Image, fmt: str, **params) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, fmt, **params)
+    return buf.getvalue()
+
+
+def _svg(rng: random.Random) -> bytes:
+    width, height = 1200, 900
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">',
+        '<defs><linearGradient id="g" x1="0" y1="0" x2="1" y2="1">'
+        '<stop offset="0" stop-color="#1e3a8a"/><stop offset="1" stop-color="#f59e0b"/>'
+        "</linearGradient></defs>",
+        f'<rect width="{width}" height="{height}" fill="url(#g)"/>',
+    ]
+    for _ in range(150):
+        colour = "#%06x" % rng.randrange(0x1000000)
+        x, y = rng.randrange(width), rng.randrange(height)
+        if rng.random() < 0.5:
+            parts.append(
+                f'<circle cx="{x}" cy="{y}" r="{rng.randint(5, 80)}" fill="{colour}" '
+                f'fill-opacity="{rng.uniform(0.2, 0.9):.2f}"/>'
+            )
+        else:
+            points = " ".join(
+                f"{rng.randrange(width)},{rng.randrange(height)}" for _ in range(rng.randint(3, 7))
+            )
+            parts.append(f'<polygon points="{points}" fill="{colour}" stroke="#000"/>')
+    for i in range(20):
+        parts.append(
+            f'<text x="40" y="{60 + i * 40}" font-family="sans-serif" font-size="24">'
+            f"{_words(rng, 6)}</text>"
+        )
+    parts.append("</svg>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def _vector_pdf(rng: random.Random, pages: int) -> bytes:
+    from fpdf import FPDF
+
+    pdf = FPDF(format="A4")
+    pdf.set_font("Helvetica", size=11)
+    for _ in range(pages):
+        pdf.add_page()
+        pdf.set_draw_color(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        for _ in range(20):
+            pdf.line(rng.uniform(10, 200), rng.uniform(10, 280), rng.uniform(10, 200), rng.uniform(10, 280))
+        for _ in range(6):
+            pdf.multi_cell(0, 5, _paragraph(rng))
+            pdf.ln(2)
+    return bytes(pdf.output())
+
+
+def _scanned_pdf(rng: random.Random, pages: int) -> bytes:
+    # A4 at 150 DPI, slightly off-white like a scan
+    size = (1240, 1754)
+    images = []
+    for _ in range(pages):
+        page = Image.new("L", size, 235)
+        draw = ImageDraw.Draw(page)
+        for line in range(60):
+            draw.text((90, 90 + line * 26), _words(rng, 14), fill=30)
+        grain = Image.frombytes("L", size, rng.randbytes(size[0] * size[1]))
+        page = Image.blend(page, grain, 0.08).convert("RGB")
+        images.append(page)
+    buf = io.BytesIO()
+    images[0].save(buf, "PDF", save_all=True, append_images=images[1:], resolution=150)
+    return buf.getvalue()
+
+
+def _long_txt(rng: random.Random, target_bytes: int) -> bytes:
+    paragraphs = []
+    size = 0
+    while size < target_bytes:
+        paragraph = _paragraph(rng)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs).encode("utf-8")
+
+
+def _big_docx(rng: random.Random, paragraphs: int) -> bytes:
+    from docx import Document
+    from docx.shared import Inches
+
+    doc = Document()
+    doc.add_heading("Benchmark document", 0)
+    picture = io.BytesIO(_save_image(_photo(rng, (640, 480)), "JPEG", quality=85))
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            doc.add_heading(_words(rng, 4).title(), level=1)
+        doc.add_paragraph(_paragraph(rng))
+        if i % 100 == 25:
+            table = doc.add_table(rows=8, cols=4)
+            for row in table.rows:
+                for cell in row.cells:
+                    cell.text = _words(rng, 3)
+        if i % 150 == 75:
+            picture.seek(0)
+            doc.add_picture(picture, width=Inches(4))
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+_PPTX_NS = (
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+    'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"'
+)
+_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_DOC_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PPT_CT = "application/vnd.openxmlformats-officedocument.presentationml"
+
+
+def _pptx(rng: random.Random, slides: int) -> bytes:
+    """A minimal but valid presentation, written directly as OOXML parts."""
+    empty_tree = (
+        '<p:cSld><p:spTree><p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/>'
+        "</p:nvGrpSpPr><p:grpSpPr/>{shapes}</p:spTree></p:cSld>"
+    )
+
+    def text_box(shape_id: int, y: int, text: str, size: int) -> str:
+        return (
+            f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="Text {shape_id}"/>'
+            '<p:cNvSpPr txBox="1"/><p:nvPr/></p:nvSpPr>'
+            f'<p:spPr><a:xfrm><a:off x="457200" y="{y}"/><a:ext cx="8229600" cy="914400"/>'
+            '</a:xfrm><a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr>'
+            '<p:txBody><a:bodyPr wrap="square"/><a:lstStyle/><a:p>'
+            f'<a:r><a:rPr lang="en-US" sz="{size}"/><a:t>{text}</a:t></a:r></a:p></p:txBody></p:sp>'
+        )
+
+    def rels(*targets: tuple[str, str, str]) -> str:
+        entries = "".join(
+            f'<Relationship Id="{rid}" Type="{_DOC_REL}/{kind}" Target="{target}"/>'
+            for rid, kind, target in targets
+        )
+        return f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_REL_NS}">{entries}</Relationships>'
+
+    theme = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<a:theme xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" name="Bench">'
+        '<a:themeElements><a:clrScheme name="Bench">'
+        '<a:dk1><a:srgbClr val="000000"/></a:dk1><a:lt1><a:srgbClr val="FFFFFF"/></a:lt1>'
+        '<a:dk2><a:srgbClr val="1F497D"/></a:dk2><a:lt2><a:srgbClr val="EEECE1"/></a:lt2>'
+        + "".join(f'<a:accent{i}><a:srgbClr val="4F81BD"/></a:accent{i}>' for i in range(1, 7))
+        + '<a:hlink><a:srgbClr val="0000FF"/></a:hlink><a:folHlink><a:srgbClr val="800080"/></a:folHlink>'
+        '</a:clrScheme><a:fontScheme name="Bench">'
+        '<a:majorFont><a:latin typeface="Arial"/><a:ea typeface=""/><a:cs typeface=""/></a:majorFont>'
+        '<a:minorFont><a:latin typeface="Arial"/><a:ea typeface=""/><a:cs typeface=""/></a:minorFont>'
+        '</a:fontScheme><a:fmtScheme name="Bench">'
+        "<a:fillStyleLst>" + '<a:solidFill><a:schemeClr val="phClr"/></a:solidFill>' * 3 + "</a:fillStyleLst>"
+        "<a:lnStyleLst>" + '<a:ln w="9525"><a:solidFill><a:schemeClr val="phClr"/></a:solidFill></a:ln>' * 3 + "</a:lnStyleLst>"
+        "<a:effectStyleLst>" + "<a:effectStyle><a:effectLst/></a:effectStyle>" * 3 + "</a:effectStyleLst>"
+        "<a:bgFillStyleLst>" + '<a:solidFill><a:schemeClr val="phClr"/></a:solidFill>' * 3 + "</a:bgFillStyleLst>"
+        "</a:fmtScheme></a:themeElements></a:theme>"
+    )
+    master = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><p:sldMaster {_PPTX_NS}>'
+        + empty_tree.format(shapes="")
+        + '<p:clrMap bg1="lt1" tx1="dk1" bg2="lt2" tx2="dk2" accent1="accent1" accent2="accent2" '
+        'accent3="accent3" accent4="accent4" accent5="accent5" accent6="accent6" hlink="hlink" '
+        'folHlink="folHlink"/><p:sldLayoutIdLst><p:sldLayoutId id="2147483649" r:id="rId1"/>'
+        "</p:sldLayoutIdLst></p:sldMaster>"
+    )
+    layout = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><p:sldLayout {_PPTX_NS} type="blank">'
+        + empty_tree.format(shapes="")
+        + "</p:sldLayout>"
+    )
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        overrides = "".join(
+            f'<Override PartName="/ppt/slides/slide{i}.xml" ContentType="{_PPT_CT}.slide+xml"/>'
+            for i in range(1, slides + 1)
+        )
+        zf.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/ppt/presentation.xml" ContentType="{_PPT_CT}.presentation.main+xml"/>'
+            f'<Override PartName="/ppt/slideMasters/slideMaster1.xml" ContentType="{_PPT_CT}.slideMaster+xml"/>'
+            f'<Override PartName="/ppt/slideLayouts/slideLayout1.xml" ContentType="{_PPT_CT}.slideLayout+xml"/>'
+            '<Override PartName="/ppt/theme/theme1.xml" ContentType="application/vnd.openxmlformats-officedocument.theme+xml"/>'
+            f"{overrides}</Types>",
+        )
+        zf.writestr("_rels/.rels", rels(("rId1", "officeDocument", "ppt/presentation.xml")))
+        slide_ids = "".join(
+            f'<p:sldId id="{255 + i}" r:id="rId{i + 1}"/>' for i in range(1, slides + 1)
+        )
+        zf.writestr(
+            "ppt/presentation.xml",
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><p:presentation {_PPTX_NS}>'
+            '<p:sldMasterIdLst><p:sldMasterId id="2147483648" r:id="rId1"/></p:sldMasterIdLst>'
+            f"<p:sldIdLst>{slide_ids}</p:sldIdLst>"
+            '<p:sldSz cx="9144000" cy="6858000"/><p:notesSz cx="6858000" cy="9144000"/>'
+            "</p:presentation>",
+        )
+        zf.writestr(
+            "ppt/_rels/presentation.xml.rels",
+            rels(
+                ("rId1", "slideMaster", "slideMasters/slideMaster1.xml"),
+                *((f"rId{i + 1}", "slide", f"slides/slide{i}.xml") for i in range(1, slides + 1)),
+                (f"rId{slides + 2}", "theme", "theme/theme1.xml"),
+            ),
+        )
+        zf.writestr("ppt/theme/theme1.xml", theme)
+        zf.writestr("ppt/slideMasters/slideMaster1.xml", master)
+        zf.writestr(
+            "ppt/slideMasters/_rels/slideMaster1.xml.rels",
+            rels(
+                ("rId1", "slideLayout", "../slideLayouts/slideLayout1.xml"),
+                ("rId2", "theme", "../theme/theme1.xml"),
+            ),
+        )
+        zf.writestr("ppt/slideLayouts/slideLayout1.xml", layout)
+        zf.writestr(
+            "ppt/slideLayouts/_rels/slideLayout1.xml.rels",
+            rels(("rId1", "slideMaster", "../slideMasters/slideMaster1.xml")),
+        )
+        for i in range(1, slides + 1):
+            shapes = text_box(2, 457200, _words(rng, 5).title(), 3600) + "".join(
+                text_box(3 + j, 1600200 + j * 914400, _words(rng, 12), 1800) for j in range(5)
+            )
+            zf.writestr(
+                f"ppt/slides/slide{i}.xml",
+                f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><p:sld {_PPTX_NS}>'
+                + empty_tree.format(shapes=shapes)
+                + "</p:sld>",
+            )
+            zf.writestr(
+                f"ppt/slides/_rels/slide{i}.xml.rels",
+                rels(("rId1", "slideLayout", "../slideLayouts/slideLayout1.xml")),
+            )
+    return buf.getvalue()
+
+
+def _generators():
+    """(name, format, generator) for every corpus file; each gets its own RNG."""
+    return [
+        ("photo_small.jpg", FileFormat.JPG,
+         lambda rng: _save_image(_photo(rng, (800, 600)), "JPEG", quality=90)),
+        ("photo_large.jpg", FileFormat.JPG,
+         lambda rng: _save_image(_photo(rng, (4000, 3000)), "JPEG", quality=92)),
+        ("graphic.png", FileFormat.PNG,
+         lambda rng: _save_image(_graphic(rng, (1200, 900)), "PNG")),
+        ("photo.png", FileFormat.PNG,
+         lambda rng: _save_image(_photo(rng, (1600, 1200)), "PNG")),
+        ("animation.gif", FileFormat.GIF,
+         lambda rng: _save_image(_graphic(rng, (600, 400)).convert("P"), "GIF")),
+        ("drawing.svg", FileFormat.SVG, _svg),
+        ("vector.pdf", FileFormat.PDF, lambda rng: _vector_pdf(rng, 10)),
+        ("scanned.pdf", FileFormat.PDF, lambda rng: _scanned_pdf(rng, 6)),
+        ("long.txt", FileFormat.TXT, lambda rng: _long_txt(rng, 2 * 1024 * 1024)),
+        ("big.docx", FileFormat.DOCX, lambda rng: _big_docx(rng, 600)),
+        ("slides.pptx", FileFormat.PPTX, lambda rng: _pptx(rng, 20)),
+    ]
+
+
+def build_corpus(directory: str) -> list[CorpusFile]:
+    """Generate the corpus into directory, reusing files from an earlier run."""
+    directory = os.path.join(directory, f"v{CORPUS_VERSION}")
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for index, (name, fmt, generate) in enumerate(_generators()):
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            data = generate(random.Random(SEED + index))
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        corpus.append(CorpusFile(name=name, path=path, format=fmt))
+    return corpus
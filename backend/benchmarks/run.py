@@ -0,0 +1,402 @@
+"""Benchmark converters, compressors and file validation.
+
+Usage (from backend/):
+
+    python -m benchmarks.run                    # run and compare to baseline.json
+    python -m benchmarks.run --filter pdf       # only cases whose name contains "pdf"
+    python -m benchmarks.run --update-baseline  # record the current numbers
+
+Each case runs in a fresh process, so its CPU time and peak RSS are its own:
+one warm-up run, then --repeat timed runs (median reported). Cases need no
+network: storage is MemoryStorage and the database is an in-process stub.
+Cases whose system dependency (poppler, cairo, LibreOffice) is missing are
+skipped.
+
+The baseline records absolute timings, so compare on the machine it was
+recorded on. A case regresses when its wall time or peak RSS grows by more
+than --threshold, or a conversion's output grows by more than --threshold.
+"""
+
+import os
+
+# Offline settings, before anything imports app.config
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "benchmark")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "benchmark")
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("PROGRESS_BACKEND", "memory")
+os.environ.setdefault("JOB_QUEUE_BACKEND", "inline")
+os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+os.environ.setdefault("LIBREOFFICE_POOL_SIZE", "0")
+
+import argparse
+import asyncio
+import inspect
+import json
+import multiprocessing
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from benchmarks.corpus import CORPUS_VERSION, CorpusFile, build_corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+CASE_TIMEOUT = 600  # seconds
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    kind: str  # convert | compress | validate | pipeline
+    args: tuple
+    requires: tuple[str, ...] = ()
+
+
+def _available(requirement: str) -> bool:
+    if requirement == "poppler":
+        return shutil.which("pdftoppm") is not None and shutil.which("pdfinfo") is not None
+    if requirement == "libreoffice":
+        return shutil.which("soffice") is not None
+    if requirement == "cairo":
+        try:
+            import cairosvg  # noqa: F401
+        except (ImportError, OSError):
+            return False
+        return True
+    return True
+
+
+def _requirements(source, target) -> tuple[str, ...]:
+    from app.models import FileFormat
+
+    if source == FileFormat.SVG:
+        return ("cairo",)
+    if source == FileFormat.PDF:
+        return ("poppler",) if target != FileFormat.DOCX else ()
+    if target == FileFormat.PDF and source in (FileFormat.DOCX, FileFormat.PPTX):
+        return ("libreoffice",)
+    return ()
+
+
+def build_cases(corpus: list[CorpusFile]) -> list[Case]:
+    from app.models import FileFormat
+    from app.services.converter import CONVERSION_MATRIX
+
+    cases = []
+    for source, target in CONVERSION_MATRIX:
+        for item in corpus:
+            if item.format == source:
+                cases.append(
+                    Case(
+                        name=f"convert:{item.name}->{target.value}",
+                        kind="convert",
+                        args=(item.path, source.value, target.value),
+                        requires=_requirements(source, target),
+                    )
+                )
+
+    for item in corpus:
+        if item.format not in (FileFormat.JPG, FileFormat.PNG, FileFormat.PDF):
+            continue
+        size = os.path.getsize(item.path)
+        for ratio in (0.5, 0.2):
+            cases.append(
+                Case(
+                    name=f"compress:{item.name}@{int(ratio * 100)}%",
+                    kind="compress",
+                    args=(item.path, item.format.value, int(size * ratio)),
+                    requires=("poppler",) if item.format == FileFormat.PDF else (),
+                )
+            )
+
+    cases.append(
+        Case(
+            name="validate:corpus",
+            kind="validate",
+            args=tuple(item.path for item in corpus),
+        )
+    )
+
+    # Whole pipeline (spooled input -> convert -> upload -> log update)
+    photo = next(item for item in corpus if item.name == "photo_small.jpg")
+    cases.append(Case(name="pipeline:photo_small.jpg->png", kind="pipeline", args=(photo.path,)))
+    return cases
+
+
+class _NullTable:
+    """Accepts the query-builder calls the pipeline makes and records nothing."""
+
+    def __getattr__(self, name: str) -> Callable:
+        return lambda *args, **kwargs: self
+
+    async def execute(self):
+        return type("Result", (), {"data": [], "count": 0})()
+
+
+class _NullClient:
+    def table(self, name: str) -> _NullTable:
+        return _NullTable()
+
+
+def _output_size(result) -> int:
+    from app.services.converters.result import discard_result, result_size
+
+    size = result_size(result)
+    discard_result(result)
+    return size
+
+
+def _case_runner(case: Case) -> Callable[[], int]:
+    """Return a callable running the case once and returning output bytes."""
+    from app.models import FileFormat
+
+    if case.kind == "convert":
+        from app.services.converter import CONVERSION_MATRIX
+
+        path, source, target = case.args
+        source, target = FileFormat(source), FileFormat(target)
+        converter = CONVERSION_MATRIX[(source, target)].load()
+        if inspect.iscoroutinefunction(converter):
+            return lambda: _output_size(asyncio.run(converter(path, source, target)))
+        return lambda: _output_size(converter(path, source, target))
+
+    if case.kind == "compress":
+        from app.services.compressor import compress_file
+
+        path, source, target_size = case.args
+        return lambda: len(compress_file(path, FileFormat(source), target_size))
+
+    if case.kind == "validate":
+        from app.utils.mime import validate_file_type
+        from app.utils.upload import SNIFF_BYTES
+
+        heads = []
+        for path in case.args:
+            with open(path, "rb") as f:
+                heads.append((os.path.basename(path), f.read(SNIFF_BYTES), path))
+
+        def validate() -> int:
+            for _ in range(100):
+                for name, head, path in heads:
+                    validate_file_type(name, head, path)
+            return 0
+
+        return validate
+
+    if case.kind == "pipeline":
+        from app.services.conversion_runner import ConversionJob, run_conversion
+        from app.services.executor import start_pool
+        from app.services.storage import MemoryStorage
+
+        (path,) = case.args
+        start_pool()
+
+        async def pipeline() -> int:
+            storage = MemoryStorage()
+            job = ConversionJob(
+                conversion_id="benchmark",
+                filename=os.path.basename(path),
+                source_format=FileFormat.JPG,
+                target_format=FileFormat.PNG,
+                content_type="image/jpeg",
+            )
+            await run_conversion(job, path, _NullClient(), storage)
+            return sum(len(data) for data, _ in storage.objects.values())
+
+        return lambda: asyncio.run(pipeline())
+
+    raise ValueError(f"Unknown case kind: {case.kind}")
+
+
+def _reset_peak_rss() -> None:
+    """Restart this process's VmHWM from its current RSS (Linux 4.0+)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _own_peak_rss_kib() -> int:
+    # ru_maxrss survives exec, so a spawned case would report the peak of the
+    # runner it was forked from (which has built the corpus); VmHWM does not
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _peak_rss_mb() -> float:
+    # In KiB. Children only covers processes that have exited (soffice runs),
+    # not the long-lived converter pool workers.
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(_own_peak_rss_kib(), children) / 1024, 1)
+
+
+def _cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _run_case_in_child(case: Case, repeat: int, conn) -> None:
+    _reset_peak_rss()
+    try:
+        run = _case_runner(case)
+        run()  # warm-up: imports, lazy init
+        walls, cpus = [], []
+        output_bytes = 0
+        for _ in range(repeat):
+            cpu_start = _cpu_seconds()
+            start = time.perf_counter()
+            output_bytes = run()
+            walls.append(time.perf_counter() - start)
+            cpus.append(_cpu_seconds() - cpu_start)
+        conn.send(
+            {
+                "wall_s": round(statistics.median(walls), 4),
+                "cpu_s": round(statistics.median(cpus), 4),
+                "peak_rss_mb": _peak_rss_mb(),
+                "output_bytes": output_bytes,
+            }
+        )
+    except BaseException as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+        # Pool workers would otherwise keep this process from exiting
+        from app.services.executor import shutdown_pool
+
+        shutdown_pool()
+
+
+def run_case(case: Case, repeat: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_run_case_in_child, args=(case, repeat, child))
+    process.start()
+    child.close()
+    if parent.poll(CASE_TIMEOUT):
+        result = parent.recv()
+    else:
+        process.kill()
+        result = {"error": f"timed out after {CASE_TIMEOUT}s"}
+    process.join()
+    if not result and process.exitcode:
+        result = {"error": f"exited with code {process.exitcode}"}
+    return result
+
+
+def compare(name: str, result: dict, baseline: dict, threshold: float) -> list[str]:
+    """Describe each metric of result that regressed against baseline.
+
+    Compression output is not compared: it is bounded by the target, and
+    using more of the budget means a better image.
+    """
+    problems = []
+    metrics = ("wall_s", "peak_rss_mb")
+    if not name.startswith("compress:"):
+        metrics += ("output_bytes",)
+    for metric in metrics:
+        before, after = baseline.get(metric), result.get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        if change > threshold:
+            problems.append(f"{metric} {before} -> {after} (+{change:.0%})")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--filter", default="", help="only run cases containing this text")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--corpus-dir",
+        default=os.path.join(tempfile.gettempdir(), "file-tools-benchmark-corpus"),
+    )
+    parser.add_argument("--json", dest="json_path", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    corpus = build_corpus(args.corpus_dir)
+    cases = [case for case in build_cases(corpus) if args.filter in case.name]
+
+    baseline: dict = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if baseline.get("corpus_version") not in (None, CORPUS_VERSION):
+        print(f"Baseline was recorded for corpus v{baseline['corpus_version']}; ignoring it")
+        baseline = {}
+    baseline_cases = baseline.get("cases", {})
+
+    results: dict[str, dict] = {}
+    regressions = 0
+    failures = 0
+    print(f"{'case':<44} {'wall s':>8} {'cpu s':>8} {'rss MB':>8} {'out bytes':>11}")
+    for case in cases:
+        missing = [r for r in case.requires if not _available(r)]
+        if missing:
+            print(f"{case.name:<44} skipped (missing {', '.join(missing)})")
+            continue
+
+        result = run_case(case, args.repeat)
+        if "error" in result:
+            failures += 1
+            print(f"{case.name:<44} FAILED {result['error']}")
+            continue
+        results[case.name] = result
+
+        line = (
+            f"{case.name:<44} {result['wall_s']:>8.3f} {result['cpu_s']:>8.3f} "
+            f"{result['peak_rss_mb']:>8.1f} {result['output_bytes']:>11}"
+        )
+        if case.name in baseline_cases:
+            problems = compare(case.name, result, baseline_cases[case.name], args.threshold)
+            if problems:
+                regressions += 1
+                line += "  REGRESSION: " + "; ".join(problems)
+        else:
+            line += "  (no baseline)"
+        print(line)
+
+    report = {
+        "corpus_version": CORPUS_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "cases": results,
+    }
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.update_baseline:
+        # Keep entries for cases that were filtered out or skipped here
+        report["cases"] = {**baseline_cases, **results}
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 1 if failures else 0
+
+    print(f"\n{len(results)} passed, {regressions} regressed, {failures} failed")
+    return 1 if regressions or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
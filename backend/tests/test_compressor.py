@@ -0,0 +1,160 @@
+"""Compression searches against their size targets."""
+
+import io
+import os
+import random
+import shutil
+
+import pymupdf
+import pytest
+from PIL import Image, ImageDraw
+
+from app.models import FileFormat
+from app.services import compressor
+
+
+def _photo(width: int, height: int) -> bytes:
+    """A noisy gradient PNG, which neither JPEG nor deflate makes trivially small."""
+    img = Image.effect_noise((width // 8, height // 8), 60).convert("RGB")
+    img = img.resize((width, height), Image.BILINEAR)
+    ImageDraw.Draw(img).rectangle((0, 0, width // 2, height // 2), fill=(200, 40, 40))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def shared_image_pdf(tmp_path_factory):
+    """Ten pages, one 2000x1500 image object drawn on pages 0, 3, 6 and 9 at 720 dpi."""
+    path = tmp_path_factory.mktemp("pdf") / "shared.pdf"
+    stream = _photo(2000, 1500)
+    doc = pymupdf.open()
+    xref = 0
+    for number in range(10):
+        page = doc.new_page(width=200, height=150)
+        if number % 3 == 0:
+            xref = page.insert_image(page.rect, stream=stream, xref=xref)
+    doc.save(path)
+    return str(path)
+
+
+def _images(data: bytes) -> set[tuple[int, int, int]]:
+    with pymupdf.open(stream=data) as doc:
+        return {(xref, w, h) for page in doc for xref, _, w, h, *_ in page.get_images(full=True)}
+
+
+def test_shared_image_is_downsampled_once(shared_image_pdf):
+    target = os.path.getsize(shared_image_pdf) // 20
+    data = compressor._compress_pdf_structure(shared_image_pdf, target)
+    assert data is not None and len(data) <= target
+
+    # Still one object, at one of the searched resolutions rather than a
+    # setting compounded once per page
+    ((_, width, height),) = _images(data)
+    dpi = width * 72 / 200
+    assert any(abs(dpi - setting) < 1 for setting, _ in compressor.PDF_IMAGE_SETTINGS)
+    assert height == round(1500 * dpi / 720)
+
+
+def test_generous_target_keeps_full_resolution(shared_image_pdf):
+    # Just under the lossless rewrite, so images must be re-encoded, but
+    # far above what any downsampled setting produces
+    target = len(compressor._pdf_bytes(shared_image_pdf, None)) - 1
+    data = compressor._compress_pdf_structure(shared_image_pdf, target)
+    assert data is not None and len(data) <= target
+    assert {(w, h) for _, w, h in _images(data)} == {(2000, 1500)}
+
+
+def _png(tmp_path, img: Image.Image) -> tuple[str, int]:
+    path = tmp_path / "image.png"
+    img.save(path, format="PNG")
+    return str(path), path.stat().st_size
+
+
+def _compress_png(path: str, target: int) -> Image.Image:
+    data = compressor.compress_image_to_target(path, FileFormat.PNG, target)
+    assert len(data) <= target
+    img = Image.open(io.BytesIO(data))
+    assert img.format == "PNG"
+    return img
+
+
+def test_png_palette_grows_with_the_target(tmp_path):
+    # Targets spread over the range the palette sizes encode to
+    path, _ = _png(tmp_path, Image.open(io.BytesIO(_photo(400, 300))))
+    colors = []
+    for target in (22_000, 29_000, 34_000):
+        img = _compress_png(path, target)
+        assert img.size == (400, 300) and img.mode == "P"
+        colors.append(len(img.getcolors(256)))
+    assert colors == sorted(colors) and colors[0] < colors[-1]
+
+
+def test_png_with_few_colors_keeps_them_exactly(tmp_path):
+    # Noise over ten colors: large as RGB, half that as an exact palette
+    rng = random.Random(0)
+    colors = [(n * 25, 255 - n * 25, 128) for n in range(10)]
+    source = Image.new("RGB", (300, 200))
+    source.putdata([rng.choice(colors) for _ in range(300 * 200)])
+    path, size = _png(tmp_path, source)
+    img = _compress_png(path, int(size * 0.6))
+    assert img.convert("RGB").tobytes() == source.tobytes()
+
+
+def test_png_alpha_survives_the_palette(tmp_path):
+    source = Image.open(io.BytesIO(_photo(300, 200))).convert("RGBA")
+    source.putalpha(Image.linear_gradient("L").resize((300, 200)))
+    path, size = _png(tmp_path, source)
+    img = _compress_png(path, size // 4).convert("RGBA")
+    alpha = img.getchannel("A")
+    assert alpha.getpixel((150, 0)) < 48 and alpha.getpixel((150, 199)) > 208
+
+
+def test_png_small_target_is_met_by_downscaling(tmp_path):
+    path, size = _png(tmp_path, Image.open(io.BytesIO(_photo(400, 300))))
+    img = _compress_png(path, compressor.MIN_IMAGE_BYTES * 4)
+    assert img.width < 400 and img.width / img.height == pytest.approx(4 / 3, rel=0.02)
+
+
+def test_png_target_below_the_minimum_is_rejected(tmp_path):
+    path, _ = _png(tmp_path, Image.new("RGB", (10, 10)))
+    with pytest.raises(ValueError, match="at least"):
+        compressor.compress_image_to_target(path, FileFormat.PNG, compressor.MIN_IMAGE_BYTES - 1)
+
+
+needs_poppler = pytest.mark.skipif(shutil.which("pdftoppm") is None, reason="poppler is not installed")
+
+
+@pytest.fixture(scope="module")
+def mixed_pdf(tmp_path_factory):
+    """A photo page followed by three pages of a single text line."""
+    path = tmp_path_factory.mktemp("pdf") / "mixed.pdf"
+    doc = pymupdf.open()
+    photo = doc.new_page(width=300, height=200)
+    photo.insert_image(photo.rect, stream=_photo(1200, 800))
+    for number in range(3):
+        doc.new_page(width=300, height=200).insert_text((20, 40), f"Page {number + 2}")
+    doc.save(path)
+    return str(path)
+
+
+@needs_poppler
+def test_page_weights_follow_complexity(mixed_pdf):
+    # Thumbnails of simple pages are mostly JPEG headers
+    photo, *text = compressor._page_weights(mixed_pdf, 4)
+    assert all(photo > 2 * weight for weight in text)
+
+
+@needs_poppler
+def test_rasterized_budget_goes_to_the_complex_page(mixed_pdf):
+    target = 40 * 1024
+    data = compressor._rasterize_pdf_to_target(mixed_pdf, target)
+    assert len(data) <= target
+
+    with pymupdf.open(stream=data) as doc:
+        assert doc.page_count == 4
+        sizes = [len(doc.xref_stream_raw(page.get_images()[0][0])) for page in doc]
+    # Well over an equal share goes to the photo page
+    photo, *text = sizes
+    assert photo > target / 4
+    assert all(photo > 2 * size for size in text)
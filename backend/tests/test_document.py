@@ -0,0 +1,146 @@
+"""Plain-text documents: TXT to PDF and DOCX, and text out of DOCX."""
+
+import docx
+import pymupdf
+import pytest
+
+from app.config import settings
+from app.models import FileFormat
+from app.services.converters import document
+from app.services.converters.document import convert_txt_to_docx, convert_txt_to_pdf
+
+LINES = [
+    "Quarterly report",
+    "",
+    "Café prices rose 5% – from €3.10 to €3.25.",
+    "Columns:\tname\tvalue",
+    "A long paragraph " + " ".join(f"word{n}" for n in range(120)),
+] + [f"Line {n}" for n in range(150)]
+
+
+@pytest.fixture(autouse=True)
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "temp_dir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def text_path(tmp_path):
+    path = tmp_path / "notes.txt"
+    # A BOM and Windows line ends, as Notepad writes them
+    path.write_bytes("\ufeff".encode() + "\r\n".join(LINES).encode("utf-8"))
+    return str(path)
+
+
+def test_txt_to_pdf_keeps_every_word(text_path):
+    result = convert_txt_to_pdf(text_path, FileFormat.TXT, FileFormat.PDF)
+    with pymupdf.open(result.path) as doc:
+        # 155 lines at 6 mm each cannot fit one A4 page
+        assert doc.page_count > 1
+        assert doc[0].rect.width == pytest.approx(595.28, abs=0.01)
+        text = "".join(page.get_text() for page in doc)
+    assert text.split() == "\n".join(LINES).split()
+
+
+def test_txt_to_docx_has_a_paragraph_per_line(text_path):
+    result = convert_txt_to_docx(text_path, FileFormat.TXT, FileFormat.DOCX)
+    paragraphs = [p.text for p in docx.Document(result.path).paragraphs]
+    assert paragraphs == LINES
+
+
+def test_line_longer_than_a_read_stays_one_paragraph(tmp_path, monkeypatch):
+    monkeypatch.setattr(document, "TEXT_CHUNK_BYTES", 64)
+    long_line = "ü" * 100 + " end"  # pieces split inside a character
+    path = tmp_path / "long.txt"
+    path.write_text(f"first\n{long_line}\nlast\n", encoding="utf-8")
+
+    result = convert_txt_to_docx(str(path), FileFormat.TXT, FileFormat.DOCX)
+    paragraphs = [p.text for p in docx.Document(result.path).paragraphs]
+    assert paragraphs == ["first", long_line, "last"]
+
+
+def test_characters_outside_cp1252(tmp_path):
+    path = tmp_path / "unicode.txt"
+    path.write_text("Grüße 世界\n", encoding="utf-8")
+
+    result = convert_txt_to_docx(str(path), FileFormat.TXT, FileFormat.DOCX)
+    assert [p.text for p in docx.Document(result.path).paragraphs] == ["Grüße 世界"]
+    # The PDF's core font covers cp1252 only
+    result = convert_txt_to_pdf(str(path), FileFormat.TXT, FileFormat.PDF)
+    with pymupdf.open(result.path) as doc:
+        assert doc[0].get_text().split() == ["Grüße", "??"]
+
+
+def test_progress_is_reported(text_path):
+    calls = []
+    convert_txt_to_pdf(
+        text_path, FileFormat.TXT, FileFormat.PDF, progress_cb=lambda p, m: calls.append(p)
+    )
+    assert calls[0] == 5 and calls == sorted(calls) and calls[-1] <= 95
+
+
+@pytest.fixture
+def docx_path(tmp_path):
+    doc = docx.Document()
+    doc.sections[0].header.paragraphs[0].text = "Confidential"
+    doc.sections[0].footer.paragraphs[0].text = "Footer text"
+    doc.add_paragraph("Introduction")
+    # A tab stop in the paragraph properties is layout, not text
+    paragraph = doc.add_paragraph()
+    paragraph.paragraph_format.tab_stops.add_tab_stop(docx.shared.Inches(2))
+    paragraph.add_run("Name:")
+    paragraph.add_run().add_tab()
+    paragraph.add_run("Ada")
+    paragraph = doc.add_paragraph("Two")
+    paragraph.runs[0].add_break()
+    paragraph.add_run("lines")
+    doc.add_paragraph("")
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Item"
+    table.cell(0, 1).text = "Price"
+    table.cell(1, 0).text = "Tea"
+    table.cell(1, 1).text = "3.50"
+    table.cell(1, 1).add_paragraph("incl. VAT")
+    doc.add_paragraph("Closing words")
+    path = tmp_path / "report.docx"
+    doc.save(path)
+    return str(path)
+
+
+def _docx_text(path: str, progress_cb=None) -> str:
+    result = document.convert_docx_to_txt(path, FileFormat.DOCX, FileFormat.TXT, progress_cb)
+    with open(result.path, encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def test_docx_to_txt(docx_path):
+    assert _docx_text(docx_path).split("\n") == [
+        "Confidential",
+        "Introduction",
+        "Name:\tAda",
+        "Two",
+        "lines",
+        "",
+        "Item\tPrice",
+        "Tea\t3.50 incl. VAT",
+        "Closing words",
+        "Footer text",
+    ]
+
+
+def test_txt_round_trips_through_docx(text_path):
+    docx_result = convert_txt_to_docx(text_path, FileFormat.TXT, FileFormat.DOCX)
+    assert _docx_text(docx_result.path).split("\n") == LINES
+
+
+def test_docx_progress_reaches_the_end(docx_path):
+    calls = []
+    _docx_text(docx_path, lambda p, m: calls.append(p))
+    assert calls == sorted(calls) and calls[-1] == 95
+
+
+def test_invalid_docx(tmp_path):
+    path = tmp_path / "broken.docx"
+    path.write_bytes(b"not a zip")
+    with pytest.raises(ValueError, match="Invalid DOCX"):
+        _docx_text(str(path))
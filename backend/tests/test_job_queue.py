@@ -0,0 +1,112 @@
+"""SQLite job queue: claims, leases and ownership of running jobs."""
+
+import asyncio
+
+import pytest
+
+from app.services import job_queue
+from app.services.job_queue import PRIORITY_BATCH, PRIORITY_INTERACTIVE, SQLiteJobQueue
+
+LEASE = 60
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(job_queue, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), LEASE)
+    yield queue
+    asyncio.run(queue.close())
+
+
+def state(queue: SQLiteJobQueue, job_id: str) -> tuple | None:
+    return queue._execute(
+        "SELECT state, attempts, available_at, locked_by, last_error FROM jobs WHERE id = ?",
+        (job_id,),
+    ).fetchone()
+
+
+def test_claim_by_priority_then_age(queue, clock):
+    async def scenario():
+        await queue.enqueue("batch", {"n": 1}, PRIORITY_BATCH)
+        clock.now += 1
+        await queue.enqueue("first", {"n": 2})
+        clock.now += 1
+        await queue.enqueue("second", {"n": 3})
+
+        job = await queue.claim("w1")
+        assert (job.id, job.payload, job.attempts, job.worker_id) == ("first", {"n": 2}, 1, "w1")
+        assert (await queue.claim("w1")).id == "second"
+        assert await queue.claim("w1", min_priority=PRIORITY_INTERACTIVE) is None
+        assert await queue.depth(PRIORITY_BATCH) == 1
+        assert (await queue.claim("w1")).id == "batch"
+        assert await queue.claim("w1") is None
+
+    asyncio.run(scenario())
+
+
+def test_expired_lease_is_reclaimed(queue, clock):
+    async def scenario():
+        await queue.enqueue("job", {})
+        first = await queue.claim("w1")
+
+        # A live lease keeps the job off the queue, however old it is
+        clock.now += LEASE - 1
+        assert await queue.heartbeat(first)
+        clock.now += LEASE - 1
+        assert await queue.claim("w2") is None
+
+        clock.now += 2
+        second = await queue.claim("w2")
+        assert (second.id, second.attempts, second.worker_id) == ("job", 2, "w2")
+
+    asyncio.run(scenario())
+
+
+def test_stale_worker_cannot_touch_the_new_claim(queue, clock):
+    async def scenario():
+        await queue.enqueue("job", {})
+        stale = await queue.claim("w1")
+        clock.now += LEASE + 1
+        current = await queue.claim("w2")
+
+        assert not await queue.heartbeat(stale)
+        await queue.complete(stale)
+        await queue.retry(stale, "late", 0)
+        await queue.fail(stale, "late")
+        assert state(queue, "job")[:2] == ("running", 2)
+        assert state(queue, "job")[3] == "w2"
+
+        assert await queue.heartbeat(current)
+        await queue.complete(current)
+        assert state(queue, "job") is None
+
+    asyncio.run(scenario())
+
+
+def test_retry_releases_the_job_after_the_delay(queue, clock):
+    async def scenario():
+        await queue.enqueue("job", {})
+        job = await queue.claim("w1")
+        await queue.retry(job, "boom", 30)
+        assert state(queue, "job") == ("queued", 1, clock.now + 30, None, "boom")
+
+        clock.now += 29
+        assert await queue.claim("w1") is None
+        clock.now += 1
+        assert (await queue.claim("w1")).attempts == 2
+
+    asyncio.run(scenario())
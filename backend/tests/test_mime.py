@@ -0,0 +1,126 @@
+"""File type detection from upload prefixes and ZIP central directories."""
+
+import io
+import struct
+import zipfile
+
+import pytest
+
+from app.models import FileFormat
+from app.utils.mime import SVG_SEARCH_BYTES, detect_format, ooxml_format, validate_file_type
+from app.utils.upload import SNIFF_BYTES
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + b"\x00" * 64
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg" width="1" height="1"/>'
+
+
+def _zip(names: list[str], comment: bytes = b"") -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name in names:
+            zf.writestr(name, b"<x/>")
+        zf.comment = comment
+    return buffer.getvalue()
+
+
+def _as_zip64(data: bytes) -> bytes:
+    """Rewrite a ZIP's end records in ZIP64 form, as large archives have them."""
+    eocd = data.rindex(b"PK\x05\x06")
+    _, _, _, _, entries, cd_size, cd_offset, _ = struct.unpack_from("<4s4H2IH", data, eocd)
+    record = struct.pack(
+        "<4sQ2H2I4Q", b"PK\x06\x06", 44, 45, 45, 0, 0, entries, entries, cd_size, cd_offset
+    )
+    locator = struct.pack("<4sIQI", b"PK\x06\x07", 0, eocd, 1)
+    end = struct.pack(
+        "<4s4H2IH", b"PK\x05\x06", 0, 0, 0xFFFF, 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF, 0
+    )
+    return data[:eocd] + record + locator + end
+
+
+DOCX = ["[Content_Types].xml", "_rels/.rels", "word/document.xml"]
+PPTX = ["[Content_Types].xml", "_rels/.rels", "ppt/presentation.xml"]
+
+CASES = [
+    ("jpg", b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + b"\x00" * 64, FileFormat.JPG),
+    ("png", PNG, FileFormat.PNG),
+    ("gif87a", b"GIF87a" + b"\x00" * 64, FileFormat.GIF),
+    ("gif89a", b"GIF89a" + b"\x00" * 64, FileFormat.GIF),
+    ("pdf", b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n", FileFormat.PDF),
+    ("pdf after junk", b"\x00junk\n" * 100 + b"%PDF-1.4\n", FileFormat.PDF),
+    ("pdf past header window", b"\x00junk\n" * 200 + b"%PDF-1.4\n", None),
+    ("docx", _zip(DOCX), FileFormat.DOCX),
+    ("pptx", _zip(PPTX), FileFormat.PPTX),
+    ("docx zip64", _as_zip64(_zip(DOCX)), FileFormat.DOCX),
+    ("docx with comment", _zip(DOCX, b"note PK\x05\x06 inside"), FileFormat.DOCX),
+    ("plain zip", _zip(["readme.txt"]), None),
+    ("zip without content types", _zip(["word/document.xml"]), None),
+    ("zip with word and ppt", _zip(DOCX + ["ppt/presentation.xml"]), None),
+    ("truncated zip", _zip(DOCX)[:-10], None),
+    ("svg", SVG, FileFormat.SVG),
+    ("svg with declaration", b'<?xml version="1.0"?>\n' + SVG, FileFormat.SVG),
+    ("svg with bom", b"\xef\xbb\xbf" + SVG, FileFormat.SVG),
+    ("svg after long preamble", b"<!--" + b"x" * (4 * SNIFF_BYTES) + b"-->" + SVG, FileFormat.SVG),
+    ("svg root across chunks", b"<!--" + b"x" * (64 * 1024 - 2) + b"-->" + SVG, FileFormat.SVG),
+    ("svg past search limit", b"<!--" + b"x" * SVG_SEARCH_BYTES + b"-->" + SVG, FileFormat.TXT),
+    ("xml", b'<?xml version="1.0"?>\n<note>svg</note>\n', FileFormat.TXT),
+    ("text", b"hello\nworld\n", FileFormat.TXT),
+    ("utf-8 text", "Grüße, 世界\n".encode("utf-8"), FileFormat.TXT),
+    ("latin-1 text", "café\n".encode("latin-1"), FileFormat.TXT),
+    ("utf-16 text", "hello\n".encode("utf-16"), FileFormat.TXT),
+    ("binary", bytes(range(256)) * 4, None),
+    ("empty", b"", None),
+]
+
+
+@pytest.mark.parametrize("data, expected", [case[1:] for case in CASES], ids=[c[0] for c in CASES])
+def test_detect_format(tmp_path, data, expected):
+    path = tmp_path / "upload"
+    path.write_bytes(data)
+    assert detect_format(data[:SNIFF_BYTES], str(path)) == expected
+
+
+def test_zip64_helper_writes_a_valid_archive():
+    with zipfile.ZipFile(io.BytesIO(_as_zip64(_zip(DOCX)))) as zf:
+        assert zf.namelist() == DOCX
+
+
+@pytest.mark.parametrize("prefix", [b"", b"MZ" + b"\x00" * 4096])
+def test_ooxml_format_reads_from_the_end(tmp_path, prefix):
+    # Offsets are measured back from the end, so prepended data is fine
+    path = tmp_path / "upload"
+    path.write_bytes(prefix + _zip(DOCX))
+    assert ooxml_format(str(path)) == FileFormat.DOCX
+
+
+def test_ooxml_format_missing_file(tmp_path):
+    assert ooxml_format(str(tmp_path / "missing")) is None
+
+
+@pytest.mark.parametrize(
+    "filename, data, expected",
+    [
+        ("photo.JPG", b"\xff\xd8\xff\xe0" + b"\x00" * 64, FileFormat.JPG),
+        ("report.docx", _zip(DOCX), FileFormat.DOCX),
+        ("drawing.svg", SVG, FileFormat.SVG),
+    ],
+)
+def test_validate_file_type(tmp_path, filename, data, expected):
+    path = tmp_path / filename
+    path.write_bytes(data)
+    assert validate_file_type(filename, data[:SNIFF_BYTES], str(path)) == expected
+
+
+@pytest.mark.parametrize(
+    "filename, data, message",
+    [
+        ("archive.exe", b"MZ", "Unsupported file extension"),
+        ("photo.png", b"\xff\xd8\xff\xe0" + b"\x00" * 64, "appears to be jpg"),
+        ("report.docx", _zip(["readme.txt"]), "not a DOCX or PPTX"),
+        ("photo.jpg", bytes(range(256)) * 4, "Unrecognized file type"),
+    ],
+)
+def test_validate_file_type_rejects(tmp_path, filename, data, message):
+    path = tmp_path / filename
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match=message):
+        validate_file_type(filename, data[:SNIFF_BYTES], str(path))
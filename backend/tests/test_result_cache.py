@@ -0,0 +1,90 @@
+"""Disk tier of the result cache."""
+
+import os
+
+import pytest
+
+from app.config import settings
+from app.services import result_cache
+from app.services.converters.result import ConvertedFile, discard_result
+from app.services.result_cache import DiskCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "temp_dir", str(tmp_path))
+    monkeypatch.setattr(result_cache, "time", FakeClock())
+    return tmp_path
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "result-cache")
+
+
+def test_hit_and_miss(cache_dir, tmp_path):
+    cache = DiskCache(cache_dir, 1000)
+    assert cache.get("a" * 64) is None
+    assert cache.get_file("a" * 64) is None
+
+    cache.put("a" * 64, b"result")
+    source = tmp_path / "converted.pdf"
+    source.write_bytes(b"from a file")
+    cache.put("b" * 64, str(source))
+    assert cache.get("a" * 64) == b"result"
+    assert cache.get("b" * 64) == b"from a file"
+
+
+def test_oversized_result_is_not_stored(cache_dir):
+    cache = DiskCache(cache_dir, 10)
+    cache.put("a" * 64, b"x" * 11)
+    assert cache.get("a" * 64) is None
+
+
+def test_file_copy_is_independent_of_the_entry(cache_dir):
+    cache = DiskCache(cache_dir, 10)
+    cache.put("a" * 64, b"result")
+
+    # The caller discards its copy after uploading; the entry stays
+    copy = cache.get_file("a" * 64)
+    assert os.path.samefile(copy, os.path.join(cache_dir, "a" * 64))
+    discard_result(ConvertedFile(copy))
+    assert cache.get("a" * 64) == b"result"
+
+    # Evicting the entry leaves a copy still in use alone
+    copy = cache.get_file("a" * 64)
+    cache.put("b" * 64, b"newer one")
+    assert cache.get("a" * 64) is None
+    assert open(copy, "rb").read() == b"result"
+
+
+def test_missing_file_drops_the_entry(cache_dir):
+    cache = DiskCache(cache_dir, 1000)
+    cache.put("a" * 64, b"result")
+    os.remove(os.path.join(cache_dir, "a" * 64))
+    assert cache.get_file("a" * 64) is None
+    assert cache._touch("a" * 64) is False
+
+
+def test_processes_share_one_budget(cache_dir):
+    # Two caches on one directory stand in for two worker processes
+    first, second = DiskCache(cache_dir, 250), DiskCache(cache_dir, 250)
+    first.put("a" * 64, b"a" * 100)
+    second.put("b" * 64, b"b" * 100)
+    # Using a makes b the least recently used
+    assert first.get("a" * 64) is not None
+
+    second.put("c" * 64, b"c" * 100)
+    assert second.get("b" * 64) is None
+    assert not os.path.exists(os.path.join(cache_dir, "b" * 64))
+    assert first.get("a" * 64) == b"a" * 100
+    assert first.get("c" * 64) == b"c" * 100
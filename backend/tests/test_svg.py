@@ -0,0 +1,90 @@
+"""Real SVG renders through cairo, for each target format."""
+
+import io
+
+import pytest
+from PIL import Image
+
+try:
+    from app.services.converters import svg
+except (ImportError, OSError):  # cairosvg present but libcairo missing
+    pytest.skip("cairo is not available", allow_module_level=True)
+
+from app.models import FileFormat
+
+# Left half red, right half blue, on a transparent background
+SVG = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" width="40" height="20">'
+    b'<rect width="20" height="20" fill="#ff0000"/>'
+    b'<rect x="20" width="20" height="20" fill="#0000ff"/>'
+    b"</svg>"
+)
+
+
+@pytest.fixture
+def svg_path(tmp_path):
+    path = tmp_path / "drawing.svg"
+    path.write_bytes(SVG)
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "target, image_format",
+    [(FileFormat.PNG, "PNG"), (FileFormat.JPG, "JPEG"), (FileFormat.GIF, "GIF")],
+)
+def test_raster_targets(svg_path, target, image_format):
+    image = Image.open(io.BytesIO(svg.convert_svg(svg_path, FileFormat.SVG, target)))
+    assert image.format == image_format
+    assert image.size == (40, 20)
+    red, blue = image.convert("RGB").getpixel((5, 10)), image.convert("RGB").getpixel((35, 10))
+    # JPEG and the GIF palette only get close to the drawn colours
+    assert red[0] > 200 and red[2] < 60
+    assert blue[2] > 200 and blue[0] < 60
+
+
+def test_pdf_target(svg_path):
+    output = svg.convert_svg(svg_path, FileFormat.SVG, FileFormat.PDF)
+    assert output.startswith(b"%PDF-")
+
+
+@pytest.mark.parametrize(
+    "options, size",
+    [
+        ({"width": 80}, (80, 40)),
+        ({"height": 40}, (80, 40)),
+        ({"width": 10, "height": 30}, (10, 30)),
+        ({"dpi": 192}, (80, 40)),
+    ],
+)
+def test_output_size(svg_path, options, size):
+    output = svg.convert_svg(svg_path, FileFormat.SVG, FileFormat.PNG, **options)
+    assert Image.open(io.BytesIO(output)).size == size
+
+
+def test_repeated_renders_match(svg_path):
+    # The second render uses a copy of the cached tree
+    first = svg.convert_svg(svg_path, FileFormat.SVG, FileFormat.PNG)
+    assert svg.convert_svg(svg_path, FileFormat.SVG, FileFormat.PNG) == first
+
+
+def test_pixel_budget(svg_path, monkeypatch):
+    monkeypatch.setattr(svg, "SVG_MAX_PIXELS", 40 * 20 * 4 - 1)
+    with pytest.raises(ValueError, match="megapixels"):
+        svg.convert_svg(svg_path, FileFormat.SVG, FileFormat.PNG, dpi=192)
+
+
+def test_half_transparent_fill_keeps_its_colour(tmp_path):
+    # Premultiplied, this pixel is (128, 0, 0, 128); read as plain RGB it
+    # would come out dark red
+    path = tmp_path / "translucent.svg"
+    path.write_bytes(
+        b'<svg xmlns="http://www.w3.org/2000/svg" width="16" height="16">'
+        b'<rect width="16" height="16" fill="#ff0000" fill-opacity="0.5"/>'
+        b"</svg>"
+    )
+    png = Image.open(io.BytesIO(svg.convert_svg(str(path), FileFormat.SVG, FileFormat.PNG)))
+    *colour, alpha = png.getpixel((8, 8))
+    assert colour == [255, 0, 0] and abs(alpha - 128) <= 1
+    jpg = Image.open(io.BytesIO(svg.convert_svg(str(path), FileFormat.SVG, FileFormat.JPG)))
+    red, green, blue = jpg.getpixel((8, 8))
+    assert red > 245 and green < 10 and blue < 10
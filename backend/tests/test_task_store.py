@@ -0,0 +1,23 @@
+"""SQLite progress store shared between processes."""
+
+import asyncio
+
+from app.services.task_store import SQLiteProgressBackend, TaskPhase
+
+
+def test_created_task_is_visible_to_other_processes(tmp_path):
+    # Two backends on one file stand in for the API and a worker process
+    async def scenario():
+        path = str(tmp_path / "progress.db")
+        api = SQLiteProgressBackend(path, 60, 0.1)
+        worker = SQLiteProgressBackend(path, 60, 0.1)
+        for n in range(50):
+            await api.create(f"task-{n}")
+            assert await worker.get(f"task-{n}") is not None
+
+        worker.update("task-0", phase=TaskPhase.CONVERTING, progress=40)
+        assert await worker.wait({"task-0": 0}, timeout=5)
+        task = await api.get("task-0")
+        assert (task.phase, task.progress) == (TaskPhase.CONVERTING, 40)
+
+    asyncio.run(scenario())
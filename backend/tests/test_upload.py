@@ -0,0 +1,188 @@
+"""Multipart uploads streamed to disk by receive_upload(s)."""
+
+import asyncio
+import hashlib
+import os
+
+import pytest
+from starlette.requests import Request
+
+from app.config import settings
+from app.utils import upload as upload_module
+from app.utils.upload import (
+    MAX_FIELD_BYTES,
+    SNIFF_BYTES,
+    UploadTooLargeError,
+    receive_upload,
+    receive_uploads,
+)
+
+BOUNDARY = "----test-boundary"
+DATA = os.urandom(3 * SNIFF_BYTES + 123)
+
+
+@pytest.fixture(autouse=True)
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "temp_dir", str(tmp_path))
+    return tmp_path
+
+
+def multipart(*parts: tuple[str, bytes, str | None]) -> bytes:
+    """Encode (name, value, filename) parts; a filename makes a file part."""
+    body = b""
+    for name, value, filename in parts:
+        disposition = f'form-data; name="{name}"'
+        headers = ""
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+            headers = "Content-Type: application/pdf\r\n"
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n{headers}\r\n"
+        ).encode() + value + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def request(body: bytes, chunk_size: int = 1000, content_length: bool = True) -> Request:
+    """A request whose body arrives in chunk_size pieces."""
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+    async def receive():
+        chunk = chunks.pop(0) if chunks else b""
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+
+def spooled(temp_dir) -> list[str]:
+    return sorted(name for name in os.listdir(temp_dir) if name.startswith("upload-"))
+
+
+@pytest.mark.parametrize("batch", [upload_module.PARSE_BATCH_BYTES, 4096])
+def test_file_and_fields(temp_dir, monkeypatch, batch):
+    monkeypatch.setattr(upload_module, "PARSE_BATCH_BYTES", batch)
+    body = multipart(
+        ("target", b"pdf", None), ("file", DATA, "report.pdf"), ("pages", b"[1, 2]", None)
+    )
+    upload = asyncio.run(receive_upload(request(body)))
+
+    assert upload.filename == "report.pdf"
+    assert upload.content_type == "application/pdf"
+    assert upload.size == len(DATA)
+    assert upload.sha256 == hashlib.sha256(DATA).hexdigest()
+    assert upload.head == DATA[:SNIFF_BYTES]
+    assert upload.fields == {"target": "pdf", "pages": "[1, 2]"}
+    with open(upload.path, "rb") as f:
+        assert f.read() == DATA
+    upload.remove()
+    assert spooled(temp_dir) == []
+
+
+def test_short_file_head_is_the_whole_file():
+    upload = asyncio.run(receive_upload(request(multipart(("file", b"tiny", "a.txt")))))
+    assert (upload.size, upload.head) == (4, b"tiny")
+    upload.remove()
+
+
+def test_file_at_the_limit_is_accepted():
+    body = multipart(("file", DATA, "report.pdf"))
+    upload = asyncio.run(receive_upload(request(body), max_bytes=len(DATA)))
+    assert upload.size == len(DATA)
+    upload.remove()
+
+
+def test_file_over_the_limit_is_rejected_and_removed(temp_dir):
+    body = multipart(("file", DATA, "report.pdf"))
+    with pytest.raises(UploadTooLargeError, match="File too large"):
+        asyncio.run(receive_upload(request(body), max_bytes=len(DATA) - 1))
+    assert spooled(temp_dir) == []
+
+
+def test_oversized_content_length_is_refused_unread():
+    async def receive():
+        raise AssertionError("body was read")
+
+    headers = [
+        (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+        (b"content-length", str(1024 + MAX_FIELD_BYTES + 1).encode()),
+    ]
+    req = Request({"type": "http", "method": "POST", "headers": headers}, receive)
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(receive_upload(req, max_bytes=1024))
+
+
+def test_total_limit_across_files(temp_dir):
+    body = multipart(("file", DATA, "a.pdf"), ("file", DATA, "b.pdf"))
+    with pytest.raises(UploadTooLargeError, match="Upload too large"):
+        asyncio.run(
+            receive_uploads(
+                request(body, content_length=False),
+                max_bytes=len(DATA),
+                max_files=2,
+                max_total_bytes=len(DATA) + 1,
+            )
+        )
+    assert spooled(temp_dir) == []
+
+    uploads, _ = asyncio.run(
+        receive_uploads(
+            request(body), max_bytes=len(DATA), max_files=2, max_total_bytes=2 * len(DATA)
+        )
+    )
+    assert [u.filename for u in uploads] == ["a.pdf", "b.pdf"]
+    for upload in uploads:
+        upload.remove()
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        (multipart(("file", DATA, "a.pdf"), ("file", DATA, "b.pdf")), "Too many files"),
+        (
+            multipart(("file", DATA, "a.pdf"), ("note", b"x" * (MAX_FIELD_BYTES + 1), None)),
+            "too large",
+        ),
+        (multipart(("target", b"pdf", None)), "Missing 'file'"),
+        (multipart(("file", DATA, "a.pdf"))[:-200], "incomplete"),
+    ],
+    ids=["too many files", "oversized field", "no file", "truncated"],
+)
+def test_invalid_bodies_leave_nothing_behind(temp_dir, body, message):
+    with pytest.raises(ValueError, match=message):
+        asyncio.run(receive_upload(request(body)))
+    assert spooled(temp_dir) == []
+
+
+def test_requires_multipart():
+    req = Request(
+        {"type": "http", "method": "POST", "headers": [(b"content-type", b"application/json")]}
+    )
+    with pytest.raises(ValueError, match="multipart/form-data"):
+        asyncio.run(receive_upload(req))
+
+
+def test_cancelled_upload_is_removed(temp_dir, monkeypatch):
+    # Small batches, so part of the file is on disk when the client goes
+    monkeypatch.setattr(upload_module, "PARSE_BATCH_BYTES", 4096)
+    body = multipart(("file", DATA, "report.pdf"))
+    chunks = [body[: len(body) // 2]]
+
+    async def receive():
+        if chunks:
+            return {"type": "http.request", "body": chunks.pop(), "more_body": True}
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+        req = Request({"type": "http", "method": "POST", "headers": headers}, receive)
+        task = asyncio.create_task(receive_upload(req))
+        await asyncio.sleep(0.1)
+        assert len(spooled(temp_dir)) == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert spooled(temp_dir) == []
@@ -0,0 +1,100 @@
+"""How the worker settles a failed job on the SQLite queue."""
+
+import asyncio
+
+import pytest
+
+from app import worker
+from app.config import settings
+from app.models import FileFormat
+from app.services.conversion_runner import ConversionJob
+from app.services.job_queue import SQLiteJobQueue
+
+PAYLOAD = ConversionJob(
+    conversion_id="c1",
+    filename="report.docx",
+    source_format=FileFormat.DOCX,
+    target_format=FileFormat.PDF,
+    content_type="application/octet-stream",
+    original_path="originals/c1/report.docx",
+).to_payload()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), 60)
+    yield queue
+    asyncio.run(queue.close())
+
+
+@pytest.fixture
+def failures(monkeypatch):
+    """Failures the worker records; set .error to what the conversion raises."""
+
+    class Failures(list):
+        error: Exception
+
+    recorded = Failures()
+
+    async def run_conversion(*args, **kwargs):
+        raise recorded.error
+
+    async def record_conversion_failure(conversion_id, error, client):
+        recorded.append((conversion_id, error))
+
+    async def get_task(conversion_id):
+        return {}
+
+    async def fetch_original(storage, job):
+        return None
+
+    monkeypatch.setattr(worker, "run_conversion", run_conversion)
+    monkeypatch.setattr(worker, "record_conversion_failure", record_conversion_failure)
+    monkeypatch.setattr(worker, "get_task", get_task)
+    monkeypatch.setattr(worker, "update_task", lambda *args, **kwargs: None)
+    monkeypatch.setattr(worker, "_fetch_original", fetch_original)
+    return recorded
+
+
+def _run(queue, failures, error, earlier_attempts=0):
+    """Run the job through _process on its next claim after earlier_attempts."""
+    failures.error = error
+
+    async def scenario():
+        await queue.enqueue("job", PAYLOAD)
+        for _ in range(earlier_attempts):
+            await queue.retry(await queue.claim("w1"), "earlier", 0)
+        job = await queue.claim("w1")
+        await worker._process(job, queue, None, None)
+        return job
+
+    return asyncio.run(scenario())
+
+
+def _row(queue):
+    return queue._execute(
+        "SELECT state, available_at - strftime('%s', 'now'), last_error FROM jobs"
+    ).fetchone()
+
+
+@pytest.mark.parametrize("earlier_attempts", [0, 1])
+def test_retryable_error_backs_off(queue, failures, earlier_attempts):
+    job = _run(queue, failures, RuntimeError("flaky"), earlier_attempts)
+    expected = settings.job_retry_base_seconds * 2 ** (job.attempts - 1)
+    state, delay, error = _row(queue)
+    assert (state, error) == ("queued", "flaky")
+    assert delay == pytest.approx(expected, abs=2)
+    assert failures == []
+
+
+@pytest.mark.parametrize("error", [ValueError("bad input"), TimeoutError("too slow")])
+def test_non_retryable_error_fails_the_job(queue, failures, error):
+    _run(queue, failures, error)
+    assert _row(queue) is None
+    assert failures == [("c1", str(error))]
+
+
+def test_last_attempt_fails_the_job(queue, failures):
+    _run(queue, failures, RuntimeError("flaky"), settings.job_max_attempts - 1)
+    assert _row(queue) is None
+    assert failures == [("c1", "flaky")]
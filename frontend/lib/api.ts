@@ -5,6 +5,7 @@ import type {
   ConversionResult,
   DownloadResponse,
   FileFormat,
+  HistoryPage,
 } from "@/types";
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api";
@@ -96,14 +97,16 @@ export async function getConversions(
   limit = 20,
 ): Promise<ConversionResult[]> {
   const response = await fetch(`${API_BASE}/conversions?limit=${limit}`);
-  return handleResponse<ConversionResult[]>(response);
+  const page = await handleResponse<HistoryPage<ConversionResult>>(response);
+  return page.items;
 }
 
 export async function getCompressions(
   limit = 20,
 ): Promise<CompressionResult[]> {
   const response = await fetch(`${API_BASE}/compressions?limit=${limit}`);
-  return handleResponse<CompressionResult[]>(response);
+  const page = await handleResponse<HistoryPage<CompressionResult>>(response);
+  return page.items;
 }
 
 export async function getDownloadUrl(
@@ -26,13 +26,16 @@ export interface ConversionResult {
   target_format: string;
   status: string;
   error_message?: string | null;
-  original_storage_path?: string | null;
-  converted_storage_path?: string | null;
   file_size_bytes?: number | null;
   created_at?: string | null;
   updated_at?: string | null;
 }
 
+export interface HistoryPage<T> {
+  items: T[];
+  next_cursor?: string | null;
+}
+
 export interface DownloadResponse {
   download_url: string;
 }
@@ -68,8 +71,6 @@ export interface CompressionResult {
   compressed_size_bytes?: number | null;
   status: string;
   error_message?: string | null;
-  original_storage_path?: string | null;
-  compressed_storage_path?: string | null;
   created_at?: string | null;
   updated_at?: string | null;
 }
@@ -0,0 +1,36 @@
+-- Conversions submitted together through /api/convert/batch
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS batch_id UUID;
+
+CREATE INDEX IF NOT EXISTS conversion_logs_batch_id_idx
+    ON conversion_logs (batch_id, created_at)
+    WHERE batch_id IS NOT NULL;
+
+-- Workers cap how many batch jobs they run at once by claiming only
+-- interactive jobs (p_min_priority = 0) once that budget is used up.
+DROP FUNCTION IF EXISTS claim_conversion_job(TEXT, INTEGER);
+
+CREATE OR REPLACE FUNCTION claim_conversion_job(
+    p_worker_id TEXT,
+    p_lease_seconds INTEGER,
+    p_min_priority INTEGER DEFAULT NULL
+)
+RETURNS SETOF conversion_logs
+LANGUAGE sql
+AS $$
+    UPDATE conversion_logs
+    SET job_state = 'running',
+        job_attempts = job_attempts + 1,
+        job_locked_by = p_worker_id,
+        job_locked_at = NOW()
+    WHERE id = (
+        SELECT id FROM conversion_logs
+        WHERE ((job_state = 'queued' AND job_available_at <= NOW())
+               OR (job_state = 'running'
+                   AND job_locked_at < NOW() - make_interval(secs => p_lease_seconds)))
+          AND (p_min_priority IS NULL OR job_priority >= p_min_priority)
+        ORDER BY job_priority DESC, created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$;
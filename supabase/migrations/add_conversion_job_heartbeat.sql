@@ -0,0 +1,18 @@
+-- Renew a running job's lease. Only the worker holding the current claim
+-- (same worker id and attempt) can; it gets no row back once it has lost it.
+CREATE OR REPLACE FUNCTION heartbeat_conversion_job(
+    p_id UUID,
+    p_worker_id TEXT,
+    p_attempts INTEGER
+)
+RETURNS SETOF UUID
+LANGUAGE sql
+AS $$
+    UPDATE conversion_logs
+    SET job_locked_at = NOW()
+    WHERE id = p_id
+      AND job_state = 'running'
+      AND job_locked_by = p_worker_id
+      AND job_attempts = p_attempts
+    RETURNING id;
+$$;
@@ -0,0 +1,36 @@
+-- Job queue columns for job_queue_backend = "postgres"
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS job_state TEXT;
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS job_payload JSONB;
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS job_priority INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS job_attempts INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS job_available_at TIMESTAMPTZ;
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS job_locked_by TEXT;
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS job_locked_at TIMESTAMPTZ;
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS job_error TEXT;
+
+CREATE INDEX IF NOT EXISTS conversion_logs_job_claim_idx
+    ON conversion_logs (job_priority DESC, created_at)
+    WHERE job_state IN ('queued', 'running');
+
+-- Atomically claim the next ready job. Jobs whose lease has expired (the
+-- worker died) are claimable again.
+CREATE OR REPLACE FUNCTION claim_conversion_job(p_worker_id TEXT, p_lease_seconds INTEGER)
+RETURNS SETOF conversion_logs
+LANGUAGE sql
+AS $$
+    UPDATE conversion_logs
+    SET job_state = 'running',
+        job_attempts = job_attempts + 1,
+        job_locked_by = p_worker_id,
+        job_locked_at = NOW()
+    WHERE id = (
+        SELECT id FROM conversion_logs
+        WHERE (job_state = 'queued' AND job_available_at <= NOW())
+           OR (job_state = 'running'
+               AND job_locked_at < NOW() - make_interval(secs => p_lease_seconds))
+        ORDER BY job_priority DESC, created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$;
@@ -0,0 +1,23 @@
+-- Keyset pagination of /api/conversions and /api/compressions: newest first
+-- by (created_at, id), optionally filtered by status or format. Each page is
+-- a range scan of one of these, however deep into the history it is.
+CREATE INDEX IF NOT EXISTS conversion_logs_history_idx
+    ON conversion_logs (created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS conversion_logs_status_history_idx
+    ON conversion_logs (status, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS conversion_logs_source_history_idx
+    ON conversion_logs (source_format, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS conversion_logs_target_history_idx
+    ON conversion_logs (target_format, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS compression_logs_history_idx
+    ON compression_logs (created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS compression_logs_status_history_idx
+    ON compression_logs (status, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS compression_logs_source_history_idx
+    ON compression_logs (source_format, created_at DESC, id DESC);
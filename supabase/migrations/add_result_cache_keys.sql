@@ -0,0 +1,10 @@
+ALTER TABLE conversion_logs ADD COLUMN IF NOT EXISTS cache_key TEXT;
+ALTER TABLE compression_logs ADD COLUMN IF NOT EXISTS cache_key TEXT;
+
+CREATE INDEX IF NOT EXISTS conversion_logs_cache_key_idx
+    ON conversion_logs (cache_key)
+    WHERE status = 'completed';
+
+CREATE INDEX IF NOT EXISTS compression_logs_cache_key_idx
+    ON compression_logs (cache_key)
+    WHERE status = 'completed';